@@ -5,7 +5,14 @@ from datetime import timedelta # Added
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_SCAN_INTERVAL
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.typing import ConfigType
 # ConfigEntryNotReady might be needed if we want to raise it explicitly
 # from homeassistant.exceptions import ConfigEntryNotReady
 
@@ -13,17 +20,71 @@ from .const import (
     DOMAIN,
     PLATFORMS,
     CONF_STATIONS,
+    CONF_STATION_CODES,
+    CONF_VARIABLE_TYPES,
+    CONF_RIVERS,
+    CONF_MAX_CONCURRENCY,
+    CONF_STATION_TIMEOUT,
+    CONF_REFRESH_TIMEOUT,
+    CONF_MAX_STALENESS,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_STATION_TIMEOUT,
+    DEFAULT_REFRESH_TIMEOUT,
+    DEFAULT_MAX_STALENESS,
+    CONF_ADAPTIVE_POLLING,
+    CONF_ALIGNED_POLLING,
+    CONF_MIN_INTERVAL,
+    CONF_MAX_INTERVAL,
+    CONF_THRESHOLDS,
+    CONF_THRESHOLD_HYSTERESIS,
+    DEFAULT_MIN_INTERVAL,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_THRESHOLD_HYSTERESIS,
+    CONF_DERIVED_SENSORS,
+    CONF_DIAGNOSTIC_SENSORS,
+    CONF_TIMESTAMP_SENSORS,
+    SNAPSHOT_STORAGE_KEY,
+    SNAPSHOT_STORAGE_VERSION,
+    SIGNAL_STATIONS_ADDED,
     LOGGER,
     # CF_SCAN_INTERVAL_LISTENER, # No longer needed here
 )
+from .catalog import async_get_catalog
+from .client import async_get_http_client
 from .coordinator import ChjSaihDataUpdateCoordinator # Added
+from .hub import async_get_hub
+from .scheduler import AdaptiveScheduler
+from .services import async_setup_services
+from .statistics import async_setup_statistics
+from .thresholds import StationThresholds, ThresholdEvaluator, parse_thresholds
+
+# Options that change how an entry is built, with their defaults; changing
+# them reloads the entry, every other option is applied in place
+_RELOAD_OPTIONS = {
+    CONF_ADAPTIVE_POLLING: False,
+    CONF_ALIGNED_POLLING: True,
+    CONF_MIN_INTERVAL: DEFAULT_MIN_INTERVAL,
+    CONF_MAX_INTERVAL: DEFAULT_MAX_INTERVAL,
+    CONF_DERIVED_SENSORS: False,
+    CONF_DIAGNOSTIC_SENSORS: False,
+    CONF_TIMESTAMP_SENSORS: False,
+}
+
+
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the CHJ SAIH services, shared by every entry."""
+    async_setup_services(hass)
+    return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up CHJ SAIH from a config entry."""
     hass.data.setdefault(DOMAIN, {})
 
-    station_ids = entry.data[CONF_STATIONS]
+    station_ids, devices = await _async_get_stations(hass, entry)
     scan_interval = entry.options.get(
         CONF_SCAN_INTERVAL, entry.data.get(CONF_SCAN_INTERVAL)
     )
@@ -34,32 +95,150 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         scan_interval,
     )
 
+    # The integration's HTTP session lives while at least one entry is loaded
+    entry.async_on_unload(async_get_http_client(hass).async_acquire())
+    hub = async_get_hub(hass)
+    # Registered before the first refresh so the hub knows the interval to honour
+    entry.async_on_unload(hub.async_subscribe(entry.entry_id, station_ids, scan_interval))
+    # Backfill history from the series the hub already downloads
+    if (release_statistics := await async_setup_statistics(hass, hub)) is not None:
+        entry.async_on_unload(release_statistics)
+
+    thresholds = parse_thresholds(entry.options.get(CONF_THRESHOLDS))
+    evaluator = _threshold_evaluator(entry, thresholds)
+
+    scheduler = None
+    adaptive = entry.options.get(CONF_ADAPTIVE_POLLING, False)
+    aligned = entry.options.get(CONF_ALIGNED_POLLING, True)
+    if adaptive or aligned:
+        # Without adaptive polling every station keeps the scan interval,
+        # only moved to right after its publications
+        scheduler = AdaptiveScheduler(
+            station_ids,
+            initial_interval=scan_interval,
+            min_interval=entry.options.get(CONF_MIN_INTERVAL, DEFAULT_MIN_INTERVAL),
+            max_interval=entry.options.get(CONF_MAX_INTERVAL, DEFAULT_MAX_INTERVAL),
+            thresholds=thresholds,
+            adaptive=adaptive,
+            aligner=hub.next_fetch if aligned else None,
+        )
+
     coordinator = ChjSaihDataUpdateCoordinator(
         hass,
+        hub,
         station_ids=station_ids,
         update_interval=timedelta(seconds=scan_interval),
+        max_concurrency=entry.options.get(CONF_MAX_CONCURRENCY, DEFAULT_MAX_CONCURRENCY),
+        station_timeout=entry.options.get(CONF_STATION_TIMEOUT, DEFAULT_STATION_TIMEOUT),
+        refresh_timeout=entry.options.get(CONF_REFRESH_TIMEOUT, DEFAULT_REFRESH_TIMEOUT),
+        scheduler=scheduler,
+        derived_sensors=entry.options.get(CONF_DERIVED_SENSORS, False),
+        devices=devices,
+        thresholds=evaluator,
+        max_staleness=entry.options.get(CONF_MAX_STALENESS, DEFAULT_MAX_STALENESS),
     )
+    if coordinator.histories:
+        # Seeded from the series every fetch already returns
+        entry.async_on_unload(hub.async_add_series_listener(coordinator.async_process_series))
 
-    await coordinator.async_config_entry_first_refresh()
-    # If async_config_entry_first_refresh raises UpdateFailed (which it does on errors),
-    # Home Assistant will retry the setup later. ConfigEntryNotReady can also be raised here.
+    restored = await coordinator.async_restore_snapshot()
+    if not restored:
+        # First setup: there is nothing to show yet, so wait for real data.
+        await coordinator.async_config_entry_first_refresh()
+        # If async_config_entry_first_refresh raises UpdateFailed (which it does on errors),
+        # Home Assistant will retry the setup later. ConfigEntryNotReady can also be raised here.
 
     hass.data[DOMAIN][entry.entry_id] = {
         CONF_STATIONS: station_ids, # May be removed if sensors get it from coordinator/entry
         CONF_SCAN_INTERVAL: scan_interval, # May be removed if sensors get it from coordinator/entry
         "coordinator": coordinator,
+        # Options the running entry was set up with, to tell what an update changed
+        "options": dict(entry.options),
     }
 
     # Set up listener for options changes, automatically cleaned up on unload
-    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+    entry.async_on_unload(entry.add_update_listener(async_update_options))
 
     # Forward the setup to platforms.
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
+    if restored:
+        # Entities already show the restored values; refresh them without
+        # holding up Home Assistant startup on the SAIH API.
+        entry.async_create_background_task(
+            hass, coordinator.async_refresh(), f"{DOMAIN}_first_refresh_{entry.entry_id}"
+        )
+
     LOGGER.debug("CHJ SAIH integration setup complete for entry %s", entry.entry_id)
     return True
 
 
+async def _async_get_stations(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> tuple[list[str], dict[str, DeviceInfo]]:
+    """Return the variables of an entry and their devices.
+
+    A station list edited from the options replaces the one chosen when the
+    entry was created.
+    """
+    if station_ids := entry.options.get(CONF_STATIONS) or entry.data.get(CONF_STATIONS):
+        return station_ids, {}
+    return await _async_resolve_from_catalog(hass, entry)
+
+
+def _threshold_evaluator(
+    entry: ConfigEntry, thresholds: dict[str, StationThresholds]
+) -> ThresholdEvaluator | None:
+    """Return the evaluator of the entry thresholds, None if there are none."""
+    if not thresholds:
+        return None
+    return ThresholdEvaluator(
+        thresholds,
+        hysteresis=entry.options.get(
+            CONF_THRESHOLD_HYSTERESIS, DEFAULT_THRESHOLD_HYSTERESIS
+        )
+        / 100,
+    )
+
+
+async def _async_resolve_from_catalog(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> tuple[list[str], dict[str, DeviceInfo]]:
+    """Return the variables selected by station codes or filters and their devices.
+
+    Resolved from the catalog on every setup, so variables published later
+    for a station, a kind or a river are picked up without reconfiguring the
+    entry. Variables of the same physical station share a device.
+    """
+    try:
+        catalog = await async_get_catalog(hass)
+    except Exception as err:
+        raise ConfigEntryNotReady(f"Could not load the station catalog: {err}") from err
+
+    if station_codes := entry.options.get(CONF_STATION_CODES) or entry.data.get(
+        CONF_STATION_CODES
+    ):
+        station_ids = [
+            variable for code in station_codes for variable in catalog.by_station_code(code)
+        ]
+    else:
+        station_ids = catalog.select(
+            entry.data.get(CONF_VARIABLE_TYPES, []), entry.data.get(CONF_RIVERS, [])
+        )
+    if not station_ids:
+        raise ConfigEntryNotReady(f"No variables found in the catalog for {entry.title}")
+
+    devices: dict[str, DeviceInfo] = {}
+    station_devices: dict[str, DeviceInfo] = {}
+    for variable in station_ids:
+        if code := (catalog.get(variable) or {}).get("codigoEstacion"):
+            code = str(code)
+            if (device := station_devices.get(code)) is None:
+                device = station_devices[code] = catalog.device_info(code)
+            devices[variable] = device
+    return station_ids, devices
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     LOGGER.info("Unloading CHJ SAIH integration for entry %s", entry.entry_id)
@@ -76,8 +255,94 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     return unload_ok
 
 
-async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    """Handle an options update."""
-    LOGGER.debug("Reloading CHJ SAIH integration for entry %s due to options update", entry.entry_id)
-    await hass.config_entries.async_reload(entry.entry_id)
-    # async_unload_entry and async_setup_entry will be called automatically by HA
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the data stored for a deleted config entry."""
+    await Store(
+        hass, SNAPSHOT_STORAGE_VERSION, f"{SNAPSHOT_STORAGE_KEY}.{entry.entry_id}"
+    ).async_remove()
+
+
+async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply an options update to the running entry.
+
+    Station list, intervals, timeouts, staleness and thresholds are changed in place:
+    only the new stations are fetched and get entities, and the entities of
+    the removed ones are deleted. Options that change how the entry is built
+    (adaptive or aligned polling, extra sensors) still reload it.
+    """
+    runtime = hass.data[DOMAIN][entry.entry_id]
+    previous: dict = runtime["options"]
+    options = dict(entry.options)
+    if any(
+        previous.get(key, default) != options.get(key, default)
+        for key, default in _RELOAD_OPTIONS.items()
+    ):
+        LOGGER.debug("Reloading CHJ SAIH integration for entry %s due to options update", entry.entry_id)
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+    runtime["options"] = options
+
+    coordinator: ChjSaihDataUpdateCoordinator = runtime["coordinator"]
+    try:
+        station_ids, devices = await _async_get_stations(hass, entry)
+    except ConfigEntryNotReady as err:
+        LOGGER.error("Could not apply the new station list of %s: %s", entry.title, err)
+        station_ids, devices = coordinator.station_ids, coordinator.devices
+    scan_interval = entry.options.get(
+        CONF_SCAN_INTERVAL, entry.data.get(CONF_SCAN_INTERVAL)
+    )
+
+    coordinator.max_concurrency = max(
+        1, entry.options.get(CONF_MAX_CONCURRENCY, DEFAULT_MAX_CONCURRENCY)
+    )
+    coordinator.station_timeout = entry.options.get(CONF_STATION_TIMEOUT, DEFAULT_STATION_TIMEOUT)
+    coordinator.refresh_timeout = entry.options.get(CONF_REFRESH_TIMEOUT, DEFAULT_REFRESH_TIMEOUT)
+    coordinator.max_staleness = entry.options.get(CONF_MAX_STALENESS, DEFAULT_MAX_STALENESS)
+    thresholds = parse_thresholds(entry.options.get(CONF_THRESHOLDS))
+    if coordinator.scheduler is not None:
+        coordinator.scheduler.thresholds = thresholds
+    coordinator.async_set_interval(scan_interval)
+    coordinator.async_set_thresholds(_threshold_evaluator(entry, thresholds))
+
+    coordinator.hub.async_update_subscription(entry.entry_id, station_ids, scan_interval)
+    added, removed = coordinator.async_set_stations(station_ids, devices)
+    runtime[CONF_STATIONS] = station_ids
+    runtime[CONF_SCAN_INTERVAL] = scan_interval
+    LOGGER.info(
+        "Updated CHJ SAIH entry %s in place: %d stations added, %d removed, scan interval %s seconds",
+        entry.title,
+        len(added),
+        len(removed),
+        scan_interval,
+    )
+
+    if removed:
+        _async_remove_station_entities(hass, entry, removed)
+    if added:
+        # Fetched first, so the new entities start with their name and value
+        await coordinator.async_refresh_stations(added)
+        async_dispatcher_send(hass, SIGNAL_STATIONS_ADDED.format(entry.entry_id), added)
+
+
+@callback
+def _async_remove_station_entities(
+    hass: HomeAssistant, entry: ConfigEntry, station_ids: list[str]
+) -> None:
+    """Remove the entities of stations no longer monitored, and devices left empty."""
+    entity_registry = er.async_get(hass)
+    prefixes = tuple(f"{entry.entry_id}_{station_id}" for station_id in station_ids)
+    for entity_entry in er.async_entries_for_config_entry(entity_registry, entry.entry_id):
+        unique_id = entity_entry.unique_id
+        if any(
+            unique_id == prefix or unique_id.startswith(f"{prefix}_") for prefix in prefixes
+        ):
+            entity_registry.async_remove(entity_entry.entity_id)
+
+    device_registry = dr.async_get(hass)
+    for device in dr.async_entries_for_config_entry(device_registry, entry.entry_id):
+        if not er.async_entries_for_device(
+            entity_registry, device.id, include_disabled_entities=True
+        ):
+            device_registry.async_update_device(
+                device.id, remove_config_entry_id=entry.entry_id
+            )
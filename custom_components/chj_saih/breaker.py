@@ -0,0 +1,82 @@
+"""Per-station circuit breaker for the CHJ SAIH integration."""
+from __future__ import annotations
+
+from .const import (
+    BREAKER_BASE_BACKOFF,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_MAX_BACKOFF,
+    BREAKER_STATE_CLOSED,
+    BREAKER_STATE_HALF_OPEN,
+    BREAKER_STATE_OPEN,
+)
+
+
+class CircuitBreaker:
+    """Stop requesting a station that keeps failing.
+
+    After ``BREAKER_FAILURE_THRESHOLD`` consecutive failures the breaker
+    opens and requests are skipped for a backoff that doubles every time it
+    re-opens, up to ``BREAKER_MAX_BACKOFF``. Once the backoff has elapsed a
+    single probe request is let through (half-open): a success closes the
+    breaker, a failure opens it again. Times are monotonic seconds.
+    """
+
+    __slots__ = ("failures", "last_error", "opened_count", "retry_at", "state")
+
+    def __init__(self) -> None:
+        """Initialize a closed breaker."""
+        self.state = BREAKER_STATE_CLOSED
+        self.failures = 0  # Consecutive failures
+        self.opened_count = 0  # Consecutive openings, drives the backoff
+        self.retry_at = 0.0
+        self.last_error: str | None = None
+
+    @property
+    def backoff(self) -> float:
+        """Return the current open period in seconds."""
+        return min(
+            BREAKER_BASE_BACKOFF * 2 ** max(self.opened_count - 1, 0), BREAKER_MAX_BACKOFF
+        )
+
+    def allow_request(self, now: float) -> bool:
+        """Return True if the station may be requested now."""
+        if self.state == BREAKER_STATE_CLOSED:
+            return True
+        if self.state == BREAKER_STATE_OPEN and now >= self.retry_at:
+            self.state = BREAKER_STATE_HALF_OPEN
+            return True
+        # Open, or half-open with the probe already in flight
+        return False
+
+    def record_cancelled(self, now: float) -> None:
+        """Settle a request cancelled before it had an answer.
+
+        A cancelled probe tells nothing about the station: the breaker opens
+        again without a longer backoff, and the next request probes it.
+        """
+        if self.state == BREAKER_STATE_HALF_OPEN:
+            self.state = BREAKER_STATE_OPEN
+            self.retry_at = now
+
+    def record_success(self) -> bool:
+        """Record a successful request, return True if the breaker closed."""
+        was_closed = self.state == BREAKER_STATE_CLOSED
+        self.state = BREAKER_STATE_CLOSED
+        self.failures = 0
+        self.opened_count = 0
+        self.last_error = None
+        return not was_closed
+
+    def record_failure(self, error: str, now: float) -> bool:
+        """Record a failed request, return True if the breaker (re-)opened."""
+        self.failures += 1
+        self.last_error = error
+        if (
+            self.state == BREAKER_STATE_HALF_OPEN
+            or self.failures >= BREAKER_FAILURE_THRESHOLD
+        ):
+            self.state = BREAKER_STATE_OPEN
+            self.opened_count += 1
+            self.retry_at = now + self.backoff
+            return True
+        return False
@@ -0,0 +1,260 @@
+"""Persistent, indexed catalog of the CHJ SAIH stations (variables)."""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.selector import SelectOptionDict
+from homeassistant.helpers.storage import Store
+
+from .client import async_get_http_client
+from .const import (
+    CATALOG_STORAGE_KEY,
+    CATALOG_STORAGE_VERSION,
+    CATALOG_TTL,
+    DATA_CATALOG,
+    DOMAIN,
+    LOGGER,
+)
+from .models import station_model
+
+
+def _variable_type(station: dict[str, Any]) -> str | None:
+    """Return the kind of a catalog record, e.g. "Caudal" or "Nivel"."""
+    variable_type = station.get("tipoVariable")
+    if isinstance(variable_type, dict):
+        variable_type = variable_type.get("descripcion")
+    return variable_type or None
+
+
+class ChjSaihStationCatalog:
+    """Catalog of every SAIH variable, cached on disk and indexed in memory.
+
+    The catalog is loaded from HA storage and only downloaded from the SAIH
+    API when there is no stored copy. A stored copy older than
+    ``CATALOG_TTL`` is still served while a refresh runs in the background,
+    so lookups never wait on the network after the first load.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the catalog."""
+        self._hass = hass
+        self._store: Store[dict[str, Any]] = Store(
+            hass, CATALOG_STORAGE_VERSION, CATALOG_STORAGE_KEY
+        )
+        self._refresh_lock = asyncio.Lock()
+        self.fetched_at: float | None = None
+
+        # Indexes, rebuilt as a whole on every load/refresh
+        self._by_variable: dict[str, dict[str, Any]] = {}
+        self._by_station_code: dict[str, tuple[str, ...]] = {}
+        self._by_river: dict[str, tuple[str, ...]] = {}
+        self._by_type: dict[str, tuple[str, ...]] = {}
+        self._options: list[SelectOptionDict] = []
+        self._station_options: list[SelectOptionDict] = []
+        self._type_options: list[SelectOptionDict] = []
+        self._river_options: list[SelectOptionDict] = []
+
+    @property
+    def expired(self) -> bool:
+        """Return True if the catalog is missing or older than its TTL."""
+        return (
+            self.fetched_at is None
+            or time.time() - self.fetched_at > CATALOG_TTL.total_seconds()
+        )
+
+    def __contains__(self, variable: object) -> bool:
+        """Return True if the variable ID exists in the catalog."""
+        return variable in self._by_variable
+
+    def __len__(self) -> int:
+        """Return the number of variables in the catalog."""
+        return len(self._by_variable)
+
+    async def async_load(self) -> None:
+        """Load the catalog from storage, downloading it if needed."""
+        if (stored := await self._store.async_load()) is not None:
+            self._build_indexes(stored.get("stations", []), stored.get("fetched_at"))
+            LOGGER.debug("Loaded %d catalog entries from storage", len(self))
+
+        if not self._by_variable:
+            await self.async_refresh()
+        elif self.expired:
+            self.async_schedule_refresh()
+
+    def async_schedule_refresh(self) -> None:
+        """Refresh the catalog in the background."""
+        if self._refresh_lock.locked():
+            return
+        self._hass.async_create_background_task(
+            self._async_background_refresh(), f"{DOMAIN}_catalog_refresh"
+        )
+
+    async def _async_background_refresh(self) -> None:
+        """Refresh the catalog, keeping the stored copy on failure."""
+        try:
+            await self.async_refresh()
+        except Exception as err:  # noqa: BLE001 - a stale catalog is still usable
+            LOGGER.warning("Background refresh of the station catalog failed: %s", err)
+
+    async def async_refresh(self) -> None:
+        """Download the catalog from the SAIH API and persist it."""
+        async with self._refresh_lock:
+            stations = await async_get_http_client(self._hass).async_fetch_all_stations()
+            fetched_at = time.time()
+            self._build_indexes(stations, fetched_at)
+            await self._store.async_save({"fetched_at": fetched_at, "stations": stations})
+            LOGGER.info("Station catalog refreshed with %d entries", len(self))
+
+    def _build_indexes(self, stations: list[dict[str, Any]], fetched_at: float | None) -> None:
+        """Rebuild every lookup index from a list of catalog records."""
+        by_variable: dict[str, dict[str, Any]] = {}
+        by_station_code: dict[str, list[str]] = {}
+        by_river: dict[str, list[str]] = {}
+        by_type: dict[str, list[str]] = {}
+        # casefolded name -> name as published, for the selector options
+        river_names: dict[str, str] = {}
+        type_names: dict[str, str] = {}
+
+        for station in stations:
+            if not (variable := station.get("variable")):
+                continue
+            by_variable[variable] = station
+            if code := station.get("codigoEstacion"):
+                by_station_code.setdefault(str(code), []).append(variable)
+            if river := station.get("nombreRio"):
+                by_river.setdefault(river.casefold(), []).append(variable)
+                river_names.setdefault(river.casefold(), river)
+            if variable_type := _variable_type(station):
+                by_type.setdefault(variable_type.casefold(), []).append(variable)
+                type_names.setdefault(variable_type.casefold(), variable_type)
+
+        self._by_variable = by_variable
+        self._by_station_code = {k: tuple(v) for k, v in by_station_code.items()}
+        self._by_river = {k: tuple(v) for k, v in by_river.items()}
+        self._by_type = {k: tuple(v) for k, v in by_type.items()}
+        self._options = [
+            SelectOptionDict(value=variable, label=self.label(variable))
+            for variable in sorted(by_variable)
+        ]
+        self._station_options = [
+            SelectOptionDict(value=code, label=self.station_label(code))
+            for code in sorted(self._by_station_code)
+        ]
+        self._type_options = [
+            SelectOptionDict(value=key, label=f"{name} ({len(by_type[key])})")
+            for key, name in sorted(type_names.items())
+        ]
+        self._river_options = [
+            SelectOptionDict(value=key, label=f"{name} ({len(by_river[key])})")
+            for key, name in sorted(river_names.items())
+        ]
+        self.fetched_at = fetched_at
+
+    def get(self, variable: str) -> dict[str, Any] | None:
+        """Return the catalog record of a variable."""
+        return self._by_variable.get(variable)
+
+    def by_station_code(self, code: str) -> tuple[str, ...]:
+        """Return the variable IDs measured at a physical station."""
+        return self._by_station_code.get(str(code), ())
+
+    def by_river(self, river: str) -> tuple[str, ...]:
+        """Return the variable IDs located on a river."""
+        return self._by_river.get(river.casefold(), ())
+
+    def by_variable_type(self, variable_type: str) -> tuple[str, ...]:
+        """Return the variable IDs of a kind, e.g. every "Caudal" gauge."""
+        return self._by_type.get(variable_type.casefold(), ())
+
+    def select(self, variable_types: list[str], rivers: list[str]) -> list[str]:
+        """Return the variable IDs matching any of the types and any of the rivers.
+
+        An empty filter does not restrict; both empty selects nothing.
+        """
+        if not variable_types and not rivers:
+            return []
+        by_type = {v for t in variable_types for v in self.by_variable_type(t)}
+        by_river = {v for r in rivers for v in self.by_river(r)}
+        if variable_types and rivers:
+            selected = by_type & by_river
+        else:
+            selected = by_type or by_river
+        return sorted(selected)
+
+    def label(self, variable: str) -> str:
+        """Return a human readable label for a variable."""
+        if (station := self._by_variable.get(variable)) is None:
+            return variable
+        parts = [variable, station.get("descripcion") or ""]
+        if river := station.get("nombreRio"):
+            parts.append(f"({river})")
+        return " ".join(part for part in parts if part)
+
+    def station_name(self, code: str) -> str | None:
+        """Return the name of a physical station."""
+        for variable in self.by_station_code(code):
+            if name := self._by_variable[variable].get("nombreEstacion"):
+                return name
+        return None
+
+    def station_label(self, code: str) -> str:
+        """Return a human readable label for a physical station."""
+        parts = [code, self.station_name(code) or ""]
+        if variables := self.by_station_code(code):
+            if river := self._by_variable[variables[0]].get("nombreRio"):
+                parts.append(f"({river})")
+            parts.append(f"- {len(variables)} variables")
+        return " ".join(part for part in parts if part)
+
+    def device_info(self, code: str) -> DeviceInfo:
+        """Return the device of a physical station, shared by all its variables."""
+        variables = self.by_station_code(code)
+        river = self._by_variable[variables[0]].get("nombreRio") if variables else None
+        return DeviceInfo(
+            identifiers={(DOMAIN, code)},
+            name=self.station_name(code) or f"CHJ SAIH {code}",
+            manufacturer="CHJ Confederación Hidrográfica del Júcar",
+            model=station_model(code, river),
+            entry_type="service",
+        )
+
+    @property
+    def options(self) -> list[SelectOptionDict]:
+        """Return the catalog as selector options."""
+        return self._options
+
+    @property
+    def station_options(self) -> list[SelectOptionDict]:
+        """Return the physical stations as selector options."""
+        return self._station_options
+
+    @property
+    def type_options(self) -> list[SelectOptionDict]:
+        """Return the variable kinds as selector options."""
+        return self._type_options
+
+    @property
+    def river_options(self) -> list[SelectOptionDict]:
+        """Return the rivers as selector options."""
+        return self._river_options
+
+
+async def async_get_catalog(hass: HomeAssistant) -> ChjSaihStationCatalog:
+    """Return the shared station catalog, loading it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (catalog := domain_data.get(DATA_CATALOG)) is None:
+        catalog = domain_data[DATA_CATALOG] = ChjSaihStationCatalog(hass)
+    if not len(catalog):
+        try:
+            await catalog.async_load()
+        except Exception:
+            # Allow the next caller to retry the initial download
+            domain_data.pop(DATA_CATALOG, None)
+            raise
+    elif catalog.expired:
+        catalog.async_schedule_refresh()
+    return catalog
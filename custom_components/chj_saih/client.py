@@ -0,0 +1,270 @@
+"""HTTP client owned by the CHJ SAIH integration."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+import hashlib
+from typing import Any
+
+import aiohttp
+from aiohttp import hdrs
+import async_timeout
+
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.util.json import json_loads
+
+from chj_saih.config import API_URL, BASE_URL_STATION_LIST
+
+from .const import (
+    DATA_HTTP,
+    DOMAIN,
+    HTTP_CHUNK_SIZE,
+    HTTP_DNS_CACHE_TTL,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_LIMIT_PER_HOST,
+    LOGGER,
+    PRIORITY_CATALOG,
+    PRIORITY_SCHEDULED,
+    PRIORITY_USER,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_RATE,
+    SAIH_NUM_VALUES,
+    SAIH_PERIOD_GROUPING,
+    SAIH_STATION_TYPES,
+)
+from .ratelimit import ChjSaihRateLimiter
+
+# Returned instead of the payload when it did not change since the last request
+NOT_MODIFIED: Any = object()
+
+
+class _Validators:
+    """What is known about the last response of a resource."""
+
+    __slots__ = ("digest", "etag", "last_modified", "size")
+
+    def __init__(
+        self, etag: str | None, last_modified: str | None, digest: bytes, size: int
+    ) -> None:
+        """Initialize the validators."""
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.size = size
+
+
+class ChjSaihHttpClient:
+    """Pooled, conditional HTTP access to the SAIH API.
+
+    A dedicated session keeps connections to the SAIH hosts alive between
+    refreshes and negotiates compression. Resources fetched with a ``key``
+    are requested with ``If-None-Match``/``If-Modified-Since`` and, when the
+    server answers 304 or sends a body identical to the previous one (same
+    hash), ``NOT_MODIFIED`` is returned so the caller can skip parsing.
+    Every request waits for a token of the rate limiter first.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the client, the session is created on first use."""
+        self._hass = hass
+        self._session: aiohttp.ClientSession | None = None
+        self._validators: dict[str, _Validators] = {}
+        self._users = 0
+        self.limiter = ChjSaihRateLimiter(RATE_LIMIT_RATE, RATE_LIMIT_BURST)
+
+        self.requests = 0
+        self.bytes_received = 0  # Decompressed body bytes
+        self.not_modified = 0  # 304 answers
+        self.unchanged_bodies = 0  # 200 answers repeating the previous body
+        self.bytes_saved = 0  # Body bytes not transferred thanks to 304 answers
+        self.parses_saved = 0
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Return the session, creating it if needed."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit_per_host=HTTP_LIMIT_PER_HOST,
+                    keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+                    ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+                ),
+                headers={hdrs.ACCEPT_ENCODING: "gzip, deflate"},
+            )
+        return self._session
+
+    @callback
+    def async_acquire(self) -> CALLBACK_TYPE:
+        """Register a user of the client, return the callback releasing it.
+
+        The session is closed when the last user releases it.
+        """
+        self._users += 1
+
+        @callback
+        def _release() -> None:
+            self._users -= 1
+            if not self._users:
+                self._hass.async_create_task(self.async_close(), f"{DOMAIN}_http_close")
+
+        return _release
+
+    async def async_close(self) -> None:
+        """Close the session, it is recreated if the client is used again."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    @callback
+    def async_forget(self, key: str) -> None:
+        """Drop the validators of a resource no longer polled."""
+        self._validators.pop(key, None)
+
+    async def async_get_json(
+        self,
+        url: str,
+        key: str | None = None,
+        conditional: bool = False,
+        priority: int | None = PRIORITY_SCHEDULED,
+        timeout: float | None = None,
+    ) -> tuple[Any, int | None]:
+        """Return the decoded JSON body of ``url`` and its size in bytes.
+
+        Validators of resources with a ``key`` are remembered. When
+        ``conditional`` is set they are sent, and ``(NOT_MODIFIED, None)``
+        is returned if the resource did not change. The request first waits
+        for a rate limiter token of class ``priority``, unless it is None
+        because the caller already took one; ``timeout`` starts after that.
+        """
+        validators = self._validators.get(key) if key is not None else None
+        headers: dict[str, str] = {}
+        if conditional and validators is not None:
+            if validators.etag:
+                headers[hdrs.IF_NONE_MATCH] = validators.etag
+            if validators.last_modified:
+                headers[hdrs.IF_MODIFIED_SINCE] = validators.last_modified
+
+        if priority is not None:
+            await self.limiter.async_acquire(priority)
+        async with async_timeout.timeout(timeout), self.session.get(
+            url, headers=headers
+        ) as response:
+            self.requests += 1
+            if response.status == 304 and headers:
+                self.not_modified += 1
+                self.bytes_saved += validators.size
+                self.parses_saved += 1
+                return NOT_MODIFIED, None
+            response.raise_for_status()
+            body = await response.read()
+            etag = response.headers.get(hdrs.ETAG)
+            last_modified = response.headers.get(hdrs.LAST_MODIFIED)
+
+        self.bytes_received += len(body)
+        if key is not None:
+            digest = hashlib.blake2b(body, digest_size=16).digest()
+            self._validators[key] = _Validators(etag, last_modified, digest, len(body))
+            if conditional and validators is not None and validators.digest == digest:
+                self.unchanged_bodies += 1
+                self.parses_saved += 1
+                return NOT_MODIFIED, len(body)
+        return json_loads(body), len(body)
+
+    async def async_fetch_sensor_data(
+        self,
+        variable: str,
+        conditional: bool = False,
+        priority: int | None = PRIORITY_SCHEDULED,
+        timeout: float | None = None,
+    ) -> tuple[Any, int | None]:
+        """Return the ``[metadata, readings, extra]`` payload of a variable."""
+        return await self.async_get_json(
+            f"{API_URL}?v={variable}&t={SAIH_PERIOD_GROUPING}&d={SAIH_NUM_VALUES}",
+            key=variable,
+            conditional=conditional,
+            priority=priority,
+            timeout=timeout,
+        )
+
+    async def async_iter_sensor_data(
+        self, variable: str, num_values: int, timeout: float | None = None
+    ) -> AsyncIterator[bytes]:
+        """Yield the raw body of a long series of a variable as it arrives.
+
+        Nothing is cached or compared; the caller decodes the body
+        incrementally, so its size does not matter. Only user requests
+        download long series. ``timeout`` bounds the wait for the answer and
+        for each chunk, not the whole download.
+        """
+        url = f"{API_URL}?v={variable}&t={SAIH_PERIOD_GROUPING}&d={num_values}"
+        await self.limiter.async_acquire(PRIORITY_USER)
+        async with async_timeout.timeout(timeout):
+            response = await self.session.get(url)
+        async with response:
+            self.requests += 1
+            response.raise_for_status()
+            while True:
+                # The timeout must not span a yield, the caller's work is not part of it
+                async with async_timeout.timeout(timeout):
+                    chunk = await response.content.read(HTTP_CHUNK_SIZE)
+                if not chunk:
+                    return
+                self.bytes_received += len(chunk)
+                yield chunk
+
+    async def async_fetch_all_stations(self) -> list[dict[str, Any]]:
+        """Return the station lists of every sensor type, sorted by name.
+
+        A type that fails is skipped; if every type fails the first error is raised.
+        """
+        results = await asyncio.gather(
+            *(
+                self.async_get_json(
+                    f"{BASE_URL_STATION_LIST}?t={station_type}&id=",
+                    priority=PRIORITY_CATALOG,
+                )
+                for station_type in SAIH_STATION_TYPES
+            ),
+            return_exceptions=True,
+        )
+        stations: list[dict[str, Any]] = []
+        errors: list[BaseException] = []
+        for result in results:
+            if isinstance(result, BaseException):
+                errors.append(result)
+            elif isinstance(result[0], list):
+                stations.extend(result[0])
+        if errors and len(errors) == len(results):
+            raise errors[0]
+        for error in errors:
+            LOGGER.debug("Error fetching a station list: %s", error)
+        stations.sort(key=lambda station: station.get("nombre", ""))
+        return stations
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the traffic counters."""
+        return {
+            "requests": self.requests,
+            "bytes_received": self.bytes_received,
+            "not_modified": self.not_modified,
+            "unchanged_bodies": self.unchanged_bodies,
+            "bytes_saved": self.bytes_saved,
+            "parses_saved": self.parses_saved,
+            "users": self._users,
+            "rate_limiter": self.limiter.as_dict(),
+        }
+
+
+@callback
+def async_get_http_client(hass: HomeAssistant) -> ChjSaihHttpClient:
+    """Return the domain-wide HTTP client, creating it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (client := domain_data.get(DATA_HTTP)) is None:
+        client = domain_data[DATA_HTTP] = ChjSaihHttpClient(hass)
+
+        async def _async_close(_: Event) -> None:
+            await client.async_close()
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close)
+    return client
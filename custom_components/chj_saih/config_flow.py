@@ -4,18 +4,41 @@ import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.const import CONF_SCAN_INTERVAL
 from homeassistant.core import callback
-from homeassistant.helpers.aiohttp_client import async_get_clientsession # Added
+from homeassistant.helpers import selector
 import homeassistant.helpers.config_validation as cv
 import aiohttp # Added
 
-from chj_saih import fetch_all_stations # Added
-
+from .catalog import async_get_catalog
 from .const import (
     CONF_STATIONS,  # Added
+    CONF_STATION_CODES,
+    CONF_VARIABLE_TYPES,
+    CONF_RIVERS,
+    CONF_MAX_CONCURRENCY,
+    CONF_STATION_TIMEOUT,
+    CONF_REFRESH_TIMEOUT,
+    CONF_MAX_STALENESS,
+    CONF_ADAPTIVE_POLLING,
+    CONF_ALIGNED_POLLING,
+    CONF_MIN_INTERVAL,
+    CONF_MAX_INTERVAL,
+    CONF_THRESHOLDS,
+    CONF_THRESHOLD_HYSTERESIS,
+    CONF_DERIVED_SENSORS,
+    CONF_DIAGNOSTIC_SENSORS,
+    CONF_TIMESTAMP_SENSORS,
     DEFAULT_SCAN_INTERVAL,
+    DEFAULT_MIN_INTERVAL,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_STATION_TIMEOUT,
+    DEFAULT_REFRESH_TIMEOUT,
+    DEFAULT_MAX_STALENESS,
+    DEFAULT_THRESHOLD_HYSTERESIS,
     DOMAIN,
     LOGGER,
 )
+from .thresholds import parse_thresholds
 
 
 class ChjSaihConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -31,53 +54,149 @@ class ChjSaihConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     async def async_step_user(self, user_input=None):
         """Handle the initial step."""
+        return self.async_show_menu(
+            step_id="user", menu_options=["station", "bulk", "variables"]
+        )
+
+    async def async_step_station(self, user_input=None):
+        """Monitor every variable of one or more physical stations."""
+        errors = {}
+        try:
+            catalog = await async_get_catalog(self.hass)
+        except aiohttp.ClientError as e:
+            LOGGER.error(f"Error connecting to CHJ SAIH service: {e}")
+            return self.async_abort(reason="cannot_connect")
+        except Exception as e: # Catch any other unexpected errors loading the catalog
+            LOGGER.exception(f"Unexpected error loading the station catalog: {e}")
+            return self.async_abort(reason="unknown_error")
+
+        if user_input is not None:
+            station_codes = _clean_station_ids(user_input[CONF_STATION_CODES])
+            # One indexed lookup per station resolves all of its variables
+            variables = [
+                variable
+                for code in station_codes
+                for variable in catalog.by_station_code(code)
+            ]
+
+            if not station_codes:
+                errors[CONF_STATION_CODES] = "empty_station_list"
+            elif unknown_codes := [
+                code for code in station_codes if not catalog.by_station_code(code)
+            ]:
+                LOGGER.error(f"Unknown station codes entered: {unknown_codes}")
+                errors["base"] = "invalid_station_code"
+                catalog.async_schedule_refresh()
+            else:
+                user_input[CONF_STATION_CODES] = station_codes
+                title = (
+                    catalog.station_name(station_codes[0]) or station_codes[0]
+                    if len(station_codes) == 1
+                    else "CHJ SAIH"
+                )
+                LOGGER.info(
+                    f"Configuring CHJ SAIH with stations {station_codes}: {variables}"
+                )
+                return self.async_create_entry(title=title, data=user_input)
+
+        data_schema = vol.Schema(
+            {
+                vol.Required(
+                    CONF_STATION_CODES, default=[]
+                ): _station_selector(catalog.station_options),
+                vol.Optional(
+                    CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL
+                ): cv.positive_int,
+            }
+        )
+
+        return self.async_show_form(
+            step_id="station", data_schema=data_schema, errors=errors
+        )
+
+    async def async_step_bulk(self, user_input=None):
+        """Monitor every variable matching kind and river filters."""
+        errors = {}
+        try:
+            catalog = await async_get_catalog(self.hass)
+        except aiohttp.ClientError as e:
+            LOGGER.error(f"Error connecting to CHJ SAIH service: {e}")
+            return self.async_abort(reason="cannot_connect")
+        except Exception as e:  # noqa: BLE001 - catch any other unexpected errors loading the catalog
+            LOGGER.exception(f"Unexpected error loading the station catalog: {e}")
+            return self.async_abort(reason="unknown_error")
+
+        if user_input is not None:
+            variable_types = user_input.get(CONF_VARIABLE_TYPES, [])
+            rivers = user_input.get(CONF_RIVERS, [])
+            if not (variables := catalog.select(variable_types, rivers)):
+                errors["base"] = "empty_selection"
+            else:
+                LOGGER.info(
+                    f"Configuring CHJ SAIH bulk mode for types {variable_types} "
+                    f"and rivers {rivers}: {len(variables)} variables"
+                )
+                title = ", ".join([*variable_types, *rivers]).title()
+                return self.async_create_entry(title=title, data=user_input)
+
+        data_schema = vol.Schema(
+            {
+                vol.Optional(CONF_VARIABLE_TYPES, default=[]): _filter_selector(
+                    catalog.type_options
+                ),
+                vol.Optional(CONF_RIVERS, default=[]): _filter_selector(
+                    catalog.river_options
+                ),
+                vol.Optional(
+                    CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL
+                ): cv.positive_int,
+            }
+        )
+
+        return self.async_show_form(
+            step_id="bulk", data_schema=data_schema, errors=errors
+        )
+
+    async def async_step_variables(self, user_input=None):
+        """Monitor individual variables."""
         errors = {}  # Added
         # if self._async_current_entries(): # Removed
         #     return self.async_abort(reason="single_instance_allowed") # Removed
 
-        if user_input is not None:
-            try:
-                stations_str = user_input[CONF_STATIONS]
-                # Clean and split, removing empty strings from "id1,,id2"
-                station_ids_input = [s.strip() for s in stations_str.split(',') if s.strip()]
+        try:
+            # Served from disk after the first download, so retries after a
+            # typo do not hit the SAIH API again.
+            catalog = await async_get_catalog(self.hass)
+        except aiohttp.ClientError as e:
+            LOGGER.error(f"Error connecting to CHJ SAIH service: {e}")
+            return self.async_abort(reason="cannot_connect")
+        except Exception as e:  # noqa: BLE001 - catch any other unexpected errors loading the catalog
+            LOGGER.exception(f"Unexpected error loading the station catalog: {e}")
+            return self.async_abort(reason="unknown_error")
 
-                if not station_ids_input:
-                    errors[CONF_STATIONS] = "empty_station_list"
-                else:
-                    session = async_get_clientsession(self.hass)
-                    all_stations_data = await fetch_all_stations(session=session)
-
-                    valid_station_ids_from_api = {
-                        station['variable'] for station in all_stations_data if 'variable' in station
-                    }
-
-                    invalid_user_stations = [
-                        sid for sid in station_ids_input if sid not in valid_station_ids_from_api
-                    ]
-
-                    if invalid_user_stations:
-                        LOGGER.error(f"Invalid station IDs entered: {invalid_user_stations}")
-                        errors["base"] = "invalid_station_id"
-                        # For more specific feedback, you could add to errors[CONF_STATIONS]
-                        # errors[CONF_STATIONS] = f"The following station IDs are invalid: {', '.join(invalid_user_stations)}"
-                    else:
-                        # All stations are valid, store the cleaned list
-                        user_input[CONF_STATIONS] = station_ids_input
-                        LOGGER.info(f"Configuring CHJ SAIH with stations: {user_input[CONF_STATIONS]}")
-                        return self.async_create_entry(title="CHJ SAIH", data=user_input)
+        if user_input is not None:
+            station_ids_input = _clean_station_ids(user_input[CONF_STATIONS])
 
-            except aiohttp.ClientError as e:
-                LOGGER.error(f"Error connecting to CHJ SAIH service: {e}")
-                errors["base"] = "cannot_connect"
-            except Exception as e: # Catch any other unexpected errors during validation
-                LOGGER.exception(f"Unexpected error validating stations: {e}")
-                errors["base"] = "unknown_error"
+            if not station_ids_input:
+                errors[CONF_STATIONS] = "empty_station_list"
+            elif invalid_user_stations := [
+                sid for sid in station_ids_input if sid not in catalog
+            ]:
+                LOGGER.error(f"Invalid station IDs entered: {invalid_user_stations}")
+                errors["base"] = "invalid_station_id"
+                # The catalog may predate a newly published variable
+                catalog.async_schedule_refresh()
+            else:
+                # All stations are valid, store the cleaned list
+                user_input[CONF_STATIONS] = station_ids_input
+                LOGGER.info(f"Configuring CHJ SAIH with stations: {user_input[CONF_STATIONS]}")
+                return self.async_create_entry(title="CHJ SAIH", data=user_input)
 
         data_schema = vol.Schema(
             {
                 vol.Required(
-                    CONF_STATIONS, default=""
-                ): str,
+                    CONF_STATIONS, default=[]
+                ): _station_selector(catalog.options),
                 vol.Optional(
                     CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL
                 ): cv.positive_int,
@@ -85,8 +204,40 @@ class ChjSaihConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         )
 
         return self.async_show_form(
-            step_id="user", data_schema=data_schema, errors=errors  # Modified
+            step_id="variables", data_schema=data_schema, errors=errors  # Modified
+        )
+
+
+def _clean_station_ids(stations) -> list[str]:
+    """Return a de-duplicated list of station IDs from a list or a comma-separated string."""
+    if isinstance(stations, str):
+        stations = stations.split(',')
+    # Clean and split, removing empty strings from "id1,,id2"
+    return list(dict.fromkeys(s.strip() for s in stations if s.strip()))
+
+
+def _station_selector(options: list[selector.SelectOptionDict]) -> selector.SelectSelector:
+    """Return a searchable multi-select of catalog variables or stations."""
+    return selector.SelectSelector(
+        selector.SelectSelectorConfig(
+            options=options,
+            multiple=True,
+            # Still allow pasting IDs, they are validated against the catalog
+            custom_value=True,
+            mode=selector.SelectSelectorMode.DROPDOWN,
+        )
+    )
+
+
+def _filter_selector(options: list[selector.SelectOptionDict]) -> selector.SelectSelector:
+    """Return a multi-select of catalog filter values (kinds or rivers)."""
+    return selector.SelectSelector(
+        selector.SelectSelectorConfig(
+            options=options,
+            multiple=True,
+            mode=selector.SelectSelectorMode.DROPDOWN,
         )
+    )
 
 
 class ChjSaihOptionsFlowHandler(config_entries.OptionsFlow):
@@ -98,24 +249,147 @@ class ChjSaihOptionsFlowHandler(config_entries.OptionsFlow):
 
     async def async_step_init(self, user_input=None):
         """Manage the options."""
+        errors = {}
+        # Entries made of stations or variables can edit them; bulk entries
+        # follow their filters
+        station_key = next(
+            (key for key in (CONF_STATIONS, CONF_STATION_CODES) if key in self.config_entry.data),
+            None,
+        )
+        station_schema = {}
+        if station_key is not None:
+            try:
+                catalog = await async_get_catalog(self.hass)
+            except aiohttp.ClientError as e:
+                LOGGER.error(f"Error connecting to CHJ SAIH service: {e}")
+                return self.async_abort(reason="cannot_connect")
+            except Exception as e:  # noqa: BLE001 - catch any other unexpected errors loading the catalog
+                LOGGER.exception(f"Unexpected error loading the station catalog: {e}")
+                return self.async_abort(reason="unknown_error")
+            station_schema = {
+                vol.Required(
+                    station_key,
+                    default=self.config_entry.options.get(
+                        station_key, self.config_entry.data[station_key]
+                    ),
+                ): _station_selector(
+                    catalog.options if station_key == CONF_STATIONS else catalog.station_options
+                ),
+            }
+
         if user_input is not None:
-            LOGGER.debug(
-                "Updating entry %s with options: %s",
-                self.config_entry.title,
-                user_input,
-            )
-            return self.async_create_entry(title="", data=user_input)
+            if station_key is not None:
+                station_ids = _clean_station_ids(user_input[station_key])
+                if station_key == CONF_STATIONS:
+                    unknown = [sid for sid in station_ids if sid not in catalog]
+                else:
+                    unknown = [code for code in station_ids if not catalog.by_station_code(code)]
+                if not station_ids:
+                    errors[station_key] = "empty_station_list"
+                elif unknown:
+                    LOGGER.error(f"Unknown stations entered: {unknown}")
+                    errors["base"] = (
+                        "invalid_station_id" if station_key == CONF_STATIONS else "invalid_station_code"
+                    )
+                    catalog.async_schedule_refresh()
+                else:
+                    user_input[station_key] = station_ids
+            try:
+                parse_thresholds(user_input.get(CONF_THRESHOLDS))
+            except vol.Invalid as e:
+                LOGGER.error(f"Invalid thresholds: {e}")
+                errors[CONF_THRESHOLDS] = "invalid_thresholds"
+            if user_input.get(CONF_MIN_INTERVAL, DEFAULT_MIN_INTERVAL) > user_input.get(
+                CONF_MAX_INTERVAL, DEFAULT_MAX_INTERVAL
+            ):
+                errors[CONF_MAX_INTERVAL] = "invalid_interval_bounds"
+
+            if not errors:
+                LOGGER.debug(
+                    "Updating entry %s with options: %s",
+                    self.config_entry.title,
+                    user_input,
+                )
+                return self.async_create_entry(title="", data=user_input)
 
         return self.async_show_form(
             step_id="init",
+            errors=errors,
             data_schema=vol.Schema(
                 {
+                    **station_schema,
                     vol.Optional(
                         CONF_SCAN_INTERVAL,
                         default=self.config_entry.options.get(
                             CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL
                         ),
                     ): cv.positive_int,
+                    vol.Optional(
+                        CONF_MAX_CONCURRENCY,
+                        default=self.config_entry.options.get(
+                            CONF_MAX_CONCURRENCY, DEFAULT_MAX_CONCURRENCY
+                        ),
+                    ): cv.positive_int,
+                    vol.Optional(
+                        CONF_STATION_TIMEOUT,
+                        default=self.config_entry.options.get(
+                            CONF_STATION_TIMEOUT, DEFAULT_STATION_TIMEOUT
+                        ),
+                    ): cv.positive_int,
+                    vol.Optional(
+                        CONF_REFRESH_TIMEOUT,
+                        default=self.config_entry.options.get(
+                            CONF_REFRESH_TIMEOUT, DEFAULT_REFRESH_TIMEOUT
+                        ),
+                    ): cv.positive_int,
+                    vol.Optional(
+                        CONF_MAX_STALENESS,
+                        default=self.config_entry.options.get(
+                            CONF_MAX_STALENESS, DEFAULT_MAX_STALENESS
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                    vol.Optional(
+                        CONF_ADAPTIVE_POLLING,
+                        default=self.config_entry.options.get(CONF_ADAPTIVE_POLLING, False),
+                    ): cv.boolean,
+                    vol.Optional(
+                        CONF_ALIGNED_POLLING,
+                        default=self.config_entry.options.get(CONF_ALIGNED_POLLING, True),
+                    ): cv.boolean,
+                    vol.Optional(
+                        CONF_MIN_INTERVAL,
+                        default=self.config_entry.options.get(
+                            CONF_MIN_INTERVAL, DEFAULT_MIN_INTERVAL
+                        ),
+                    ): cv.positive_int,
+                    vol.Optional(
+                        CONF_MAX_INTERVAL,
+                        default=self.config_entry.options.get(
+                            CONF_MAX_INTERVAL, DEFAULT_MAX_INTERVAL
+                        ),
+                    ): cv.positive_int,
+                    vol.Optional(
+                        CONF_DERIVED_SENSORS,
+                        default=self.config_entry.options.get(CONF_DERIVED_SENSORS, False),
+                    ): cv.boolean,
+                    vol.Optional(
+                        CONF_DIAGNOSTIC_SENSORS,
+                        default=self.config_entry.options.get(CONF_DIAGNOSTIC_SENSORS, False),
+                    ): cv.boolean,
+                    vol.Optional(
+                        CONF_TIMESTAMP_SENSORS,
+                        default=self.config_entry.options.get(CONF_TIMESTAMP_SENSORS, False),
+                    ): cv.boolean,
+                    vol.Optional(
+                        CONF_THRESHOLDS,
+                        default=self.config_entry.options.get(CONF_THRESHOLDS, {}),
+                    ): selector.ObjectSelector(),
+                    vol.Optional(
+                        CONF_THRESHOLD_HYSTERESIS,
+                        default=self.config_entry.options.get(
+                            CONF_THRESHOLD_HYSTERESIS, DEFAULT_THRESHOLD_HYSTERESIS
+                        ),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0, max=50)),
                 }
             ),
         )
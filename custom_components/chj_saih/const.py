@@ -1,12 +1,163 @@
 """Constants for the CHJ SAIH integration."""
+from datetime import timedelta
 from logging import getLogger
 
 LOGGER = getLogger(__package__)
 
 DOMAIN = "chj_saih"
 
+# Time zone of the timestamps published by the SAIH
+SAIH_TIME_ZONE = "Europe/Madrid"
+
 DEFAULT_SCAN_INTERVAL = 1800  # seconds
 CONF_STATIONS = "stations"
+# Physical stations (codigoEstacion) whose variables are all monitored
+CONF_STATION_CODES = "station_codes"
+
+# Fetch engine
+CONF_MAX_CONCURRENCY = "max_concurrency"
+CONF_STATION_TIMEOUT = "station_timeout"
+CONF_REFRESH_TIMEOUT = "refresh_timeout"
+DEFAULT_MAX_CONCURRENCY = 8  # simultaneous requests to the SAIH API
+DEFAULT_STATION_TIMEOUT = 30  # seconds allowed for a single station
+DEFAULT_REFRESH_TIMEOUT = 120  # seconds allowed for a whole refresh
+
+# Adaptive polling
+CONF_ADAPTIVE_POLLING = "adaptive_polling"
+CONF_MIN_INTERVAL = "min_interval"
+CONF_MAX_INTERVAL = "max_interval"
+CONF_THRESHOLDS = "thresholds"
+DEFAULT_MIN_INTERVAL = 300  # seconds
+DEFAULT_MAX_INTERVAL = 3600  # seconds
+ADAPTIVE_FAST_CHANGE_RATE = 0.05  # fraction of the value per hour
+ADAPTIVE_STABLE_CHANGE_RATE = 0.005  # fraction of the value per hour
+ADAPTIVE_SHRINK_FACTOR = 0.5
+ADAPTIVE_STRETCH_FACTOR = 1.5
+ADAPTIVE_THRESHOLD_MARGIN = 0.1  # fraction of a threshold considered "near" it
+# Stations due this soon are fetched by the current wakeup, which Home
+# Assistant may run up to a second early (whole seconds plus jitter)
+SCHEDULER_DUE_SLACK = 1.0  # seconds
+SCHEDULER_MIN_WAKEUP = 1.0  # seconds, shortest wait between two wakeups
+
+# Publication-aligned polling: stations are fetched shortly after the SAIH is
+# expected to publish their next sample, learned from the samples fetched
+CONF_ALIGNED_POLLING = "aligned_polling"
+PUBLICATION_MARGIN = 30  # seconds, allowance for the jitter of the publications
+PUBLICATION_RETRY_DELAY = 60  # seconds before looking again for a late sample
+PUBLICATION_MAX_RETRIES = 3  # late looks before falling back to the polling interval
+PUBLICATION_WINDOW = 20  # samples the cadence and the delay are learned from
+
+# Threshold crossing events
+EVENT_THRESHOLD_CROSSED = "chj_saih_threshold_crossed"
+CONF_THRESHOLD_HYSTERESIS = "threshold_hysteresis"
+DEFAULT_THRESHOLD_HYSTERESIS = 5  # percent of a threshold to drop below before leaving its level
+
+# Long-term statistics
+STATISTICS_STORAGE_KEY = "chj_saih.statistics"
+STATISTICS_STORAGE_VERSION = 1
+STATISTICS_BATCH_SIZE = 500  # hourly rows per import call
+STATISTICS_SAVE_DELAY = 30  # seconds
+
+# Derived sensors
+CONF_DERIVED_SENSORS = "derived_sensors"
+DERIVED_WINDOWS = (1, 6, 24)  # hours
+
+# Last known good readings are served as stale for this long (seconds)
+# when their station cannot be fetched, before the entities go unavailable
+CONF_MAX_STALENESS = "max_staleness"
+DEFAULT_MAX_STALENESS = 3600
+
+# Last-known snapshot, restored at startup
+SNAPSHOT_STORAGE_KEY = "chj_saih.snapshot"  # Suffixed with the entry ID
+SNAPSHOT_STORAGE_VERSION = 1
+SNAPSHOT_SAVE_DELAY = 60  # seconds
+
+# Circuit breaker
+BREAKER_FAILURE_THRESHOLD = 3  # consecutive failures before a station is paused
+BREAKER_BASE_BACKOFF = 300  # seconds, doubled on every re-opening
+BREAKER_MAX_BACKOFF = 86400  # seconds
+BREAKER_STATE_CLOSED = "closed"
+BREAKER_STATE_OPEN = "open"
+BREAKER_STATE_HALF_OPEN = "half_open"
+
+# Telemetry
+CONF_DIAGNOSTIC_SENSORS = "diagnostic_sensors"
+TELEMETRY_WINDOW = 100  # fetches kept per station for the rolling percentiles
+
+# Opt-in sensors with the time of the latest reading of each station, which
+# the station sensor does not carry as an attribute
+CONF_TIMESTAMP_SENSORS = "timestamp_sensors"
+
+# Bulk mode: every variable of the catalog matching these filters
+CONF_VARIABLE_TYPES = "variable_types"
+CONF_RIVERS = "rivers"
+# Fetch tasks created at once; the next batch starts when one finishes
+FETCH_BATCH_SIZE = 50
+# Longest stretch (seconds) the event loop spends on entity updates before
+# yielding to other work; the rest of a refresh's updates follow next iteration
+LISTENER_SLICE = 0.01
+# Documented CPU budget per refreshed station (seconds), about twice the
+# 1.1-1.2 ms measured by scripts/benchmark/bench_refresh.py --server-process --no-memory
+REFRESH_CPU_BUDGET_PER_STATION = 0.002
+
+# HTTP client owned by the integration
+HTTP_LIMIT_PER_HOST = 16  # pooled connections to each SAIH host
+HTTP_KEEPALIVE_TIMEOUT = 60  # seconds an idle connection is kept open
+HTTP_DNS_CACHE_TTL = 300  # seconds
+HTTP_CHUNK_SIZE = 65536  # bytes read at a time from streamed bodies
+# Token bucket shared by every request to the SAIH
+RATE_LIMIT_RATE = 10  # requests per second
+RATE_LIMIT_BURST = 20  # requests sent at once after a quiet period
+# Priority classes of the requests, the lowest value is served first
+PRIORITY_SCHEDULED = 0  # refreshes of the monitored stations
+PRIORITY_USER = 1  # services and stations added from the options
+PRIORITY_CATALOG = 2  # station list downloads
+# Series requested per variable, the chj-saih library defaults
+SAIH_PERIOD_GROUPING = "ultimos5minutales"
+SAIH_NUM_VALUES = 30
+# Spacing of the points of that grouping (seconds)
+SAIH_SAMPLE_INTERVAL = 300
+# Samples the derived sensors keep per station: the longest window
+DERIVED_BUFFER_SIZE = max(DERIVED_WINDOWS) * 3600 // SAIH_SAMPLE_INTERVAL
+# Station list types: flow, temperature, reservoir, rain gauge
+SAIH_STATION_TYPES = ("a", "t", "e", "p")
+
+# Dispatcher signal sent with the stations added to an entry from the
+# options, formatted with the entry ID
+SIGNAL_STATIONS_ADDED = "chj_saih_stations_added_{}"
+
+# On demand refresh service
+SERVICE_REFRESH = "refresh"
+
+# History export service
+SERVICE_EXPORT_HISTORY = "export_history"
+EXPORT_DIR = "chj_saih"  # Under the configuration directory
+EXPORT_BATCH_SIZE = 1000  # points decoded, parsed and written at a time
+EXPORT_FORMATS = ("csv", "jsonl")
+# Points requested per variable at most, one year of samples
+EXPORT_MAX_VALUES = 366 * 24 * 3600 // SAIH_SAMPLE_INTERVAL
+EXPORT_READ_TIMEOUT = 30  # seconds to wait for the answer or the next chunk of a series
+
+# Profiling service, its reports are written to the export folder
+SERVICE_PROFILE = "profile"
+PROFILE_TIMEOUT = 3600  # default seconds to wait for the refresh cycles
+PROFILE_TOP = 30  # functions and allocation sites listed by default
+
+# Station catalog
+CATALOG_STORAGE_KEY = "chj_saih.catalog"
+CATALOG_STORAGE_VERSION = 1
+CATALOG_TTL = timedelta(days=7)
+
+# Keys shared by all entries under hass.data[DOMAIN]
+DATA_CATALOG = "catalog"
+DATA_HTTP = "http"
+DATA_HUB = "hub"
+DATA_STATISTICS = "statistics"
+
+# A reading fetched by another entry is reused if it is younger than the
+# shortest subscribed scan interval minus this tolerance (seconds), which
+# absorbs the scheduling jitter of the coordinators.
+FRESHNESS_TOLERANCE = 5
 
 # Platforms
 SENSOR = "sensor"
@@ -18,5 +169,8 @@ ATTR_DATA_URL = "data_url"
 ATTR_RIVER_NAME = "river_name"
 ATTR_STATION_NAME = "station_name"
 ATTR_STATION_ID = "station_id"
+ATTR_STALE = "stale"
+ATTR_LAST_FETCHED = "last_fetched"
+ATTR_BREAKER_STATE = "breaker_state"
 
 # Config Flow
@@ -1,28 +1,104 @@
-import async_timeout
-from datetime import datetime, timedelta
-import logging # Use LOGGER from .const instead if preferred globally
-import aiohttp
+import asyncio
+from collections.abc import Iterator
+from dataclasses import replace
+from datetime import timedelta
+from itertools import islice
+import time
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
-from chj_saih import fetch_sensor_data # Assuming this is the correct import path
+from .const import (
+    DOMAIN,
+    LOGGER,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_STATION_TIMEOUT,
+    DEFAULT_REFRESH_TIMEOUT,
+    DEFAULT_MAX_STALENESS,
+    EVENT_THRESHOLD_CROSSED,
+    FETCH_BATCH_SIZE,
+    LISTENER_SLICE,
+    PRIORITY_USER,
+    REFRESH_CPU_BUDGET_PER_STATION,
+    SCHEDULER_MIN_WAKEUP,
+    SNAPSHOT_SAVE_DELAY,
+    SNAPSHOT_STORAGE_KEY,
+    SNAPSHOT_STORAGE_VERSION,
+)
+from .derived import StationHistory
+from .hub import ChjSaihFetchHub
+from .models import StationDescriptor, StationReading
+from .parser import StationSeries
+from .scheduler import AdaptiveScheduler
+from .thresholds import ThresholdEvaluator
 
-from .const import DOMAIN, LOGGER, ATTR_LAST_UPDATE # Import necessary constants
+# Errors meaning the station could not be reached at all (as opposed to a
+# station that answered with no or unparsable readings).
+FETCH_FAILURE_ERRORS = {"timeout", "client_error", "unknown", "circuit_open"}
 
-class ChjSaihDataUpdateCoordinator(DataUpdateCoordinator[dict[str, dict]]):
+class ChjSaihDataUpdateCoordinator(DataUpdateCoordinator[dict[str, StationReading]]):
     """Class to manage fetching CHJ SAIH data from API."""
 
     def __init__(
         self,
         hass: HomeAssistant,
+        hub: ChjSaihFetchHub,
         station_ids: list[str],
         update_interval: timedelta,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        station_timeout: float = DEFAULT_STATION_TIMEOUT,
+        refresh_timeout: float = DEFAULT_REFRESH_TIMEOUT,
+        scheduler: AdaptiveScheduler | None = None,
+        derived_sensors: bool = False,
+        devices: dict[str, DeviceInfo] | None = None,
+        thresholds: ThresholdEvaluator | None = None,
+        max_staleness: float = DEFAULT_MAX_STALENESS,
     ) -> None:
         """Initialize."""
+        self.hub = hub
         self.station_ids = station_ids
         self._hass = hass # Store hass if needed for other purposes, like translations
+        self.max_concurrency = max(1, max_concurrency)
+        self.station_timeout = station_timeout
+        self.refresh_timeout = refresh_timeout
+        # When set, each station is polled on its own adaptive interval and
+        # update_interval only tells when the next station is due.
+        self.scheduler = scheduler
+
+        # Recent readings per station, kept only when derived sensors are enabled
+        self.derived_sensors = derived_sensors
+        self.histories: dict[str, StationHistory] = (
+            {station_id: StationHistory() for station_id in station_ids}
+            if derived_sensors
+            else {}
+        )
+
+        # Device of each variable when whole physical stations are monitored
+        self.devices: dict[str, DeviceInfo] = devices or {}
+
+        # Last good reading of each station and the wall time it was fetched,
+        # served as stale for up to max_staleness seconds when a fetch fails
+        self.max_staleness = max_staleness
+        self._last_good: dict[str, tuple[StationReading, float]] = {}
+
+        # Alert levels, evaluated once per changed reading at ingest
+        self.thresholds = thresholds
+
+        # Static metadata of each station, shared with every entry through the hub
+        self.descriptors: dict[str, StationDescriptor] = hub.descriptors
+
+        # Stations whose reading changed in the last refresh, used to notify
+        # only their entities. None means "notify everyone".
+        self._changed_stations: set[str] | None = None
+        self.skipped_writes = 0 # Entity updates skipped during the last refresh
+        # Process CPU time spent while refreshing, fetch phase plus entity updates
+        self.refresh_cpu_time: float | None = None
+        self._refresh_cpu: tuple[float, int] | None = None  # (fetch phase CPU, stations)
+        self._over_budget_logged = False
+        # Called when a refresh is over, entity updates included
+        self._refresh_done_listeners: list[CALLBACK_TYPE] = []
 
         super().__init__(
             hass,
@@ -31,118 +107,493 @@ class ChjSaihDataUpdateCoordinator(DataUpdateCoordinator[dict[str, dict]]):
             update_interval=update_interval,
         )
 
-    async def _async_update_data(self) -> dict[str, dict]:
+        # Last good data set, restored at startup so entities do not wait on the API
+        self._snapshot_store: Store[dict] = Store(
+            hass,
+            SNAPSHOT_STORAGE_VERSION,
+            f"{SNAPSHOT_STORAGE_KEY}.{self.config_entry.entry_id}",
+        )
+
+    async def async_restore_snapshot(self) -> bool:
+        """Load the last saved data set as stale readings, return True if there was one."""
+        if not (snapshot := await self._snapshot_store.async_load()):
+            return False
+        try:
+            for station_id, descriptor in snapshot.get("descriptors", {}).items():
+                self.hub.async_restore_descriptor(
+                    station_id, StationDescriptor.from_dict(descriptor)
+                )
+            readings = {
+                station_id: StationReading.from_dict(reading)
+                for station_id, reading in snapshot.get("readings", {}).items()
+                if station_id in self.station_ids
+            }
+            fetched_at: dict[str, float] = snapshot.get("fetched_at", {})
+        except (TypeError, ValueError) as err:
+            LOGGER.warning("Ignoring unreadable CHJ SAIH snapshot: %s", err)
+            return False
+        now = time.time()
+        data = {}
+        for station_id, reading in readings.items():
+            # Snapshots without fetch times: the sample time is a lower bound
+            last_fetched = fetched_at.get(station_id) or (
+                reading.timestamp.timestamp() if reading.timestamp else now
+            )
+            self._last_good[station_id] = (reading, last_fetched)
+            data[station_id] = replace(reading, stale=True, fetched_at=last_fetched)
+        self.data = data
+        # Start from the levels before the restart, so crossings while
+        # Home Assistant was down are reported by the first refresh
+        self.async_set_thresholds(self.thresholds)
+        LOGGER.debug("Restored %d readings from the last snapshot", len(data))
+        return True
+
+    @callback
+    def _async_save_snapshot(self) -> None:
+        """Save the current good readings and their descriptors (delayed, coalesced)."""
+
+        def _snapshot() -> dict:
+            readings = {
+                station_id: reading.as_dict()
+                for station_id, reading in (self.data or {}).items()
+                if not reading.error and reading.value is not None
+            }
+            return {
+                "readings": readings,
+                "fetched_at": {
+                    station_id: last_fetched
+                    for station_id, (_, last_fetched) in self._last_good.items()
+                    if station_id in readings
+                },
+                "descriptors": {
+                    station_id: self.descriptors[station_id].as_dict()
+                    for station_id in self.station_ids
+                    if station_id in self.descriptors
+                },
+            }
+
+        self._snapshot_store.async_delay_save(_snapshot, SNAPSHOT_SAVE_DELAY)
+
+    async def _async_update_data(self) -> dict[str, StationReading]:
         """Fetch data from API endpoint.
 
-        This is the place to pre-process the data to lookup tables
-        so entities can quickly look up their data.
+        Stations are requested from the shared hub, which skips stations
+        another entry fetched recently and joins fetches already in flight.
+        Stations are fetched concurrently, bounded by ``max_concurrency``.
+        Each station gets its own ``station_timeout`` and the whole refresh is
+        bounded by ``refresh_timeout``; when the refresh deadline is hit, the
+        stations that already finished are kept and only the pending ones are
+        marked as timed out.
         """
-        LOGGER.debug("Fetching data for stations: %s", self.station_ids)
-        session = async_get_clientsession(self._hass)
-        all_station_data_processed: dict[str, dict] = {}
+        now = time.monotonic()
+        if self.scheduler is not None:
+            station_ids = self.scheduler.due(now)
+        else:
+            station_ids = self.station_ids
+        if self.thresholds is not None:
+            # Stations at an alert level are requested first, so they get
+            # the rate limiter budget before the others
+            station_ids = sorted(
+                station_ids, key=lambda station_id: self.thresholds.level(station_id) is None
+            )
+        LOGGER.debug("Fetching data for stations: %s", station_ids)
+        # Until the refresh succeeds every listener must be told (availability changes)
+        self._changed_stations = None
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        all_station_data_processed: dict[str, StationReading] = {}
 
+        if not station_ids:
+            # Nothing was fetched, so no entity has anything new to write,
+            # unless the last refresh failed and availability comes back
+            self._changed_stations = set() if self.last_update_success else None
+            self._async_reschedule(now)
+            return dict(self.data or {})
+
+        cpu_started = time.process_time()
+        deadline = self._hass.loop.time() + self.refresh_timeout
+        tasks: dict[asyncio.Task, str] = {}
+        pending: set[asyncio.Task] = set()
+        queued = iter(station_ids)
+
+        def _start_fetches(count: int) -> None:
+            """Start the fetch of the next ``count`` queued stations."""
+            for station_id in islice(queued, count):
+                task = self._hass.async_create_task(
+                    self.hub.async_get_reading(
+                        station_id,
+                        semaphore,
+                        self.station_timeout,
+                        self.scheduler.max_age(station_id) if self.scheduler else None,
+                    ),
+                    f"{DOMAIN}_refresh_{station_id}",
+                )
+                tasks[task] = station_id
+                pending.add(task)
+
+        # At most FETCH_BATCH_SIZE tasks exist at a time, so refreshing
+        # hundreds of stations does not create hundreds of idle tasks.
+        _start_fetches(FETCH_BATCH_SIZE)
         try:
-            # Using async_timeout ensures the entire update process doesn't hang indefinitely.
-            # Adjust timeout as needed, e.g., 30 seconds per station or a total timeout.
-            # For simplicity, a total timeout for all stations:
-            async with async_timeout.timeout(30 * len(self.station_ids) if self.station_ids else 30):
-                for station_id in self.station_ids:
-                    try:
-                        LOGGER.debug("Fetching data for station_id: %s", station_id)
-                        raw_data = await fetch_sensor_data(variable=station_id, session=session)
-
-                        if not isinstance(raw_data, list) or len(raw_data) != 3:
-                            LOGGER.warning(
-                                "Unexpected data structure for station %s: %s",
-                                station_id,
-                                raw_data
-                            )
-                            # Store error or empty data for this station
-                            all_station_data_processed[station_id] = {"error": "unexpected_data_structure"}
-                            continue
-
-                        data_info = raw_data[0]
-                        readings_list = raw_data[1]
-
-                        if not readings_list: # No readings available
-                            LOGGER.info("No readings available for station %s.", station_id)
-                            all_station_data_processed[station_id] = {
-                                "value": None,
-                                "name": data_info.get('descripcion', f"CHJ SAIH {station_id}"),
-                                "unit": data_info.get('dimension') or data_info.get('tipoVariable', {}).get('unidades'),
-                                ATTR_LAST_UPDATE: None,
-                                "error": "no_readings",
-                                "metadata": data_info, # Still provide metadata
-                            }
-                            continue
-
-                        # Assume first reading is the most recent
-                        latest_reading = readings_list[0]
-                        timestamp_str, value_str = latest_reading[0], latest_reading[1]
-
-                        parsed_value = None
-                        try:
-                            parsed_value = float(value_str)
-                        except (ValueError, TypeError):
-                            LOGGER.warning(
-                                "Could not parse value '%s' for station %s", value_str, station_id
-                            )
-                            all_station_data_processed[station_id] = {
-                                "error": "value_parse_error",
-                                "name": data_info.get('descripcion', f"CHJ SAIH {station_id}"),
-                                "unit": data_info.get('dimension') or data_info.get('tipoVariable', {}).get('unidades'),
-                                "metadata": data_info,
-                            }
-                            continue
-
-                        parsed_timestamp = None
-                        try:
-                            dt_object = datetime.strptime(timestamp_str, '%d/%m/%Y %H:%M')
-                            # It's good practice to store datetimes in UTC in Home Assistant if possible,
-                            # or ensure they are timezone-aware. If the API provides naive datetimes,
-                            # Home Assistant will typically treat them as local system time.
-                            # For now, store as ISO string.
-                            parsed_timestamp = dt_object.isoformat()
-                        except (ValueError, TypeError):
-                            LOGGER.warning(
-                                "Could not parse timestamp '%s' for station %s", timestamp_str, station_id
-                            )
-                            # Continue processing, but timestamp will be missing or None
-
-                        all_station_data_processed[station_id] = {
-                            "value": parsed_value,
-                            "name": data_info.get('descripcion', f"CHJ SAIH {station_id}"),
-                            "unit": data_info.get('dimension') or data_info.get('tipoVariable', {}).get('unidades'),
-                            ATTR_LAST_UPDATE: parsed_timestamp,
-                            "metadata": data_info, # Store all metadata for potential use by entities
-                        }
-                        LOGGER.debug("Successfully processed data for station_id: %s", station_id)
-
-                    except aiohttp.ClientError as err:
-                        LOGGER.warning("Error fetching data for station %s: %s", station_id, err)
-                        all_station_data_processed[station_id] = {"error": "client_error", "details": str(err)}
-                        # Optionally, re-raise if one station failure should fail all:
-                        # raise UpdateFailed(f"Failed to fetch data for station {station_id}: {err}") from err
-                    except Exception as err:
-                        LOGGER.exception(
-                            "Unexpected error processing data for station %s: %s", station_id, err
-                        )
-                        all_station_data_processed[station_id] = {"error": "unknown", "details": str(err)}
-                        # Optionally, re-raise:
-                        # raise UpdateFailed(f"Unexpected error for station {station_id}: {err}") from err
-
-            if not all_station_data_processed and self.station_ids: # If all stations failed and there were stations to fetch
-                LOGGER.warning("No data successfully processed for any station.")
-                # Raise UpdateFailed if no station data could be retrieved and stations were configured.
-                # This helps in identifying a widespread issue vs. individual station problems.
-                raise UpdateFailed("Failed to process data for any configured station.")
-
-
-            return all_station_data_processed
-
-        except async_timeout.TimeoutError:
-            LOGGER.error("Timeout occurred while fetching CHJ SAIH data")
-            raise UpdateFailed("Timeout occurred while fetching CHJ SAIH data")
-        except Exception as err: # Catch-all for unexpected errors during setup or overall process
-            LOGGER.exception("Unhandled error in CHJ SAIH data update: %s", err)
-            raise UpdateFailed(f"Unhandled error in CHJ SAIH data update: {err}")
+            while pending and (remaining := deadline - self._hass.loop.time()) > 0:
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                _start_fetches(len(done))
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        for task in pending:
+            task.cancel()
+        not_started = list(queued)
+        if pending or not_started:
+            LOGGER.warning(
+                "Refresh deadline of %s seconds reached, %d of %d stations timed out",
+                self.refresh_timeout,
+                len(pending) + len(not_started),
+                len(station_ids),
+            )
+        if pending:
+            # Let the cancellations propagate before the tasks are dropped
+            await asyncio.wait(pending)
+
+        for task, station_id in tasks.items():
+            if task in pending:
+                all_station_data_processed[station_id] = StationReading(error="timeout")
+                continue
+            if (err := task.exception()) is not None:
+                LOGGER.error(
+                    "Unexpected error processing data for station %s: %s",
+                    station_id,
+                    err,
+                    exc_info=err,
+                )
+                all_station_data_processed[station_id] = StationReading(error="unknown", details=str(err))
+                continue
+            all_station_data_processed[station_id] = task.result()
+        for station_id in not_started:
+            all_station_data_processed[station_id] = StationReading(error="timeout")
+
+        # Failed stations are rescheduled too, whether or not the refresh fails,
+        # from what was fetched rather than the last good reading served
+        if self.scheduler is not None:
+            for station_id, reading in all_station_data_processed.items():
+                if station_id in self.station_ids:
+                    self.scheduler.record(station_id, reading, now)
+            self._async_reschedule(now)
+        self._apply_last_good(all_station_data_processed)
+        # Stations that were not due, or were added while the refresh ran,
+        # keep their reading; stations removed meanwhile are dropped
+        previous = self.data or {}
+        all_station_data_processed = {
+            station_id: reading
+            for station_id in self.station_ids
+            if (
+                reading := all_station_data_processed.get(station_id)
+                or previous.get(station_id)
+            )
+            is not None
+        }
+
+        if all_station_data_processed and all(
+            reading.error in FETCH_FAILURE_ERRORS
+            for reading in all_station_data_processed.values()
+        ):
+            # Raise UpdateFailed only if no monitored station has data, fetched
+            # now, kept from an earlier refresh or served from the last good
+            # readings. This helps in identifying a widespread issue vs.
+            # individual station problems.
+            LOGGER.warning("No data successfully processed for any station.")
+            raise UpdateFailed("Failed to process data for any configured station.")
+
+        changed_stations = self._diff_fingerprints(all_station_data_processed)
+        # After a failed refresh every entity has to re-evaluate its availability
+        self._changed_stations = changed_stations if self.last_update_success else None
+        if changed_stations:
+            self._async_save_snapshot()
+            if self.thresholds is not None:
+                self._async_check_thresholds(changed_stations, all_station_data_processed)
+        self._refresh_cpu = (time.process_time() - cpu_started, len(station_ids))
+        return all_station_data_processed
+
+    @callback
+    def async_set_thresholds(self, thresholds: ThresholdEvaluator | None) -> None:
+        """Replace the threshold evaluator, starting from the current readings.
+
+        The levels of the current readings are set without firing events.
+        """
+        self.thresholds = thresholds
+        if thresholds is None:
+            return
+        for station_id, reading in (self.data or {}).items():
+            if not reading.error and reading.value is not None:
+                thresholds.evaluate(station_id, reading.value)
+
+    @callback
+    def async_set_stations(
+        self, station_ids: list[str], devices: dict[str, DeviceInfo]
+    ) -> tuple[list[str], list[str]]:
+        """Change the monitored stations in place, return the added and removed ones.
+
+        Stations kept are untouched: their reading, history and adaptive
+        interval carry over. New stations have no reading until they are
+        fetched with ``async_refresh_stations`` or by the next refresh.
+        """
+        wanted = set(station_ids)
+        current = set(self.station_ids)
+        added = [station_id for station_id in station_ids if station_id not in current]
+        removed = [station_id for station_id in self.station_ids if station_id not in wanted]
+
+        self.station_ids = station_ids
+        self.devices = devices
+        if self.derived_sensors:
+            self.histories = {
+                station_id: self.histories.get(station_id) or StationHistory()
+                for station_id in station_ids
+            }
+        if self.scheduler is not None:
+            self.scheduler.set_stations(station_ids)
+        for station_id in removed:
+            self._last_good.pop(station_id, None)
+        if self.data is not None and removed:
+            self.data = {
+                station_id: reading
+                for station_id, reading in self.data.items()
+                if station_id in wanted
+            }
+        return added, removed
+
+    async def async_refresh_stations(
+        self, station_ids: list[str], max_age: float | None = None
+    ) -> dict[str, StationReading]:
+        """Fetch some stations now and update only their entities.
+
+        Runs outside the refresh schedule, which is left as it is. Fetches go
+        through the hub, so they join a fetch of the same station already in
+        flight, and are user requests for the rate limiter. ``max_age`` is
+        passed on to the hub.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results = await asyncio.gather(
+            *(
+                self.hub.async_get_reading(
+                    station_id, semaphore, self.station_timeout, max_age, PRIORITY_USER
+                )
+                for station_id in station_ids
+            ),
+            return_exceptions=True,
+        )
+        readings: dict[str, StationReading] = {}
+        for station_id, result in zip(station_ids, results, strict=True):
+            if isinstance(result, Exception):
+                LOGGER.error(
+                    "Unexpected error processing data for station %s: %s",
+                    station_id,
+                    result,
+                    exc_info=result,
+                )
+                result = StationReading(error="unknown", details=str(result))
+            readings[station_id] = result
+
+        # A station may have been removed while it was fetched
+        monitored = {
+            station_id: reading
+            for station_id, reading in readings.items()
+            if station_id in self.station_ids
+        }
+        if self.scheduler is not None:
+            now = time.monotonic()
+            for station_id, reading in monitored.items():
+                self.scheduler.record(station_id, reading, now)
+        self._apply_last_good(monitored)
+        changed_stations = self._diff_fingerprints(monitored)
+        self.data = {**(self.data or {}), **monitored}
+        if changed_stations:
+            self._async_save_snapshot()
+            if self.thresholds is not None:
+                self._async_check_thresholds(changed_stations, self.data)
+            self._changed_stations = changed_stations
+            self.async_update_listeners()
+        return readings
+
+    def _apply_last_good(self, data: dict[str, StationReading]) -> None:
+        """Remember good readings and replace failed ones by the last good one.
+
+        A station that fails keeps its last good reading, marked stale with
+        its age, for up to ``max_staleness`` seconds since it was fetched;
+        only then does it keep the error and its entities go unavailable.
+        """
+        now = time.time()
+        for station_id, reading in data.items():
+            if not reading.error and reading.value is not None:
+                if not reading.stale:
+                    self._last_good[station_id] = (reading, now)
+                continue
+            if (last_good := self._last_good.get(station_id)) is None:
+                continue
+            good_reading, last_fetched = last_good
+            if now - last_fetched > self.max_staleness:
+                continue
+            LOGGER.debug(
+                "Serving the last good reading of station %s (%s)", station_id, reading.error
+            )
+            data[station_id] = replace(good_reading, stale=True, fetched_at=last_fetched)
+
+    @callback
+    def async_process_series(self, station_id: str, series: StationSeries) -> None:
+        """Feed the new samples of a fetched series into the station history."""
+        if (history := self.histories.get(station_id)) is not None:
+            history.extend(series)
+
+    @callback
+    def _async_check_thresholds(
+        self, station_ids: set[str], data: dict[str, StationReading]
+    ) -> None:
+        """Fire an event for every changed reading that crossed a threshold."""
+        for station_id in station_ids:
+            if station_id not in self.thresholds:
+                continue
+            reading = data[station_id]
+            if reading.error or reading.value is None:
+                continue
+            if (crossing := self.thresholds.evaluate(station_id, reading.value)) is None:
+                continue
+            descriptor = self.descriptors.get(station_id)
+            LOGGER.info(
+                "Station %s crossed threshold %s going %s (%s -> %s), value %s",
+                station_id,
+                crossing.threshold,
+                crossing.direction,
+                crossing.previous_level,
+                crossing.level,
+                reading.value,
+            )
+            self._hass.bus.async_fire(
+                EVENT_THRESHOLD_CROSSED,
+                {
+                    "entry_id": self.config_entry.entry_id,
+                    "station_id": station_id,
+                    "station_name": descriptor.station_name if descriptor else None,
+                    "direction": crossing.direction,
+                    "level": crossing.level,
+                    "previous_level": crossing.previous_level,
+                    "threshold": crossing.threshold,
+                    "value": reading.value,
+                    "timestamp": reading.timestamp.isoformat() if reading.timestamp else None,
+                },
+            )
+
+    @callback
+    def async_set_interval(self, interval: float) -> None:
+        """Change the scan interval, waking up sooner if a station is due sooner."""
+        if self.scheduler is None:
+            # Takes effect from the next scheduled refresh
+            self.update_interval = timedelta(seconds=interval)
+            return
+        now = time.monotonic()
+        self.scheduler.set_interval(interval, now)
+        self._async_reschedule(now)
+        self._schedule_refresh()
+
+    def _async_reschedule(self, now: float) -> None:
+        """Wake up again when the next station is due."""
+        self.update_interval = timedelta(
+            seconds=max(self.scheduler.next_wakeup(now), SCHEDULER_MIN_WAKEUP)
+        )
+        LOGGER.debug("Next scheduled refresh in %s", self.update_interval)
+
+    def _diff_fingerprints(self, data: dict[str, StationReading]) -> set[str]:
+        """Return the stations whose reading differs from the previous refresh.
+
+        Readings compare by value, so the previous data set is the fingerprint.
+        """
+        previous = self.data or {}
+        return {
+            station_id
+            for station_id, reading in data.items()
+            if previous.get(station_id) != reading
+        }
+
+    @callback
+    def async_add_refresh_done_listener(self, listener: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Call ``listener`` when a refresh and its entity updates are over.
+
+        Only refreshes that requested stations count; a refresh that failed,
+        or found no station due, does not call it.
+        """
+        self._refresh_done_listeners.append(listener)
+
+        @callback
+        def _remove() -> None:
+            self._refresh_done_listeners.remove(listener)
+
+        return _remove
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update only the listeners of the stations that changed."""
+        changed_stations = self._changed_stations
+        self._changed_stations = None
+        if changed_stations is None:
+            self.skipped_writes = 0
+            listeners = list(self._listeners)
+        else:
+            listeners = [
+                key
+                for key, (_, station_id) in self._listeners.items()
+                if station_id is None or station_id in changed_stations
+            ]
+            self.skipped_writes = len(self._listeners) - len(listeners)
+            LOGGER.debug(
+                "Refresh changed %d stations, skipped %d entity state writes",
+                len(changed_stations),
+                self.skipped_writes,
+            )
+        self._async_run_listeners(iter(listeners), 0.0)
+
+    @callback
+    def _async_run_listeners(self, listeners: Iterator, cpu_time: float) -> None:
+        """Run entity updates for at most ``LISTENER_SLICE``, then yield the loop.
+
+        With hundreds of changed stations the state writes of one refresh are
+        spread over several event loop iterations instead of one long block.
+        """
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        finished = True
+        for key in listeners:
+            # The entity may have been removed while waiting for its slice
+            if (listener := self._listeners.get(key)) is not None:
+                listener[0]()
+            if time.perf_counter() - started >= LISTENER_SLICE:
+                finished = False
+                break
+        cpu_time += time.process_time() - cpu_started
+        if not finished:
+            self._hass.loop.call_soon(self._async_run_listeners, listeners, cpu_time)
+            return
+
+        if self._refresh_cpu is None:
+            # Listeners updated outside of a refresh
+            return
+        fetch_cpu_time, station_count = self._refresh_cpu
+        self._refresh_cpu = None
+        self.refresh_cpu_time = fetch_cpu_time + cpu_time
+        budget = REFRESH_CPU_BUDGET_PER_STATION * max(station_count, 1)
+        LOGGER.debug(
+            "Refresh of %d stations used %.1f ms of CPU (budget %.1f ms)",
+            station_count,
+            self.refresh_cpu_time * 1000,
+            budget * 1000,
+        )
+        if self.refresh_cpu_time > budget and not self._over_budget_logged:
+            self._over_budget_logged = True
+            LOGGER.warning(
+                "Refresh of %d stations used %.1f ms of CPU, over the budget of %.1f ms",
+                station_count,
+                self.refresh_cpu_time * 1000,
+                budget * 1000,
+            )
+        for listener in list(self._refresh_done_listeners):
+            listener()
@@ -0,0 +1,158 @@
+"""In-memory reading history and derived hydrological values."""
+from __future__ import annotations
+
+from array import array
+from collections import deque
+
+from .const import DERIVED_BUFFER_SIZE, DERIVED_WINDOWS
+from .parser import StationSeries
+
+
+class RingBuffer:
+    """Fixed-size, array-backed buffer of (epoch seconds, value) samples.
+
+    Samples are addressed by a sequence number that grows forever; only the
+    last ``capacity`` sequence numbers are still stored.
+    """
+
+    __slots__ = ("_times", "_values", "capacity", "count")
+
+    def __init__(self, capacity: int) -> None:
+        """Initialize the buffer."""
+        self._times = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        self.capacity = capacity
+        self.count = 0  # Samples appended so far
+
+    @property
+    def first_seq(self) -> int:
+        """Return the sequence number of the oldest stored sample."""
+        return max(0, self.count - self.capacity)
+
+    @property
+    def full(self) -> bool:
+        """Return True if the next append overwrites the oldest sample."""
+        return self.count >= self.capacity
+
+    def append(self, timestamp: float, value: float) -> int:
+        """Store a sample and return its sequence number."""
+        index = self.count % self.capacity
+        self._times[index] = timestamp
+        self._values[index] = value
+        self.count += 1
+        return self.count - 1
+
+    def time(self, seq: int) -> float:
+        """Return the timestamp of a stored sample."""
+        return self._times[seq % self.capacity]
+
+    def value(self, seq: int) -> float:
+        """Return the value of a stored sample."""
+        return self._values[seq % self.capacity]
+
+
+class _Window:
+    """Rolling sum, maximum and minimum over a time span of a ring buffer."""
+
+    __slots__ = ("max_seqs", "min_seqs", "span", "tail", "total")
+
+    def __init__(self, span: float) -> None:
+        self.span = span
+        self.tail = 0  # Sequence number of the oldest sample in the window
+        self.total = 0.0
+        # Monotonic queues of sequence numbers, front is the current max/min
+        self.max_seqs: deque[int] = deque()
+        self.min_seqs: deque[int] = deque()
+
+    def drop_oldest(self, buffer: RingBuffer) -> None:
+        """Remove the oldest sample of the window."""
+        self.total -= buffer.value(self.tail)
+        if self.max_seqs and self.max_seqs[0] == self.tail:
+            self.max_seqs.popleft()
+        if self.min_seqs and self.min_seqs[0] == self.tail:
+            self.min_seqs.popleft()
+        self.tail += 1
+
+    def push(self, buffer: RingBuffer, seq: int) -> None:
+        """Add the newest sample and evict the ones that fell out of the span."""
+        value = buffer.value(seq)
+        self.total += value
+        while self.max_seqs and buffer.value(self.max_seqs[-1]) <= value:
+            self.max_seqs.pop()
+        self.max_seqs.append(seq)
+        while self.min_seqs and buffer.value(self.min_seqs[-1]) >= value:
+            self.min_seqs.pop()
+        self.min_seqs.append(seq)
+
+        oldest_allowed = buffer.time(seq) - self.span
+        while self.tail < seq and buffer.time(self.tail) <= oldest_allowed:
+            self.drop_oldest(buffer)
+
+
+class StationHistory:
+    """Recent readings of one station and the values derived from them.
+
+    Each new sample costs O(1) amortized: the rolling windows keep running
+    sums and monotonic queues instead of rescanning the history. Windows are
+    measured back from the newest sample.
+    """
+
+    __slots__ = ("_buffer", "_windows", "rate")
+
+    def __init__(self, capacity: int = DERIVED_BUFFER_SIZE) -> None:
+        """Initialize the history."""
+        self._buffer = RingBuffer(capacity)
+        self._windows = {hours: _Window(hours * 3600) for hours in DERIVED_WINDOWS}
+        self.rate: float | None = None  # Change per hour between the last two samples
+
+    @property
+    def last_timestamp(self) -> float | None:
+        """Return the epoch of the newest sample."""
+        if not self._buffer.count:
+            return None
+        return self._buffer.time(self._buffer.count - 1)
+
+    def add(self, timestamp: float, value: float) -> bool:
+        """Add a sample, ignoring it if it is not newer than the last one."""
+        buffer = self._buffer
+        last_timestamp = self.last_timestamp
+        if last_timestamp is not None and timestamp <= last_timestamp:
+            return False
+
+        if buffer.full:
+            # The oldest sample is about to be overwritten
+            for window in self._windows.values():
+                if window.tail == buffer.first_seq:
+                    window.drop_oldest(buffer)
+
+        if last_timestamp is not None:
+            last_value = buffer.value(buffer.count - 1)
+            self.rate = (value - last_value) / ((timestamp - last_timestamp) / 3600)
+
+        seq = buffer.append(timestamp, value)
+        for window in self._windows.values():
+            window.push(buffer, seq)
+        return True
+
+    def extend(self, series: StationSeries) -> int:
+        """Add the new samples of a series, oldest first, return how many were new."""
+        added = 0
+        for timestamp, value in series:
+            added += self.add(timestamp, value)
+        return added
+
+    def maximum(self, hours: int) -> float | None:
+        """Return the maximum over the last ``hours``."""
+        window = self._windows[hours]
+        return self._buffer.value(window.max_seqs[0]) if window.max_seqs else None
+
+    def minimum(self, hours: int) -> float | None:
+        """Return the minimum over the last ``hours``."""
+        window = self._windows[hours]
+        return self._buffer.value(window.min_seqs[0]) if window.min_seqs else None
+
+    def total(self, hours: int) -> float | None:
+        """Return the sum of the samples over the last ``hours``."""
+        if not self._buffer.count:
+            return None
+        return round(self._windows[hours].total, 3)
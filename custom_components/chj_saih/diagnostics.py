@@ -0,0 +1,72 @@
+"""Diagnostics support for the CHJ SAIH integration."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .coordinator import ChjSaihDataUpdateCoordinator
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: ChjSaihDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+    hub = coordinator.hub
+    data = coordinator.data or {}
+
+    stations: dict[str, Any] = {}
+    for station_id in coordinator.station_ids:
+        reading = data.get(station_id)
+        breaker = hub.breakers.get(station_id)
+        telemetry = hub.telemetry.get(station_id)
+        publication = hub.publications.get(station_id)
+        stations[station_id] = {
+            "reading": {
+                "value": reading.value,
+                "timestamp": reading.timestamp.isoformat() if reading.timestamp else None,
+                "error": reading.error,
+                "stale": reading.stale,
+                "age": reading.age,
+            }
+            if reading
+            else None,
+            "breaker": {
+                "state": breaker.state,
+                "failures": breaker.failures,
+                "backoff": breaker.backoff,
+                "last_error": breaker.last_error,
+            }
+            if breaker
+            else None,
+            "telemetry": telemetry.as_dict() if telemetry else None,
+            "interval": coordinator.scheduler.interval(station_id)
+            if coordinator.scheduler
+            else coordinator.update_interval.total_seconds(),
+            "publication": publication.as_dict() if publication else None,
+            "subscribers": hub.subscriber_count(station_id),
+            "threshold_level": coordinator.thresholds.level(station_id)
+            if coordinator.thresholds
+            else None,
+        }
+
+    return {
+        "entry": {
+            "data": dict(entry.data),
+            "options": dict(entry.options),
+        },
+        "coordinator": {
+            "last_update_success": coordinator.last_update_success,
+            "update_interval": coordinator.update_interval.total_seconds()
+            if coordinator.update_interval
+            else None,
+            "skipped_writes": coordinator.skipped_writes,
+            "refresh_cpu_time": coordinator.refresh_cpu_time,
+            "max_staleness": coordinator.max_staleness,
+        },
+        "http": hub.http.as_dict(),
+        "stations": stations,
+    }
@@ -0,0 +1,316 @@
+"""Streaming export of SAIH series to compressed files."""
+from __future__ import annotations
+
+import codecs
+from collections.abc import AsyncIterator
+from contextlib import ExitStack, aclosing
+import csv
+from datetime import datetime
+import gzip
+import io
+import json
+import math
+import os
+import shutil
+import time
+from typing import Any
+
+import aiohttp
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+
+from .client import ChjSaihHttpClient, async_get_http_client
+from .const import (
+    EXPORT_BATCH_SIZE,
+    EXPORT_DIR,
+    EXPORT_MAX_VALUES,
+    EXPORT_READ_TIMEOUT,
+    LOGGER,
+    SAIH_SAMPLE_INTERVAL,
+)
+from .models import StationDescriptor
+from .parser import SAIH_TZ, StationSeries, parse_series
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+EXPORT_FIELDS = ("variable", "timestamp", "value", "unit", "station_name", "river_name")
+
+
+class _PayloadReader:
+    """Incremental decoder of a ``[metadata, readings, extra]`` SAIH body.
+
+    Only the undecoded tail of the body is buffered, so memory does not
+    depend on the length of the series.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes]) -> None:
+        """Initialize the reader."""
+        self._chunks = chunks
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    async def _async_fill(self) -> None:
+        """Append the next chunk to the buffer, dropping what was consumed."""
+        if self._eof:
+            raise ValueError("Truncated SAIH payload")
+        try:
+            chunk = await anext(self._chunks)
+        except StopAsyncIteration:
+            self._eof = True
+            text = self._decoder.decode(b"", final=True)
+        else:
+            text = self._decoder.decode(chunk)
+        self._buffer = self._buffer[self._pos :] + text
+        self._pos = 0
+
+    async def _async_peek(self) -> str:
+        """Skip whitespace and return the next character without consuming it."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            await self._async_fill()
+
+    async def _async_expect(self, chars: str) -> str:
+        """Consume the next character, which must be one of ``chars``."""
+        if (char := await self._async_peek()) not in chars:
+            raise ValueError(f"Unexpected {char!r} in SAIH payload")
+        self._pos += 1
+        return char
+
+    async def _async_value(self) -> Any:
+        """Decode the next JSON value, reading until it is complete."""
+        await self._async_peek()
+        while True:
+            try:
+                value, self._pos = _DECODER.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+                await self._async_fill()
+            else:
+                return value
+
+    async def async_metadata(self) -> dict[str, Any]:
+        """Return the metadata, the first element of the payload."""
+        await self._async_expect("[")
+        metadata = await self._async_value()
+        return metadata if isinstance(metadata, dict) else {}
+
+    async def async_batches(self, size: int) -> AsyncIterator[list]:
+        """Yield the readings, the second element of the payload, ``size`` at a time."""
+        if await self._async_expect(",]") == "]":
+            return
+        await self._async_expect("[")
+        if await self._async_peek() == "]":
+            return
+        batch: list = []
+        while True:
+            batch.append(await self._async_value())
+            last = await self._async_expect(",]") == "]"
+            if last or len(batch) >= size:
+                yield batch
+                batch = []
+            if last:
+                return
+
+
+class _ExportWriter:
+    """Gzip compressed CSV or JSONL file, written from the executor.
+
+    Rows go to a ``.part`` file renamed on close, so a failed export does not
+    leave a truncated file behind under the final name. The rows of each
+    variable are compressed to a file of their own, appended to the export
+    as one more gzip member only once the variable is complete, so a
+    variable that fails partway leaves no rows behind.
+    """
+
+    def __init__(self, path: str, file_format: str) -> None:
+        """Initialize the writer."""
+        self.path = path
+        self._partial_path = f"{path}.part"
+        self._variable_path = f"{path}.variable.part"
+        self._format = file_format
+        # Owners of the open files, closed whether the export finishes or not
+        self._files = ExitStack()
+        self._variable_files = ExitStack()
+        self._file: Any = None
+        self._variable_file: Any = None
+        self._csv: Any = None
+
+    def open(self) -> None:
+        """Create the file and write the CSV header."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with ExitStack() as files:
+            self._file = files.enter_context(open(self._partial_path, "wb"))
+            if self._format == "csv":
+                header = io.StringIO()
+                csv.writer(header).writerow(EXPORT_FIELDS)
+                self._file.write(gzip.compress(header.getvalue().encode("utf-8")))
+            self._files = files.pop_all()
+
+    def begin_variable(self) -> None:
+        """Start collecting the rows of a variable."""
+        with ExitStack() as files:
+            self._variable_file = files.enter_context(
+                gzip.open(self._variable_path, "wt", encoding="utf-8", newline="")
+            )
+            self._variable_files = files.pop_all()
+        if self._format == "csv":
+            self._csv = csv.writer(self._variable_file)
+
+    def commit_variable(self) -> None:
+        """Append the rows of the current variable to the export."""
+        self._variable_files.close()
+        self._variable_file = None
+        with open(self._variable_path, "rb") as variable_file:
+            shutil.copyfileobj(variable_file, self._file)
+        os.remove(self._variable_path)
+
+    def discard_variable(self) -> None:
+        """Drop the rows of the current variable."""
+        self._variable_files.close()
+        self._variable_file = None
+        if os.path.exists(self._variable_path):
+            os.remove(self._variable_path)
+
+    def write(
+        self,
+        descriptor: StationDescriptor,
+        series: StationSeries,
+        start: float,
+        end: float,
+    ) -> int:
+        """Write the points of a series within ``[start, end]``, newest first."""
+        epochs, values = series.epochs, series.values
+        metadata = (descriptor.unit, descriptor.station_name, descriptor.river_name)
+        rows = 0
+        for index in range(len(epochs) - 1, -1, -1):
+            if not start <= epochs[index] <= end:
+                continue
+            row = (
+                descriptor.station_id,
+                datetime.fromtimestamp(epochs[index], SAIH_TZ).isoformat(),
+                values[index],
+                *metadata,
+            )
+            if self._csv is not None:
+                self._csv.writerow(row)
+            else:
+                self._variable_file.write(
+                    json.dumps(dict(zip(EXPORT_FIELDS, row, strict=True)), ensure_ascii=False)
+                )
+                self._variable_file.write("\n")
+            rows += 1
+        return rows
+
+    def close(self) -> int:
+        """Finish the file, return its size in bytes."""
+        self._files.close()
+        os.replace(self._partial_path, self.path)
+        return os.path.getsize(self.path)
+
+    def abort(self) -> None:
+        """Close and delete the partial files."""
+        self.discard_variable()
+        self._files.close()
+        if os.path.exists(self._partial_path):
+            os.remove(self._partial_path)
+
+
+async def async_export_history(
+    hass: HomeAssistant,
+    variables: list[str],
+    start: datetime,
+    end: datetime | None,
+    file_format: str,
+    filename: str,
+) -> dict[str, Any]:
+    """Export the series of some variables between two times to a file.
+
+    The file is ``filename`` under the ``chj_saih`` folder of the
+    configuration directory. Each variable is downloaded, decoded, parsed
+    and written ``EXPORT_BATCH_SIZE`` points at a time, one variable after
+    another, so memory stays bounded however long the range is. Variables
+    that fail are reported and left out of the file, even the rows they
+    had written; if every variable fails, no file is written.
+    """
+    start_ts = start.timestamp()
+    end_ts = end.timestamp() if end is not None else time.time()
+    # The SAIH serves the last N points of a variable: ask for enough to reach
+    # start, up to a year back
+    num_values = min(
+        math.ceil((time.time() - start_ts) / SAIH_SAMPLE_INTERVAL) + 1, EXPORT_MAX_VALUES
+    )
+    http = async_get_http_client(hass)
+    writer = _ExportWriter(hass.config.path(EXPORT_DIR, filename), file_format)
+
+    rows: dict[str, int] = {}
+    errors: dict[str, str] = {}
+    await hass.async_add_executor_job(writer.open)
+    try:
+        for variable in variables:
+            await hass.async_add_executor_job(writer.begin_variable)
+            try:
+                exported = await _async_export_variable(
+                    hass, http, writer, variable, num_values, start_ts, end_ts
+                )
+            except (TimeoutError, aiohttp.ClientError, ValueError) as err:
+                errors[variable] = str(err) or type(err).__name__
+                LOGGER.warning(
+                    "Could not export the history of %s: %s", variable, errors[variable]
+                )
+                await hass.async_add_executor_job(writer.discard_variable)
+            else:
+                await hass.async_add_executor_job(writer.commit_variable)
+                rows[variable] = exported
+        if not rows:
+            raise HomeAssistantError(f"Could not export any of the variables: {errors}")
+    except BaseException:
+        await hass.async_add_executor_job(writer.abort)
+        raise
+    size = await hass.async_add_executor_job(writer.close)
+
+    LOGGER.info(
+        "Exported %d readings of %d variables to %s (%d bytes)",
+        sum(rows.values()),
+        len(rows),
+        writer.path,
+        size,
+    )
+    return {"path": writer.path, "bytes": size, "rows": rows, "errors": errors}
+
+
+async def _async_export_variable(
+    hass: HomeAssistant,
+    http: ChjSaihHttpClient,
+    writer: _ExportWriter,
+    variable: str,
+    num_values: int,
+    start: float,
+    end: float,
+) -> int:
+    """Stream the series of one variable into the writer, return the rows written."""
+    rows = 0
+    chunks = http.async_iter_sensor_data(variable, num_values, EXPORT_READ_TIMEOUT)
+    async with aclosing(chunks):
+        reader = _PayloadReader(chunks)
+        descriptor = StationDescriptor.from_metadata(variable, await reader.async_metadata())
+        newer: float | None = None
+        async for batch in reader.async_batches(EXPORT_BATCH_SIZE):
+            series = parse_series(batch, newer=newer)
+            if not series:
+                continue
+            newer = series.epochs[0]
+            if series.epochs[-1] >= start and series.epochs[0] <= end:
+                rows += await hass.async_add_executor_job(
+                    writer.write, descriptor, series, start, end
+                )
+            if series.epochs[0] < start:
+                # Newest first: the rest of the series is older than the range
+                break
+    return rows
@@ -0,0 +1,364 @@
+"""Domain-wide fetch hub shared by every CHJ SAIH config entry."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import time
+from typing import Any
+
+import aiohttp
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .breaker import CircuitBreaker
+from .client import NOT_MODIFIED, async_get_http_client
+from .const import DATA_HUB, DOMAIN, FRESHNESS_TOLERANCE, LOGGER, PRIORITY_SCHEDULED
+from .models import StationDescriptor, StationReading
+from .parser import StationSeries, parse_series
+from .publication import StationPublication
+from .telemetry import ChjSaihTelemetry
+
+SeriesListener = Callable[[str, StationSeries], None]
+
+
+class ChjSaihFetchHub:
+    """Own all upstream fetching of SAIH stations.
+
+    Config entries subscribe to the variables they track together with their
+    scan interval. A station is requested at most once per the shortest
+    interval among its subscribers: a refresh asking for a station that was
+    fetched recently enough gets the cached reading, and concurrent requests
+    for the same station share a single in-flight fetch.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the hub."""
+        self._hass = hass
+        self.http = async_get_http_client(hass)
+        # variable ID -> {entry ID: scan interval in seconds}
+        self._subscriptions: dict[str, dict[str, float]] = {}
+        # entry ID -> variable IDs it is subscribed to
+        self._entry_stations: dict[str, set[str]] = {}
+        # variable ID -> (monotonic time the fetch started, reading)
+        self._cache: dict[str, tuple[float, StationReading]] = {}
+        self._inflight: dict[str, asyncio.Task[StationReading]] = {}
+        # Static metadata of each station, shared by every entry
+        self.descriptors: dict[str, StationDescriptor] = {}
+        # Stations whose descriptor was restored from a snapshot, replaced by
+        # the metadata of their first download
+        self._provisional_descriptors: set[str] = set()
+        # Failing stations stop being requested until their backoff elapses
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self.telemetry = ChjSaihTelemetry()
+        # Learned publication timing of each station
+        self.publications: dict[str, StationPublication] = {}
+        # Consumers of the full reading series of every fetched station
+        self._series_listeners: list[SeriesListener] = []
+
+    @callback
+    def async_subscribe(
+        self, entry_id: str, station_ids: list[str], interval: float
+    ) -> CALLBACK_TYPE:
+        """Subscribe an entry to a set of stations, return the unsubscribe callback.
+
+        The callback drops whatever the entry is subscribed to at that time,
+        including changes made with ``async_update_subscription``.
+        """
+        self.async_update_subscription(entry_id, station_ids, interval)
+
+        @callback
+        def _unsubscribe() -> None:
+            self.async_update_subscription(entry_id, [], interval)
+
+        return _unsubscribe
+
+    @callback
+    def async_update_subscription(
+        self, entry_id: str, station_ids: list[str], interval: float
+    ) -> None:
+        """Replace the stations and interval an entry is subscribed to."""
+        wanted = set(station_ids)
+        for station_id in self._entry_stations.pop(entry_id, set()) - wanted:
+            subscribers = self._subscriptions.get(station_id)
+            if subscribers is None:
+                continue
+            subscribers.pop(entry_id, None)
+            if not subscribers:
+                # Last reference gone, forget everything about the station
+                del self._subscriptions[station_id]
+                self._cache.pop(station_id, None)
+                self.descriptors.pop(station_id, None)
+                self._provisional_descriptors.discard(station_id)
+                self.breakers.pop(station_id, None)
+                self.telemetry.stations.pop(station_id, None)
+                self.publications.pop(station_id, None)
+                self.http.async_forget(station_id)
+        for station_id in wanted:
+            self._subscriptions.setdefault(station_id, {})[entry_id] = interval
+        if wanted:
+            self._entry_stations[entry_id] = wanted
+
+    @callback
+    def async_restore_descriptor(self, station_id: str, descriptor: StationDescriptor) -> None:
+        """Use a stored descriptor until the station is downloaded.
+
+        A descriptor already known is kept.
+        """
+        if station_id not in self.descriptors:
+            self.descriptors[station_id] = descriptor
+            self._provisional_descriptors.add(station_id)
+
+    @callback
+    def async_add_series_listener(self, listener: SeriesListener) -> CALLBACK_TYPE:
+        """Call ``listener`` with the parsed series of every station fetched."""
+        self._series_listeners.append(listener)
+
+        @callback
+        def _remove() -> None:
+            self._series_listeners.remove(listener)
+
+        return _remove
+
+    @callback
+    def _async_dispatch_series(self, station_id: str, series: StationSeries) -> None:
+        """Hand the parsed series of a station to the listeners."""
+        if not self._series_listeners or not series:
+            return
+        for listener in list(self._series_listeners):
+            try:
+                listener(station_id, series)
+            except Exception:  # noqa: BLE001 - one consumer must not break the fetch
+                LOGGER.exception("Error processing the series of station %s", station_id)
+
+    def subscriber_count(self, station_id: str) -> int:
+        """Return how many entries reference a station."""
+        return len(self._subscriptions.get(station_id, ()))
+
+    def max_age(self, station_id: str) -> float:
+        """Return how old a cached reading may be before it is fetched again."""
+        if not (subscribers := self._subscriptions.get(station_id)):
+            return 0
+        return min(subscribers.values()) - FRESHNESS_TOLERANCE
+
+    def next_fetch(self, station_id: str, interval: float) -> float | None:
+        """Return the seconds until a station is worth fetching, aligned to its publications.
+
+        None while its publication timing is unknown.
+        """
+        if (publication := self.publications.get(station_id)) is None:
+            return None
+        return publication.next_fetch(time.time(), interval)
+
+    async def async_get_reading(
+        self,
+        station_id: str,
+        semaphore: asyncio.Semaphore,
+        station_timeout: float,
+        max_age: float | None = None,
+        priority: int = PRIORITY_SCHEDULED,
+    ) -> StationReading:
+        """Return the reading of a station, fetching it only if needed.
+
+        ``max_age`` lets a caller polling a station faster than its subscribed
+        interval ask for a fresher reading. ``priority`` is the rate limiter
+        class of the request; callers joining a fetch in flight share its
+        class.
+        """
+        if (cached := self._cache.get(station_id)) is not None:
+            fetched_at, reading = cached
+            allowed_age = self.max_age(station_id)
+            if max_age is not None:
+                allowed_age = min(allowed_age, max_age - FRESHNESS_TOLERANCE)
+            if time.monotonic() - fetched_at < allowed_age:
+                LOGGER.debug("Reusing recent reading of station %s", station_id)
+                return reading
+
+        if (task := self._inflight.get(station_id)) is None:
+            breaker = self.breakers.setdefault(station_id, CircuitBreaker())
+            if not breaker.allow_request(time.monotonic()):
+                LOGGER.debug("Circuit open for station %s, skipping request", station_id)
+                if (publication := self.publications.get(station_id)) is not None:
+                    publication.record_failure()
+                return StationReading(error="circuit_open", details=breaker.last_error)
+            task = self._inflight[station_id] = self._hass.async_create_task(
+                self._async_fetch(station_id, semaphore, station_timeout, priority),
+                f"{DOMAIN}_fetch_{station_id}",
+            )
+            task.add_done_callback(lambda _: self._inflight.pop(station_id, None))
+        else:
+            LOGGER.debug("Joining in-flight fetch of station %s", station_id)
+
+        # A caller giving up (e.g. its refresh deadline) must not cancel the
+        # fetch other callers are waiting on.
+        return await asyncio.shield(task)
+
+    async def _async_fetch(
+        self,
+        station_id: str,
+        semaphore: asyncio.Semaphore,
+        station_timeout: float,
+        priority: int,
+    ) -> StationReading:
+        """Fetch a station, update its breaker and telemetry and cache the result."""
+        breaker = self.breakers.setdefault(station_id, CircuitBreaker())
+        payload_points = payload_bytes = parse_time = None
+        # A payload identical to the one behind the cached reading is not parsed
+        # again, unless that reading is an error
+        previous = self._cache.get(station_id)
+        conditional = previous is not None and not previous[1].error
+        try:
+            async with semaphore:
+                # Waiting for the rate limiter is not part of the latency
+                await self.http.limiter.async_acquire(priority)
+                fetched_at = time.monotonic()
+                requested_at = time.time()
+                raw_data, payload_bytes, reading = await self._async_download(
+                    station_id, station_timeout, conditional=conditional
+                )
+                latency = time.monotonic() - fetched_at
+            if reading is None and raw_data is NOT_MODIFIED:
+                LOGGER.debug("Data of station %s did not change, not parsing it", station_id)
+                reading = previous[1]
+            elif reading is None:
+                parse_started = time.perf_counter()
+                reading = self._process_station(station_id, raw_data)
+                parse_time = time.perf_counter() - parse_started
+                payload_points = len(raw_data[1] or ())
+        except asyncio.CancelledError:
+            # A half-open breaker must not wait forever for a cancelled probe
+            breaker.record_cancelled(time.monotonic())
+            raise
+        except Exception as err:
+            self.http.async_forget(station_id)
+            self._record_failure(station_id, breaker, "unknown", str(err))
+            self.telemetry.record_error(station_id, "unknown")
+            raise
+
+        self.telemetry.record(
+            station_id, reading, latency, parse_time, payload_points, payload_bytes
+        )
+        if reading.timestamp is not None and not reading.error:
+            self.publications.setdefault(station_id, StationPublication()).record_fetch(
+                reading.timestamp.timestamp(), requested_at
+            )
+        if reading.error:
+            # The next download must not be answered as unchanged from this one
+            self.http.async_forget(station_id)
+            self._record_failure(station_id, breaker, reading.error, reading.details)
+        elif breaker.record_success():
+            LOGGER.info("Station %s is answering again, circuit closed", station_id)
+
+        if station_id in self._subscriptions:
+            self._cache[station_id] = (fetched_at, reading)
+        return reading
+
+    def _record_failure(
+        self, station_id: str, breaker: CircuitBreaker, error: str, details: str | None
+    ) -> None:
+        """Record a failed fetch, logging only the first failure and breaker openings."""
+        # Failures bound the short retries of a late sample like misses do
+        if (publication := self.publications.get(station_id)) is not None:
+            publication.record_failure()
+        if breaker.record_failure(error, time.monotonic()):
+            LOGGER.warning(
+                "Station %s failed %d times in a row (%s), pausing its requests for %d seconds",
+                station_id,
+                breaker.failures,
+                error,
+                breaker.backoff,
+            )
+        elif breaker.failures == 1:
+            LOGGER.warning("Error fetching data for station %s: %s %s", station_id, error, details or "")
+
+    async def _async_download(
+        self, station_id: str, station_timeout: float, conditional: bool
+    ) -> tuple[Any, int | None, StationReading | None]:
+        """Download the raw data of a station and its size, or the reading of the error.
+
+        The caller holds a concurrency slot and a rate limiter token, and the
+        per-station deadline only starts now, so time spent queued behind
+        other stations is not charged to this one. With ``conditional`` the
+        raw data is ``NOT_MODIFIED`` when it did not change since the last
+        download.
+        """
+        try:
+            LOGGER.debug("Fetching data for station_id: %s", station_id)
+            raw_data, payload_bytes = await self.http.async_fetch_sensor_data(
+                station_id,
+                conditional=conditional,
+                priority=None,
+                timeout=station_timeout,
+            )
+        except TimeoutError:
+            LOGGER.debug(
+                "Timeout after %s seconds fetching data for station %s",
+                station_timeout,
+                station_id,
+            )
+            return None, None, StationReading(error="timeout")
+        except aiohttp.ClientError as err:
+            LOGGER.debug("Error fetching data for station %s: %s", station_id, err)
+            return None, None, StationReading(error="client_error", details=str(err))
+        except ValueError as err:
+            LOGGER.debug("Invalid JSON received for station %s: %s", station_id, err)
+            return None, None, StationReading(error="unexpected_data_structure", details=str(err))
+
+        if raw_data is NOT_MODIFIED:
+            return raw_data, payload_bytes, None
+        if not isinstance(raw_data, list) or len(raw_data) != 3:
+            LOGGER.debug(
+                "Unexpected data structure for station %s: %s",
+                station_id,
+                raw_data
+            )
+            # Store error or empty data for this station
+            return None, payload_bytes, StationReading(error="unexpected_data_structure")
+        return raw_data, payload_bytes, None
+
+    @callback
+    def _process_station(self, station_id: str, raw_data: list) -> StationReading:
+        """Process the raw data of a single station into its latest reading."""
+        data_info = raw_data[0]
+        readings_list = raw_data[1]
+
+        # Static metadata is parsed only the first time a station answers, or
+        # when its descriptor was restored, in case it changed upstream since
+        if station_id not in self.descriptors or station_id in self._provisional_descriptors:
+            self._provisional_descriptors.discard(station_id)
+            descriptor = StationDescriptor.from_metadata(station_id, data_info)
+            # Entities only update their static attributes for a new descriptor
+            if descriptor != self.descriptors.get(station_id):
+                self.descriptors[station_id] = descriptor
+
+        if not readings_list: # No readings available
+            LOGGER.info("No readings available for station %s.", station_id)
+            return StationReading(error="no_readings")
+
+        # The API sends a whole series, not only the latest reading
+        series = parse_series(readings_list)
+        self.publications.setdefault(station_id, StationPublication()).record_series(series)
+        if series.invalid:
+            LOGGER.debug(
+                "Dropped %d of %d readings of station %s that could not be parsed",
+                series.invalid,
+                len(readings_list),
+                station_id,
+            )
+        self._async_dispatch_series(station_id, series)
+
+        # Newest valid point; a single bad sample does not hide the series
+        if (latest := series.latest()) is None:
+            return StationReading(error="value_parse_error")
+        timestamp, value = latest
+
+        LOGGER.debug("Successfully processed data for station_id: %s", station_id)
+        return StationReading(value=value, timestamp=timestamp)
+
+
+@callback
+def async_get_hub(hass: HomeAssistant) -> ChjSaihFetchHub:
+    """Return the domain-wide fetch hub, creating it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (hub := domain_data.get(DATA_HUB)) is None:
+        hub = domain_data[DATA_HUB] = ChjSaihFetchHub(hass)
+    return hub
@@ -0,0 +1,113 @@
+"""Data models for the CHJ SAIH integration."""
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from sys import intern
+import time
+from typing import Any
+
+
+def _intern(value: Any) -> str | None:
+    """Intern a metadata string so repeated values share one object."""
+    if value is None or value == "":
+        return None
+    return intern(str(value))
+
+
+def station_model(station_code: str, river_name: str | None) -> str:
+    """Return the device model of a physical station, naming its river."""
+    if river_name:
+        return f"Station Code: {station_code} ({river_name})"
+    return f"Station Code: {station_code}"
+
+
+@dataclass(frozen=True, slots=True)
+class StationDescriptor:
+    """Static metadata of a SAIH variable, parsed once from the API metadata."""
+
+    station_id: str  # The 'variable' ID
+    name: str
+    unit: str | None = None
+    station_name: str | None = None
+    station_code: str | None = None
+    river_name: str | None = None
+    is_rain_gauge: bool = False
+
+    @classmethod
+    def from_metadata(cls, station_id: str, metadata: dict[str, Any]) -> StationDescriptor:
+        """Build a descriptor from the metadata returned by the SAIH API."""
+        name = metadata.get('descripcion') or f"CHJ SAIH {station_id}"
+        variable_type = metadata.get('tipoVariable') or {}
+        unit = metadata.get('dimension') or variable_type.get('unidades')
+        kind = f"{name} {variable_type.get('descripcion') or ''}".casefold()
+        return cls(
+            station_id=intern(station_id),
+            name=intern(name),
+            unit=_intern(unit),
+            station_name=_intern(metadata.get('nombreEstacion')),
+            station_code=_intern(metadata.get('codigoEstacion')),
+            river_name=_intern(metadata.get('nombreRio')),
+            is_rain_gauge=(
+                str(unit).casefold() in ("mm", "l/m2", "l/m²")
+                or any(word in kind for word in ("lluvia", "pluvi", "precipita"))
+            ),
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the descriptor as a JSON serializable dict."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> StationDescriptor:
+        """Rebuild a descriptor stored with ``as_dict``."""
+        return cls(
+            **{
+                key: intern(value) if isinstance(value, str) else value
+                for key, value in data.items()
+            }
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class StationReading:
+    """Latest reading of a SAIH variable, or the error that prevented it.
+
+    Readings compare by value, so two refreshes returning the same sample
+    produce equal records. ``stale`` marks a last known good reading served
+    because the station could not be fetched, or restored from the last
+    snapshot; ``fetched_at`` is then the epoch time it was last fetched,
+    which does not take part in comparisons so a stale reading served again
+    is not a change.
+    """
+
+    value: float | None = None
+    timestamp: datetime | None = None
+    error: str | None = None
+    details: str | None = None
+    stale: bool = False
+    fetched_at: float | None = field(default=None, compare=False)
+
+    @property
+    def age(self) -> int | None:
+        """Return the seconds since a stale reading was last fetched."""
+        if self.fetched_at is None:
+            return None
+        return max(0, round(time.time() - self.fetched_at))
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the reading as a JSON serializable dict."""
+        return {
+            "value": self.value,
+            "timestamp": self.timestamp.isoformat() if self.timestamp else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any], stale: bool = False) -> StationReading:
+        """Rebuild a reading stored with ``as_dict``."""
+        timestamp = data.get("timestamp")
+        return cls(
+            value=data.get("value"),
+            timestamp=datetime.fromisoformat(timestamp) if timestamp else None,
+            stale=stale,
+        )
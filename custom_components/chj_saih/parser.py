@@ -0,0 +1,203 @@
+"""Parser of the reading series published by the SAIH."""
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import UTC, date, datetime
+from math import isfinite
+import time
+from typing import Any
+from zoneinfo import ZoneInfo
+
+from .const import SAIH_TIME_ZONE
+
+# Resolved at import time, which happens outside the event loop
+SAIH_TZ = ZoneInfo(SAIH_TIME_ZONE)
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_OFFSET_CACHE_SIZE = 4096  # local hours, several months of series
+
+# Local hour (hours since the epoch, wall clock) -> UTC offsets in seconds of
+# its first and second occurrence. Both are equal except in the hour repeated
+# when summer time ends.
+_offsets: dict[int, tuple[int, int]] = {}
+
+
+@dataclass(frozen=True, slots=True)
+class StationSeries:
+    """Full reading series of a variable as parallel arrays, oldest first.
+
+    ``epochs`` holds UTC epoch seconds and ``values`` the matching readings.
+    ``invalid`` counts the points of the payload that were dropped because
+    their timestamp or value could not be parsed.
+    """
+
+    epochs: array
+    values: array
+    invalid: int = 0
+
+    def __len__(self) -> int:
+        """Return the number of valid points."""
+        return len(self.epochs)
+
+    def __iter__(self) -> Iterator[tuple[float, float]]:
+        """Iterate over (epoch, value) points, oldest first."""
+        return zip(self.epochs, self.values, strict=True)
+
+    def latest(self) -> tuple[datetime, float] | None:
+        """Return the newest point as an aware SAIH local time and its value."""
+        if not self.epochs:
+            return None
+        return datetime.fromtimestamp(self.epochs[-1], SAIH_TZ), self.values[-1]
+
+
+def _local_epoch(text: Any, days: dict[str, int | None]) -> int | None:
+    """Return a ``dd/mm/YYYY HH:MM`` wall clock time as seconds since the epoch.
+
+    ``days`` caches the parsed date part, shared by most points of a series.
+    """
+    if (
+        not isinstance(text, str)
+        or len(text) != 16
+        or text[10] != " "
+        or text[13] != ":"
+    ):
+        return None
+    day_text = text[:10]
+    if (day := days.get(day_text, -1)) == -1:
+        day = days[day_text] = _day_epoch(day_text)
+    if day is None:
+        return None
+    try:
+        hour = int(text[11:13])
+        minute = int(text[14:16])
+    except ValueError:
+        return None
+    if not 0 <= hour < 24 or not 0 <= minute < 60:
+        return None
+    return day + hour * 3600 + minute * 60
+
+
+def _day_epoch(text: str) -> int | None:
+    """Return a ``dd/mm/YYYY`` date as seconds since the epoch."""
+    if text[2] != "/" or text[5] != "/":
+        return None
+    try:
+        day = date(int(text[6:10]), int(text[3:5]), int(text[0:2]))
+    except ValueError:
+        return None
+    return (day.toordinal() - _EPOCH_ORDINAL) * 86400
+
+
+def _utc_offsets(local_hour: int) -> tuple[int, int]:
+    """Return the UTC offsets of a local hour, cached across calls."""
+    if (offsets := _offsets.get(local_hour)) is None:
+        if len(_offsets) >= _OFFSET_CACHE_SIZE:
+            _offsets.clear()
+        wall = datetime.fromtimestamp(local_hour * 3600, UTC).replace(tzinfo=SAIH_TZ)
+        offsets = _offsets[local_hour] = (
+            int(wall.utcoffset().total_seconds()),
+            int(wall.replace(fold=1).utcoffset().total_seconds()),
+        )
+    return offsets
+
+
+def _coerce_values(readings_list: list) -> tuple[array, bytearray | None]:
+    """Convert the values of a series to floats.
+
+    The whole column is converted at once; only if that fails is it walked
+    point by point, returning a flag per point set for the values that are
+    missing, not numeric or not finite.
+    """
+    try:
+        values = array("d", [float(reading[1]) for reading in readings_list])
+    except (IndexError, KeyError, TypeError, ValueError):
+        pass
+    else:
+        if all(map(isfinite, values)):
+            return values, None
+
+    values = array("d", bytes(8 * len(readings_list)))
+    invalid = bytearray(len(readings_list))
+    for index, reading in enumerate(readings_list):
+        try:
+            value = float(reading[1])
+        except (IndexError, KeyError, TypeError, ValueError):
+            invalid[index] = 1
+            continue
+        if isfinite(value):
+            values[index] = value
+        else:
+            invalid[index] = 1
+    return values, invalid
+
+
+def parse_series(
+    readings_list: list, now: float | None = None, newer: float | None = None
+) -> StationSeries:
+    """Parse the readings of a SAIH payload, newest first, into a series.
+
+    Timestamps are Spanish wall clock time without offset. In the hour that
+    repeats when summer time ends, the second occurrence is assumed unless it
+    would be in the future or not older than the newer point before it in the
+    payload. Points with a bad timestamp or value, and repeated timestamps,
+    are dropped and counted as invalid; parsing never raises.
+
+    A long payload can be parsed in consecutive chunks by passing as
+    ``newer`` the oldest epoch of the previous chunk.
+    """
+    if now is None:
+        now = time.time()
+    values, invalid_values = _coerce_values(readings_list)
+    epochs = array("d")
+    kept = array("d")
+    invalid = 0
+    sorted_desc = True
+    days: dict[str, int | None] = {}
+
+    for index, reading in enumerate(readings_list):
+        if invalid_values is not None and invalid_values[index]:
+            invalid += 1
+            continue
+        try:
+            local = _local_epoch(reading[0], days)
+        except (IndexError, KeyError, TypeError):
+            local = None
+        if local is None:
+            invalid += 1
+            continue
+
+        first, second = _utc_offsets(local // 3600)
+        epoch = local - first
+        if first != second:
+            later = local - second
+            if later <= now and (newer is None or later < newer):
+                epoch = later
+
+        if newer is not None:
+            if epoch == newer:
+                invalid += 1
+                continue
+            if epoch > newer:
+                sorted_desc = False
+        epochs.append(epoch)
+        kept.append(values[index])
+        newer = epoch
+
+    if sorted_desc:
+        epochs.reverse()
+        kept.reverse()
+    else:
+        # Out of order payload: sort, keeping the first occurrence of a timestamp
+        points: dict[float, float] = {}
+        for epoch, value in zip(epochs, kept, strict=True):
+            if epoch in points:
+                invalid += 1
+            else:
+                points[epoch] = value
+        ordered = sorted(points)
+        epochs = array("d", ordered)
+        kept = array("d", [points[epoch] for epoch in ordered])
+
+    return StationSeries(epochs, kept, invalid)
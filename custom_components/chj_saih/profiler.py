@@ -0,0 +1,218 @@
+"""Profiling of the refresh cycles with cProfile and tracemalloc."""
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import selectors
+import sys
+import time
+import tracemalloc
+from typing import Any
+
+import async_timeout
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import dt as dt_util
+
+from .const import EXPORT_DIR, LOGGER
+from .coordinator import ChjSaihDataUpdateCoordinator
+
+_PACKAGE_DIR = os.path.dirname(__file__)
+
+# Functions of the integration whose cumulative event loop time makes each
+# phase of a refresh. Parsing runs inside the fetch and is taken out of it.
+PROFILE_PHASES = {
+    "fetch": ("hub.py", "_async_fetch"),
+    "parse": ("hub.py", "_process_station"),
+    "post_processing": ("coordinator.py", "_async_update_data"),
+    "entity_writes": ("coordinator.py", "_async_run_listeners"),
+}
+
+# Allocations of the profilers themselves are not reported
+_TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, pstats.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+)
+
+
+def _ensure_not_profiling() -> None:
+    """Raise if cProfile or another profiler already hooks the event loop."""
+    if sys.getprofile() is not None:
+        raise HomeAssistantError("Another profiler is already running")
+
+
+def _phase_times(stats: pstats.Stats) -> dict[str, float]:
+    """Return the event loop seconds spent in each phase of the refreshes."""
+    wanted = {
+        (os.path.join(_PACKAGE_DIR, filename), function): phase
+        for phase, (filename, function) in PROFILE_PHASES.items()
+    }
+    phases = dict.fromkeys(PROFILE_PHASES, 0.0)
+    idle = 0.0
+    for (filename, _, function), (_, _, _, cumulative, _) in stats.stats.items():
+        if (phase := wanted.get((filename, function))) is not None:
+            phases[phase] += cumulative
+        elif filename == selectors.__file__ and function == "select":
+            # The event loop waiting for I/O or timers
+            idle += cumulative
+    phases["fetch"] = max(0.0, phases["fetch"] - phases["parse"])
+    # The rest of Home Assistant, and the connection handling of aiohttp
+    phases["other"] = max(0.0, stats.total_tt - sum(phases.values()) - idle)
+    phases["idle"] = idle
+    return phases
+
+
+class _ProfileReport:
+    """Text report of a profile, built and written from the executor."""
+
+    def __init__(self, path: str, top: int, started_tracing: bool) -> None:
+        """Initialize the report."""
+        self.path = path
+        self._top = top
+        # tracemalloc is stopped after the report only if the profile started it
+        self.started_tracing = started_tracing
+        self._baseline: tracemalloc.Snapshot | None = None
+
+    def take_baseline(self) -> None:
+        """Snapshot the memory traced before the profile, when tracing already ran."""
+        if not self.started_tracing:
+            self._baseline = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+
+    def abort(self) -> None:
+        """Stop tracing if the profile started it."""
+        if self.started_tracing:
+            tracemalloc.stop()
+
+    def write(
+        self, profile: cProfile.Profile, summary: dict[str, Any]
+    ) -> dict[str, float]:
+        """Write the summary, the functions and the allocation sites, return the phases."""
+        try:
+            snapshot = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            self.abort()
+        if self._baseline is not None:
+            # Memory held at the end that was not held before the profile
+            allocations = [
+                stat for stat in snapshot.compare_to(self._baseline, "lineno") if stat.size_diff > 0
+            ][: self._top]
+            peak = None
+        else:
+            allocations = snapshot.statistics("lineno")[: self._top]
+
+        functions = io.StringIO()
+        stats = pstats.Stats(profile, stream=functions)
+        phases = _phase_times(stats)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self._top)
+
+        lines = [
+            f"CHJ SAIH profile, {summary['started']}",
+            (
+                f"Refresh cycles: {summary['cycles']} of {summary['requested_cycles']}"
+                f" in {summary['duration']:.1f} s"
+            ),
+            f"Process CPU time: {summary['cpu_time']:.3f} s",
+            f"Traced memory: {current} bytes held at the end"
+            + (f", peak {peak} bytes" if peak is not None else ""),
+            "",
+            "Event loop time by phase (ms)",
+            *(f"  {phase:<16} {seconds * 1000:10.1f}" for phase, seconds in phases.items()),
+            "",
+            f"Top {self._top} functions by cumulative time",
+            functions.getvalue().strip("\n"),
+            "",
+            f"Top {self._top} allocation sites",
+            *(f"  {stat}" for stat in allocations),
+            "",
+        ]
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines))
+        summary["memory"] = {"current": current, "peak": peak}
+        return phases
+
+
+async def async_profile_refreshes(
+    hass: HomeAssistant,
+    coordinators: list[ChjSaihDataUpdateCoordinator],
+    cycles: int,
+    timeout: float,
+    top: int,
+    filename: str,
+) -> dict[str, Any]:
+    """Profile the next refresh cycles of some entries and write a report.
+
+    The report is ``filename`` under the ``chj_saih`` folder of the
+    configuration directory. The event loop runs under cProfile and memory
+    allocations are traced with tracemalloc until ``cycles`` refreshes of
+    any of the entries are over, entity updates included, or ``timeout``
+    seconds have passed. Both slow Home Assistant down while they run.
+    """
+    _ensure_not_profiling()
+    completed = 0
+    done = asyncio.Event()
+
+    @callback
+    def _async_refresh_done() -> None:
+        nonlocal completed
+        completed += 1
+        if completed >= cycles:
+            done.set()
+
+    report = _ProfileReport(
+        hass.config.path(EXPORT_DIR, filename), top, not tracemalloc.is_tracing()
+    )
+    if report.started_tracing:
+        tracemalloc.start()
+    else:
+        await hass.async_add_executor_job(report.take_baseline)
+
+    profile = cProfile.Profile()
+    started = dt_util.now()
+    started_at = time.monotonic()
+    cpu_started = time.process_time()
+    try:
+        # A profile may have started while the baseline was taken
+        _ensure_not_profiling()
+        removers = [
+            coordinator.async_add_refresh_done_listener(_async_refresh_done)
+            for coordinator in coordinators
+        ]
+        LOGGER.info("Profiling the next %d refresh cycles", cycles)
+        profile.enable()
+        try:
+            async with async_timeout.timeout(timeout):
+                await done.wait()
+        except TimeoutError:
+            LOGGER.warning(
+                "Only %d of %d refresh cycles were over after %s seconds of profiling",
+                completed,
+                cycles,
+                timeout,
+            )
+        finally:
+            profile.disable()
+            for remove in removers:
+                remove()
+    except BaseException:
+        report.abort()
+        raise
+
+    summary: dict[str, Any] = {
+        "path": report.path,
+        "started": started.isoformat(),
+        "requested_cycles": cycles,
+        "cycles": completed,
+        "duration": round(time.monotonic() - started_at, 3),
+        "cpu_time": round(time.process_time() - cpu_started, 3),
+    }
+    phases = await hass.async_add_executor_job(report.write, profile, summary)
+    summary["phases"] = {phase: round(seconds, 6) for phase, seconds in phases.items()}
+    LOGGER.info("Wrote the profile of %d refresh cycles to %s", completed, report.path)
+    return summary
@@ -0,0 +1,126 @@
+"""Learned publication timing of the SAIH stations."""
+from __future__ import annotations
+
+from collections import deque
+from itertools import pairwise
+import math
+from statistics import median
+from typing import Any
+
+from .const import (
+    PUBLICATION_MARGIN,
+    PUBLICATION_MAX_RETRIES,
+    PUBLICATION_RETRY_DELAY,
+    PUBLICATION_WINDOW,
+)
+from .parser import StationSeries
+
+
+class StationPublication:
+    """When the SAIH publishes the samples of one station.
+
+    The cadence is the typical spacing of the series a fetch returns. The
+    publication delay, from the time of a sample to its availability, is
+    bracketed by what fetches see: a sample returned by a fetch was
+    published at most that long after its time, and a fetch that does not
+    return the sample due next shows its delay is longer than the time
+    elapsed since it was due. Fetches look halfway between both bounds until
+    they are close, then a margin after the upper one. Times are epoch
+    seconds.
+    """
+
+    __slots__ = ("_pending_floor", "ages", "cadence", "floors", "latest", "misses")
+
+    def __init__(self) -> None:
+        """Initialize an unknown publication timing."""
+        self.cadence: float | None = None
+        self.latest: float | None = None  # Time of the newest sample fetched
+        # Upper bounds of the delay: age of new samples when first fetched
+        self.ages: deque[float] = deque(maxlen=PUBLICATION_WINDOW)
+        # Lower bounds of the delay, from fetches that came too early
+        self.floors: deque[float] = deque(maxlen=PUBLICATION_WINDOW)
+        self.misses = 0  # Fetches that did not find the sample expected, or failed
+        self._pending_floor: float | None = None
+
+    @property
+    def offset(self) -> float | None:
+        """Return how long after the time of a sample to fetch it, in seconds."""
+        if not self.ages:
+            return None
+        upper = min(self.ages)
+        lower = max(self.floors, default=0.0)
+        if lower >= upper:
+            # Published later than it used to be
+            return lower + PUBLICATION_MARGIN
+        if upper - lower > 2 * PUBLICATION_MARGIN:
+            return (lower + upper) / 2
+        return upper + PUBLICATION_MARGIN
+
+    def record_series(self, series: StationSeries) -> None:
+        """Learn the cadence from the spacing of the newest points of a series."""
+        epochs = series.epochs[-PUBLICATION_WINDOW - 1 :]
+        if spacings := [
+            newer - older for older, newer in pairwise(epochs) if newer > older
+        ]:
+            self.cadence = median(spacings)
+
+    def record_fetch(self, latest: float, fetched_at: float) -> None:
+        """Record the time of the newest sample returned by a fetch made at ``fetched_at``."""
+        if self.latest is None or latest > self.latest:
+            if (
+                self._pending_floor is not None
+                and self.cadence is not None
+                and latest - self.latest <= self.cadence * 1.5
+            ):
+                # The sample a fetch missed did come: the miss bounds the delay.
+                # After a gap in the series it tells nothing.
+                self.floors.append(self._pending_floor)
+            self.ages.append(max(0.0, fetched_at - latest))
+            self.latest = latest
+            self.misses = 0
+            self._pending_floor = None
+            return
+        if self.cadence is None:
+            return
+        late = fetched_at - (self.latest + self.cadence)
+        if late <= 0:
+            return
+        self._pending_floor = max(self._pending_floor or 0.0, late)
+        if (offset := self.offset) is not None and late >= offset:
+            self.misses += 1
+
+    def record_failure(self) -> None:
+        """Count a fetch that failed or was not made as a miss."""
+        self.misses += 1
+
+    def next_fetch(self, now: float, interval: float) -> float | None:
+        """Return the seconds until the station is worth fetching again.
+
+        That is when a sample is expected: the one following the newest
+        sample, or the one expected closest to ``interval`` seconds from
+        ``now`` if that is later, so the station is still fetched once per
+        interval on average. A short retry when the next sample is late, and
+        None while the timing is unknown or the station stopped publishing.
+        """
+        if self.cadence is None or self.latest is None or (offset := self.offset) is None:
+            return None
+        expected = self.latest + self.cadence + offset
+        if expected <= now:
+            if self.misses > PUBLICATION_MAX_RETRIES:
+                return None
+            return min(PUBLICATION_RETRY_DELAY, interval)
+        earliest = now + max(interval - self.cadence / 2, 0.0)
+        if expected < earliest:
+            expected += math.ceil((earliest - expected) / self.cadence) * self.cadence
+        return min(expected - now, max(interval, self.cadence) + self.cadence / 2)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return what is known about the publication timing."""
+        return {
+            "cadence": self.cadence,
+            "delay_max": min(self.ages, default=None),
+            "delay_min": max(self.floors, default=None),
+            "fetch_offset": self.offset,
+            "latest": self.latest,
+            "misses": self.misses,
+        }
@@ -0,0 +1,143 @@
+"""Domain-wide rate limit of the requests sent to the SAIH."""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+import heapq
+from itertools import count
+import time
+from typing import Any
+
+from .const import PRIORITY_CATALOG, PRIORITY_SCHEDULED, PRIORITY_USER, TELEMETRY_WINDOW
+from .telemetry import percentile
+
+PRIORITY_NAMES = {
+    PRIORITY_SCHEDULED: "scheduled",
+    PRIORITY_USER: "user",
+    PRIORITY_CATALOG: "catalog",
+}
+
+
+class _PriorityStats:
+    """Requests and waits of one priority class."""
+
+    __slots__ = ("delayed", "granted", "max_wait", "peak_queued", "queued", "waits")
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        self.granted = 0
+        self.delayed = 0  # Requests that had to wait for a token
+        self.queued = 0  # Requests waiting now
+        self.peak_queued = 0
+        self.waits: deque[float] = deque(maxlen=TELEMETRY_WINDOW)  # seconds
+        self.max_wait = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a summary of the counters."""
+        return {
+            "granted": self.granted,
+            "delayed": self.delayed,
+            "queued": self.queued,
+            "peak_queued": self.peak_queued,
+            "wait_p50": percentile(self.waits, 50),
+            "wait_p95": percentile(self.waits, 95),
+            "max_wait": self.max_wait,
+        }
+
+
+class ChjSaihRateLimiter:
+    """Token bucket every request to the SAIH goes through.
+
+    Tokens accrue at ``rate`` per second up to ``burst``, and each request
+    takes one. Requests that find no token wait in a single queue served by
+    priority class (scheduled refreshes, then user requests, then catalog
+    downloads) and by arrival within a class, so when the budget runs short
+    the monitored stations are requested first.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        """Initialize the limiter with a full bucket."""
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._queue: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._order = count()
+        self._timer: asyncio.TimerHandle | None = None
+        self.stats = {priority: _PriorityStats() for priority in PRIORITY_NAMES}
+
+    def _refill(self, now: float) -> None:
+        """Add the tokens accrued since the last refill."""
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def async_acquire(self, priority: int) -> None:
+        """Wait for a token, behind the queued requests of the same or higher priority."""
+        started = time.monotonic()
+        stats = self.stats[priority]
+        self._refill(started)
+        if not self._queue and self._tokens >= 1:
+            self._tokens -= 1
+            stats.granted += 1
+            stats.waits.append(0.0)
+            return
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._order), future))
+        stats.delayed += 1
+        stats.queued += 1
+        stats.peak_queued = max(stats.peak_queued, stats.queued)
+        self._schedule()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted while the caller was being cancelled: hand it back
+                self._tokens = min(self.burst, self._tokens + 1)
+                self._schedule()
+            raise
+        finally:
+            stats.queued -= 1
+
+        wait = time.monotonic() - started
+        stats.granted += 1
+        stats.waits.append(wait)
+        stats.max_wait = max(stats.max_wait, wait)
+
+    def _schedule(self) -> None:
+        """Wake the queue up when its first request can get a token."""
+        if self._timer is not None or not self._queue:
+            return
+        delay = max(0.0, (1 - self._tokens) / self.rate)
+        self._timer = asyncio.get_running_loop().call_later(delay, self._release)
+
+    def _release(self) -> None:
+        """Grant the available tokens to the queued requests, in order."""
+        self._timer = None
+        self._refill(time.monotonic())
+        while self._queue:
+            future = self._queue[0][2]
+            if future.done():
+                # Cancelled while waiting
+                heapq.heappop(self._queue)
+                continue
+            if self._tokens < 1:
+                break
+            self._tokens -= 1
+            heapq.heappop(self._queue)
+            future.set_result(None)
+        self._schedule()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the configuration, queue depth and waits of every class."""
+        self._refill(time.monotonic())
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "tokens": round(self._tokens, 2),
+            "queued": sum(stats.queued for stats in self.stats.values()),
+            "classes": {
+                name: self.stats[priority].as_dict()
+                for priority, name in PRIORITY_NAMES.items()
+            },
+        }
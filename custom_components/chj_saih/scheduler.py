@@ -0,0 +1,176 @@
+"""Adaptive per-station polling scheduler for the CHJ SAIH integration."""
+from __future__ import annotations
+
+from collections.abc import Callable
+from datetime import datetime
+
+from .const import (
+    ADAPTIVE_FAST_CHANGE_RATE,
+    ADAPTIVE_SHRINK_FACTOR,
+    ADAPTIVE_STABLE_CHANGE_RATE,
+    ADAPTIVE_STRETCH_FACTOR,
+    ADAPTIVE_THRESHOLD_MARGIN,
+    SCHEDULER_DUE_SLACK,
+)
+from .models import StationReading
+from .thresholds import StationThresholds
+
+
+class _StationSchedule:
+    """Scheduling state of a single station."""
+
+    __slots__ = ("interval", "last_timestamp", "last_value", "next_due", "wait")
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.next_due = 0.0  # Due immediately
+        self.wait = interval  # Seconds between the last fetch and next_due
+        self.last_value: float | None = None
+        self.last_timestamp: datetime | None = None
+
+
+class AdaptiveScheduler:
+    """Give each station its own polling interval.
+
+    The interval of a station shrinks when its new readings change fast or
+    get close to one of its thresholds, and stretches back out while the
+    readings stay stable, always within ``[min_interval, max_interval]``.
+    Without ``adaptive`` every station keeps ``initial_interval``.
+
+    An ``aligner`` can move the next fetch of a station: given the station
+    and its interval, it returns the seconds until the station is worth
+    fetching again, or None to wait for the interval. Times are monotonic
+    seconds.
+    """
+
+    def __init__(
+        self,
+        station_ids: list[str],
+        initial_interval: float,
+        min_interval: float,
+        max_interval: float,
+        thresholds: dict[str, StationThresholds] | None = None,
+        adaptive: bool = True,
+        aligner: Callable[[str, float], float | None] | None = None,
+    ) -> None:
+        """Initialize the scheduler."""
+        if not adaptive:
+            min_interval = max_interval = initial_interval
+        self.adaptive = adaptive
+        self.aligner = aligner
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.thresholds = thresholds or {}
+        self.initial_interval = min(max(initial_interval, self.min_interval), self.max_interval)
+        self._stations = {
+            station_id: _StationSchedule(self.initial_interval) for station_id in station_ids
+        }
+
+    def set_stations(self, station_ids: list[str]) -> None:
+        """Schedule new stations right away and forget the ones not listed.
+
+        Stations already scheduled keep their adapted interval.
+        """
+        self._stations = {
+            station_id: self._stations.get(station_id)
+            or _StationSchedule(self.initial_interval)
+            for station_id in station_ids
+        }
+
+    def set_interval(self, interval: float, now: float) -> None:
+        """Change the initial interval, and restart every station from it.
+
+        Without ``adaptive`` it is also the only interval. Adapted intervals
+        are dropped, and stations adapt again from the new one. A station due
+        later than the new interval from ``now`` is brought forward.
+        """
+        if not self.adaptive:
+            self.min_interval = self.max_interval = interval
+        self.initial_interval = min(max(interval, self.min_interval), self.max_interval)
+        for schedule in self._stations.values():
+            schedule.interval = self.initial_interval
+            if (early := schedule.next_due - (now + schedule.interval)) > 0:
+                schedule.next_due -= early
+                schedule.wait = max(0.0, schedule.wait - early)
+
+    def interval(self, station_id: str) -> float:
+        """Return the current polling interval of a station."""
+        return self._stations[station_id].interval
+
+    def max_age(self, station_id: str) -> float:
+        """Return how old a reading may be when a station is due, in seconds."""
+        return self._stations[station_id].wait
+
+    def due(self, now: float) -> list[str]:
+        """Return the stations that have to be fetched at ``now``.
+
+        Stations due within ``SCHEDULER_DUE_SLACK`` count, so a wakeup that
+        fires slightly early does not come back empty.
+        """
+        return [
+            station_id
+            for station_id, schedule in self._stations.items()
+            if schedule.next_due <= now + SCHEDULER_DUE_SLACK
+        ]
+
+    def next_wakeup(self, now: float) -> float:
+        """Return the seconds until the next station is due."""
+        if not self._stations:
+            return self.max_interval
+        return max(0.0, min(s.next_due for s in self._stations.values()) - now)
+
+    def record(self, station_id: str, reading: StationReading, now: float) -> None:
+        """Adapt the interval of a station to its latest reading and reschedule it."""
+        schedule = self._stations[station_id]
+        value, timestamp = reading.value, reading.timestamp
+
+        # Only a new sample tells something about the rate of change
+        if (
+            self.adaptive
+            and not reading.error
+            and value is not None
+            and timestamp is not None
+            and timestamp != schedule.last_timestamp
+        ):
+            if self._near_threshold(station_id, value):
+                schedule.interval = self.min_interval
+            elif schedule.last_value is not None and schedule.last_timestamp is not None:
+                rate = self._relative_rate(
+                    schedule.last_value, value, (timestamp - schedule.last_timestamp).total_seconds()
+                )
+                if rate >= ADAPTIVE_FAST_CHANGE_RATE:
+                    schedule.interval *= ADAPTIVE_SHRINK_FACTOR
+                elif rate <= ADAPTIVE_STABLE_CHANGE_RATE:
+                    schedule.interval *= ADAPTIVE_STRETCH_FACTOR
+                schedule.interval = min(max(schedule.interval, self.min_interval), self.max_interval)
+            schedule.last_value = value
+            schedule.last_timestamp = timestamp
+
+        schedule.wait = schedule.interval
+        if (
+            self.aligner is not None
+            and not reading.error
+            and (aligned := self.aligner(station_id, schedule.interval)) is not None
+        ):
+            schedule.wait = aligned
+        schedule.next_due = now + schedule.wait
+
+    def _near_threshold(self, station_id: str, value: float) -> bool:
+        """Return True if the value is at or close below one of the station thresholds."""
+        return any(
+            value >= threshold - abs(threshold) * ADAPTIVE_THRESHOLD_MARGIN
+            for threshold, _ in self.thresholds.get(station_id, ())
+        )
+
+    @staticmethod
+    def _relative_rate(previous: float, current: float, elapsed: float) -> float:
+        """Return the change between two samples as a fraction of the value per hour."""
+        if elapsed <= 0:
+            return 0.0
+        delta = abs(current - previous)
+        if delta == 0:
+            return 0.0
+        scale = max(abs(previous), abs(current))
+        if scale == 0:
+            return 0.0
+        return delta / scale / (elapsed / 3600)
@@ -1,12 +1,21 @@
 """Sensor platform for CHJ SAIH integration."""
 from __future__ import annotations
 
-from datetime import datetime, timedelta # Added datetime
+from datetime import UTC, datetime # Added datetime
 import logging # Ensure logging is imported if LOGGER from .const isn't used directly for all logging
 
-from homeassistant.components.sensor import SensorEntity
+from collections.abc import Callable
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfTime
 from homeassistant.core import HomeAssistant, callback # Added callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 # async_get_clientsession and aiohttp might not be needed if all fetching is in coordinator
 # import aiohttp # For ClientError
@@ -16,16 +25,22 @@ from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity # Added
 
 from .coordinator import ChjSaihDataUpdateCoordinator # Added
+from .derived import StationHistory
+from .telemetry import StationTelemetry
+from .models import StationDescriptor, StationReading, station_model
 
 from .const import (
     DOMAIN,
-    CONF_STATIONS,
+    CONF_DIAGNOSTIC_SENSORS,
+    CONF_TIMESTAMP_SENSORS,
     LOGGER, # Using the logger from const.py
-    ATTR_LAST_UPDATE,
     ATTR_DATA_URL,
-    ATTR_RIVER_NAME,
-    ATTR_STATION_NAME,
     ATTR_STATION_ID,
+    ATTR_STALE,
+    ATTR_LAST_FETCHED,
+    ATTR_BREAKER_STATE,
+    DERIVED_WINDOWS,
+    SIGNAL_STATIONS_ADDED,
 )
 
 # SCAN_INTERVAL is typically managed by the DataUpdateCoordinator if one is used.
@@ -40,7 +55,9 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up the CHJ SAIH sensor platform."""
-    station_ids: list[str] = entry.data[CONF_STATIONS]
+    coordinator: ChjSaihDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+    # Resolved at setup, from the catalog when whole stations are monitored
+    station_ids: list[str] = coordinator.station_ids
     # config_scan_interval = entry.options.get(CONF_SCAN_INTERVAL) # Or from entry.data
 
     LOGGER.info("Setting up CHJ SAIH sensors for stations: %s", station_ids)
@@ -52,13 +69,10 @@ async def async_setup_entry(
     # 1. Predefined sensor types per station if known.
     # 2. Fetching metadata for each station to discover its available sensors (e.g., flow, level).
     # For now, we'll create one generic sensor per station_id as a placeholder.
-    coordinator: ChjSaihDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
-    station_ids: list[str] = entry.data[CONF_STATIONS] # Or coordinator.station_ids
 
     sensors_to_add: list[ChjSaihSensor] = []
     for station_id in station_ids:
-        # Create one sensor entity per station_id (variable)
-        sensors_to_add.append(ChjSaihSensor(coordinator, station_id))
+        sensors_to_add.extend(_station_sensors(coordinator, entry, station_id))
 
     if sensors_to_add:
         LOGGER.info("Adding %d CHJ SAIH sensors to Home Assistant", len(sensors_to_add))
@@ -66,11 +80,124 @@ async def async_setup_entry(
     else:
         LOGGER.info("No CHJ SAIH sensors to add for entry %s.", entry.entry_id)
 
+    @callback
+    def _async_add_stations(added_station_ids: list[str]) -> None:
+        """Add the sensors of stations added from the options, without a reload."""
+        new_sensors = [
+            sensor
+            for station_id in added_station_ids
+            for sensor in _station_sensors(coordinator, entry, station_id)
+        ]
+        LOGGER.info("Adding %d CHJ SAIH sensors for new stations %s", len(new_sensors), added_station_ids)
+        async_add_entities(new_sensors)
+
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_STATIONS_ADDED.format(entry.entry_id), _async_add_stations
+        )
+    )
+
+
+def _station_sensors(
+    coordinator: ChjSaihDataUpdateCoordinator, entry: ConfigEntry, station_id: str
+) -> list[SensorEntity]:
+    """Create every sensor of a station (variable)."""
+    # Create one sensor entity per station_id (variable)
+    sensors: list[SensorEntity] = [ChjSaihSensor(coordinator, station_id)]
+    if station_id in coordinator.histories:
+        sensors.extend(_derived_sensors(coordinator, station_id))
+    if entry.options.get(CONF_DIAGNOSTIC_SENSORS, False):
+        sensors.extend(_diagnostic_sensors(coordinator, station_id))
+    if entry.options.get(CONF_TIMESTAMP_SENSORS, False):
+        sensors.append(ChjSaihTimestampSensor(coordinator, station_id))
+    return sensors
+
+
+def _derived_sensors(
+    coordinator: ChjSaihDataUpdateCoordinator, station_id: str
+) -> list[ChjSaihDerivedSensor]:
+    """Create the derived sensors of a station."""
+    sensors = [
+        ChjSaihDerivedSensor(
+            coordinator, station_id, "rate", "rate of change", lambda h: h.rate, rate=True
+        )
+    ]
+    for hours in DERIVED_WINDOWS:
+        sensors.append(
+            ChjSaihDerivedSensor(
+                coordinator, station_id, f"max_{hours}h", f"max {hours}h",
+                lambda h, hours=hours: h.maximum(hours),
+            )
+        )
+        sensors.append(
+            ChjSaihDerivedSensor(
+                coordinator, station_id, f"min_{hours}h", f"min {hours}h",
+                lambda h, hours=hours: h.minimum(hours),
+            )
+        )
+
+    descriptor = coordinator.descriptors.get(station_id)
+    if descriptor is not None and descriptor.is_rain_gauge:
+        for hours in DERIVED_WINDOWS:
+            sensors.append(
+                ChjSaihDerivedSensor(
+                    coordinator, station_id, f"rain_{hours}h", f"rainfall {hours}h",
+                    lambda h, hours=hours: h.total(hours),
+                )
+            )
+    return sensors
+
+
+def _diagnostic_sensors(
+    coordinator: ChjSaihDataUpdateCoordinator, station_id: str
+) -> list[ChjSaihDiagnosticSensor]:
+    """Create the fetch telemetry sensors of a station."""
+    return [
+        ChjSaihDiagnosticSensor(
+            coordinator, station_id, "latency_p50", "fetch latency p50",
+            lambda t: t.latency(50), UnitOfTime.SECONDS,
+        ),
+        ChjSaihDiagnosticSensor(
+            coordinator, station_id, "latency_p95", "fetch latency p95",
+            lambda t: t.latency(95), UnitOfTime.SECONDS,
+        ),
+        ChjSaihDiagnosticSensor(
+            coordinator, station_id, "reading_age", "reading age",
+            lambda t: t.reading_age, UnitOfTime.SECONDS,
+        ),
+        ChjSaihDiagnosticSensor(
+            coordinator, station_id, "payload_points", "payload readings",
+            lambda t: t.payload_points, None,
+        ),
+    ]
+
+
+def _extra_sensor_name(
+    coordinator: ChjSaihDataUpdateCoordinator, station_id: str, label: str
+) -> str:
+    """Return the name of a secondary sensor of a variable, shown after its device name.
+
+    A variable monitored on its own has its own device, so the label is
+    enough. On the device shared by every variable of a physical station
+    the variable has to be named too.
+    """
+    if station_id not in coordinator.devices:
+        return label[:1].upper() + label[1:]
+    descriptor = coordinator.descriptors.get(station_id)
+    return f"{descriptor.name if descriptor else station_id} {label}"
+
 
 class ChjSaihSensor(CoordinatorEntity[ChjSaihDataUpdateCoordinator], SensorEntity):
-    """Representation of a sensor from a CHJ SAIH station (variable), managed by a coordinator."""
+    """Representation of a sensor from a CHJ SAIH station (variable), managed by a coordinator.
+
+    The station and river names live in the device registry, and the time of
+    the reading in the opt-in timestamp sensor, so a reading that repeats
+    the value does not change the state. Attributes that do change between
+    readings are not recorded.
+    """
 
     _attr_has_entity_name = True
+    _unrecorded_attributes = frozenset({ATTR_LAST_FETCHED, ATTR_BREAKER_STATE})
 
     def __init__(
         self,
@@ -78,7 +205,9 @@ class ChjSaihSensor(CoordinatorEntity[ChjSaihDataUpdateCoordinator], SensorEntit
         station_id: str, # This is the 'variable' ID
     ) -> None:
         """Initialize the sensor."""
-        super().__init__(coordinator)
+        # The station ID is the listener context, so the coordinator can skip
+        # this entity when its reading did not change.
+        super().__init__(coordinator, context=station_id)
         self._station_id = station_id
         self._config_entry_id = coordinator.config_entry.entry_id # For unique ID
 
@@ -89,9 +218,22 @@ class ChjSaihSensor(CoordinatorEntity[ChjSaihDataUpdateCoordinator], SensorEntit
         self._attr_native_value = None
         self._attr_native_unit_of_measurement = None
         self._attr_extra_state_attributes = {ATTR_STATION_ID: self._station_id}
+        self._descriptor: StationDescriptor | None = None
+
+        # Every variable of a monitored physical station shares its device
+        self._shared_device = station_id in coordinator.devices
+        if self._shared_device:
+            self._attr_device_info = coordinator.devices[station_id]
+        else:
+            self._attr_device_info = self._variable_device_info()
+        # Call initial update to set initial state from potentially already fetched data
+        self._update_attrs_from_coordinator_data()
+        LOGGER.debug("Initialized sensor %s for station_id (variable): %s", self.unique_id, self._station_id)
 
+    def _variable_device_info(self) -> dict:
+        """Return the initial device of a variable monitored on its own."""
         # Initial Device Info - can be refined in _handle_coordinator_update
-        self._attr_device_info = {
+        return {
             "identifiers": {(DOMAIN, self._station_id)}, # Using variable_id as device for now
             "name": f"CHJ SAIH {self._station_id}", # Placeholder
             "manufacturer": "CHJ Confederación Hidrográfica del Júcar",
@@ -99,13 +241,10 @@ class ChjSaihSensor(CoordinatorEntity[ChjSaihDataUpdateCoordinator], SensorEntit
             "entry_type": "service",
             "via_device": (DOMAIN, self._config_entry_id) # Link to config entry device if one exists
         }
-        # Call initial update to set initial state from potentially already fetched data
-        self._update_attrs_from_coordinator_data()
-        LOGGER.debug("Initialized sensor %s for station_id (variable): %s", self.unique_id, self._station_id)
 
 
     @property
-    def _sensor_data(self) -> dict | None:
+    def _sensor_data(self) -> StationReading | None:
         """Return the specific data for this sensor from coordinator."""
         if self.coordinator.data:
             return self.coordinator.data.get(self._station_id)
@@ -118,7 +257,7 @@ class ChjSaihSensor(CoordinatorEntity[ChjSaihDataUpdateCoordinator], SensorEntit
         return (
             super().available # Checks coordinator.last_update_success
             and self._sensor_data is not None
-            and not self._sensor_data.get("error")
+            and not self._sensor_data.error
         )
 
     @callback
@@ -128,68 +267,226 @@ class ChjSaihSensor(CoordinatorEntity[ChjSaihDataUpdateCoordinator], SensorEntit
         self._update_attrs_from_coordinator_data()
         self.async_write_ha_state()
 
+    def _update_attrs_from_descriptor(self, descriptor: StationDescriptor) -> None:
+        """Update the static attributes, only when the station descriptor changes."""
+        self._descriptor = descriptor
+        self._attr_name = descriptor.name
+        self._attr_native_unit_of_measurement = descriptor.unit
+
+        if not self._shared_device:
+            # Use more specific station name for the device if available,
+            # falling back to the variable description
+            self._attr_device_info["name"] = descriptor.station_name or descriptor.name
+            if descriptor.station_code:
+                self._attr_device_info["model"] = station_model(
+                    descriptor.station_code, descriptor.river_name
+                )
+            if self.device_entry is not None:
+                # Device info is only read when the entity is added: a
+                # descriptor first known later updates the registry
+                dr.async_get(self.hass).async_update_device(
+                    self.device_entry.id,
+                    name=self._attr_device_info["name"],
+                    model=self._attr_device_info["model"],
+                )
+
+        # Log if unit is unexpectedly None after update
+        if self._attr_native_unit_of_measurement is None:
+            LOGGER.debug("Sensor unit is None after update for %s", self._station_id)
+
     def _update_attrs_from_coordinator_data(self) -> None:
         """Update entity attributes from coordinator data."""
-        if self._sensor_data and not self._sensor_data.get("error"):
-            self._attr_name = self._sensor_data.get("name", f"CHJ SAIH {self._station_id}")
-            self._attr_native_value = self._sensor_data.get("value")
-            self._attr_native_unit_of_measurement = self._sensor_data.get("unit")
-
-            new_extra_attrs = {ATTR_STATION_ID: self._station_id}
-            if self._sensor_data.get(ATTR_LAST_UPDATE):
-                new_extra_attrs[ATTR_LAST_UPDATE] = self._sensor_data[ATTR_LAST_UPDATE]
-
-            metadata = self._sensor_data.get("metadata", {})
-            if metadata:
-                # Use more specific station name for the device if available
-                station_name_from_meta = metadata.get('nombreEstacion', self._attr_name)
-                # Fallback to variable description if nombreEstacion is generic or missing
-                if not station_name_from_meta or station_name_from_meta == self._attr_name :
-                     station_name_from_meta = metadata.get('descripcion', self._attr_name)
-
-                self._attr_device_info["name"] = station_name_from_meta
-
-                station_code = metadata.get('codigoEstacion')
-                if station_code:
-                    self._attr_device_info["model"] = f"Station Code: {station_code}"
-                    # Consider if codigoEstacion should be the device identifier
-                    # self._attr_device_info["identifiers"] = {(DOMAIN, station_code)}
-
-                new_extra_attrs[ATTR_STATION_NAME] = metadata.get('nombreEstacion')
-                new_extra_attrs[ATTR_RIVER_NAME] = metadata.get('nombreRio')
-                # Example: self._attr_extra_state_attributes[ATTR_DATA_URL] = ...
-
-            self._attr_extra_state_attributes = new_extra_attrs
-
-            # Log if name or unit is unexpectedly None after update
-            if self._attr_name is None:
-                LOGGER.debug("Sensor name is None after update for %s", self._station_id)
-            if self._attr_native_unit_of_measurement is None:
-                 LOGGER.debug("Sensor unit is None after update for %s", self._station_id)
-
-        elif self._sensor_data and self._sensor_data.get("error"):
-            LOGGER.warning(
+        descriptor = self.coordinator.descriptors.get(self._station_id)
+        if descriptor is not None and descriptor is not self._descriptor:
+            self._update_attrs_from_descriptor(descriptor)
+
+        reading = self._sensor_data
+        if reading is None:
+            return
+
+        if reading.error:
+            # Repeated failures are reported once by the hub's circuit breaker
+            LOGGER.debug(
                 "Sensor %s has error in coordinator data: %s - %s",
                 self.entity_id if self.entity_id else self._station_id, # self.entity_id might be None during init
-                self._sensor_data.get("error"),
-                self._sensor_data.get("details", "")
+                reading.error,
+                reading.details or "",
             )
             # Decide how to handle entity state on error, e.g., clear value, keep old, etc.
-            # For now, native_value will be None if not set by successful update.
-            # If the error is 'no_readings' or 'value_parse_error', metadata might still be useful
-            metadata = self._sensor_data.get("metadata", {})
-            if metadata:
-                self._attr_name = self._sensor_data.get("name", metadata.get('descripcion', f"CHJ SAIH {self._station_id}"))
-                self._attr_native_unit_of_measurement = self._sensor_data.get("unit", metadata.get('dimension') or metadata.get('tipoVariable', {}).get('unidades'))
-                station_name_from_meta = metadata.get('nombreEstacion', self._attr_name)
-                if not station_name_from_meta or station_name_from_meta == self._attr_name :
-                     station_name_from_meta = metadata.get('descripcion', self._attr_name)
-                self._attr_device_info["name"] = station_name_from_meta
-                station_code = metadata.get('codigoEstacion')
-                if station_code:
-                    self._attr_device_info["model"] = f"Station Code: {station_code}"
-
+            # For now, the entity is unavailable and keeps its previous value.
+            if (breaker := self.coordinator.hub.breakers.get(self._station_id)) is not None:
+                self._attr_extra_state_attributes = {
+                    **self._attr_extra_state_attributes,
+                    ATTR_BREAKER_STATE: breaker.state,
+                }
+            return
+
+        self._attr_native_value = reading.value
+        extra_attrs: dict[str, str | int | bool | None] = {ATTR_STATION_ID: self._station_id}
+        if reading.stale:
+            # Last good reading, served while the station cannot be fetched
+            # or restored from the last snapshot
+            extra_attrs[ATTR_STALE] = True
+            if reading.fetched_at is not None:
+                extra_attrs[ATTR_LAST_FETCHED] = datetime.fromtimestamp(
+                    reading.fetched_at, UTC
+                ).isoformat()
+        if (breaker := self.coordinator.hub.breakers.get(self._station_id)) is not None:
+            extra_attrs[ATTR_BREAKER_STATE] = breaker.state
+        self._attr_extra_state_attributes = extra_attrs
 
     # Properties like native_value, name, unit_of_measurement, extra_state_attributes
     # will now use the _attr_ versions set by _handle_coordinator_update or _update_attrs_from_coordinator_data.
     # No need to override them if _attr_ versions are correctly managed.
+
+
+class ChjSaihDerivedSensor(CoordinatorEntity[ChjSaihDataUpdateCoordinator], SensorEntity):
+    """A value derived from the recent readings of a station (rate, rolling max/min, rainfall)."""
+
+    _attr_has_entity_name = True
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(
+        self,
+        coordinator: ChjSaihDataUpdateCoordinator,
+        station_id: str,
+        key: str,
+        label: str,
+        value_fn: Callable[[StationHistory], float | None],
+        rate: bool = False,
+    ) -> None:
+        """Initialize the derived sensor."""
+        super().__init__(coordinator, context=station_id)
+        self._station_id = station_id
+        self._history = coordinator.histories[station_id]
+        self._value_fn = value_fn
+        self._label = label
+        self._rate = rate
+        self._descriptor: StationDescriptor | None = None
+
+        self._attr_unique_id = f"{coordinator.config_entry.entry_id}_{station_id}_{key}"
+        self._attr_name = _extra_sensor_name(coordinator, station_id, label)
+        # Same device as the main sensor of the station
+        self._attr_device_info = coordinator.devices.get(station_id) or {
+            "identifiers": {(DOMAIN, station_id)}
+        }
+        self._update_from_history()
+
+    @property
+    def available(self) -> bool:
+        """Return if entity is available."""
+        return super().available and self._attr_native_value is not None
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator."""
+        self._update_from_history()
+        self.async_write_ha_state()
+
+    def _update_from_history(self) -> None:
+        """Read the derived value, O(1) from the station history."""
+        descriptor = self.coordinator.descriptors.get(self._station_id)
+        if descriptor is not None and descriptor is not self._descriptor:
+            self._descriptor = descriptor
+            self._attr_name = _extra_sensor_name(self.coordinator, self._station_id, self._label)
+            unit = descriptor.unit
+            self._attr_native_unit_of_measurement = (
+                f"{unit}/h" if unit and self._rate else unit
+            )
+        value = self._value_fn(self._history)
+        self._attr_native_value = round(value, 3) if value is not None else None
+
+
+class ChjSaihTimestampSensor(CoordinatorEntity[ChjSaihDataUpdateCoordinator], SensorEntity):
+    """Time of the latest reading of a station, as published by the SAIH."""
+
+    _attr_has_entity_name = True
+    _attr_device_class = SensorDeviceClass.TIMESTAMP
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(
+        self,
+        coordinator: ChjSaihDataUpdateCoordinator,
+        station_id: str,
+    ) -> None:
+        """Initialize the timestamp sensor."""
+        super().__init__(coordinator, context=station_id)
+        self._station_id = station_id
+        self._descriptor: StationDescriptor | None = None
+
+        self._attr_unique_id = f"{coordinator.config_entry.entry_id}_{station_id}_last_reading"
+        self._attr_name = _extra_sensor_name(coordinator, station_id, "last reading")
+        # Same device as the main sensor of the station
+        self._attr_device_info = coordinator.devices.get(station_id) or {
+            "identifiers": {(DOMAIN, station_id)}
+        }
+        self._update_from_reading()
+
+    @property
+    def available(self) -> bool:
+        """Return if entity is available."""
+        return super().available and self._attr_native_value is not None
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator."""
+        self._update_from_reading()
+        self.async_write_ha_state()
+
+    def _update_from_reading(self) -> None:
+        """Read the timestamp of the current reading, kept while it is an error."""
+        descriptor = self.coordinator.descriptors.get(self._station_id)
+        if descriptor is not None and descriptor is not self._descriptor:
+            self._descriptor = descriptor
+            self._attr_name = _extra_sensor_name(self.coordinator, self._station_id, "last reading")
+        if self.coordinator.data is None:
+            return
+        reading = self.coordinator.data.get(self._station_id)
+        if reading is not None and not reading.error:
+            self._attr_native_value = reading.timestamp
+
+
+class ChjSaihDiagnosticSensor(CoordinatorEntity[ChjSaihDataUpdateCoordinator], SensorEntity):
+    """Fetch telemetry of a station (latency percentiles, reading age, payload size)."""
+
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(
+        self,
+        coordinator: ChjSaihDataUpdateCoordinator,
+        station_id: str,
+        key: str,
+        label: str,
+        value_fn: Callable[[StationTelemetry], float | None],
+        unit: str | None,
+    ) -> None:
+        """Initialize the diagnostic sensor."""
+        # No context: telemetry changes on every refresh, even when the reading does not
+        super().__init__(coordinator)
+        self._station_id = station_id
+        self._value_fn = value_fn
+        self._attr_unique_id = f"{coordinator.config_entry.entry_id}_{station_id}_{key}"
+        self._attr_name = _extra_sensor_name(coordinator, station_id, label)
+        self._attr_native_unit_of_measurement = unit
+        if unit is not None:
+            self._attr_device_class = SensorDeviceClass.DURATION
+            self._attr_suggested_display_precision = 2
+        # Same device as the main sensor of the station
+        self._attr_device_info = coordinator.devices.get(station_id) or {
+            "identifiers": {(DOMAIN, station_id)}
+        }
+        self._update_from_telemetry()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator."""
+        self._update_from_telemetry()
+        self.async_write_ha_state()
+
+    def _update_from_telemetry(self) -> None:
+        """Read the current value from the hub telemetry."""
+        telemetry = self.coordinator.hub.telemetry.get(self._station_id)
+        self._attr_native_value = self._value_fn(telemetry) if telemetry else None
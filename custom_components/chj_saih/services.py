@@ -0,0 +1,177 @@
+"""Services of the CHJ SAIH integration."""
+from __future__ import annotations
+
+import asyncio
+
+import voluptuous as vol
+
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import ServiceValidationError
+import homeassistant.helpers.config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    EXPORT_FORMATS,
+    PROFILE_TIMEOUT,
+    PROFILE_TOP,
+    SERVICE_EXPORT_HISTORY,
+    SERVICE_PROFILE,
+    SERVICE_REFRESH,
+)
+from .coordinator import ChjSaihDataUpdateCoordinator
+from .export import async_export_history
+from .profiler import async_profile_refreshes
+
+ATTR_VARIABLES = "variables"
+ATTR_START = "start"
+ATTR_END = "end"
+ATTR_FORMAT = "format"
+ATTR_FILENAME = "filename"
+ATTR_CYCLES = "cycles"
+ATTR_TIMEOUT = "timeout"
+ATTR_TOP = "top"
+
+EXPORT_HISTORY_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_VARIABLES): vol.All(cv.ensure_list, [cv.string], vol.Length(min=1)),
+        vol.Required(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_END): cv.datetime,
+        vol.Optional(ATTR_FORMAT, default=EXPORT_FORMATS[0]): vol.In(EXPORT_FORMATS),
+        vol.Optional(ATTR_FILENAME): cv.string,
+    }
+)
+
+REFRESH_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_VARIABLES): vol.All(cv.ensure_list, [cv.string], vol.Length(min=1)),
+    }
+)
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CYCLES, default=1): vol.All(vol.Coerce(int), vol.Range(min=1, max=100)),
+        vol.Optional(ATTR_TIMEOUT, default=PROFILE_TIMEOUT): vol.All(
+            vol.Coerce(int), vol.Range(min=10, max=86400)
+        ),
+        vol.Optional(ATTR_TOP, default=PROFILE_TOP): vol.All(vol.Coerce(int), vol.Range(min=1, max=500)),
+        vol.Optional(ATTR_FILENAME): cv.string,
+    }
+)
+
+
+def _check_filename(filename: str) -> None:
+    """Accept only plain file names, so the files stay in their folder."""
+    if filename != filename.strip() or "/" in filename or "\\" in filename or filename.startswith("."):
+        raise ServiceValidationError(f"Invalid file name: {filename}")
+
+
+@callback
+def _async_coordinators(hass: HomeAssistant) -> list[ChjSaihDataUpdateCoordinator]:
+    """Return the coordinators of the loaded entries."""
+    return [
+        entry_data["coordinator"]
+        for entry_data in hass.data.get(DOMAIN, {}).values()
+        if isinstance(entry_data, dict) and "coordinator" in entry_data
+    ]
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services of the integration."""
+
+    async def _async_export_history(call: ServiceCall) -> ServiceResponse:
+        """Export the series of some variables to a compressed file."""
+        # Naive times are in the Home Assistant time zone
+        start = dt_util.as_utc(call.data[ATTR_START])
+        end = dt_util.as_utc(call.data[ATTR_END]) if ATTR_END in call.data else None
+        if start >= dt_util.utcnow():
+            raise ServiceValidationError("The start of the range is not in the past")
+        if end is not None and end < start:
+            raise ServiceValidationError("The end of the range is before its start")
+        file_format = call.data[ATTR_FORMAT]
+        filename = call.data.get(ATTR_FILENAME) or (
+            f"{DOMAIN}_{dt_util.now():%Y%m%dT%H%M%S}.{file_format}.gz"
+        )
+        _check_filename(filename)
+
+        return await async_export_history(
+            hass, call.data[ATTR_VARIABLES], start, end, file_format, filename
+        )
+
+    async def _async_refresh(call: ServiceCall) -> ServiceResponse:
+        """Fetch some variables now and return their readings."""
+        variables: list[str] = list(dict.fromkeys(call.data[ATTR_VARIABLES]))
+        # Entries monitoring each variable; a variable may be in several
+        by_coordinator: dict[ChjSaihDataUpdateCoordinator, list[str]] = {}
+        for coordinator in _async_coordinators(hass):
+            if wanted := [v for v in variables if v in coordinator.station_ids]:
+                by_coordinator[coordinator] = wanted
+        monitored = {v for wanted in by_coordinator.values() for v in wanted}
+        if unknown := [v for v in variables if v not in monitored]:
+            raise ServiceValidationError(
+                f"Variables not monitored by any CHJ SAIH entry: {', '.join(unknown)}"
+            )
+
+        # max_age 0 asks the hub for a new request, but a fetch of the same
+        # station already in flight, from a refresh or another call, is joined
+        results = await asyncio.gather(
+            *(
+                coordinator.async_refresh_stations(wanted, max_age=0)
+                for coordinator, wanted in by_coordinator.items()
+            )
+        )
+        readings = {
+            variable: {
+                "value": reading.value,
+                "timestamp": reading.timestamp.isoformat() if reading.timestamp else None,
+                "error": reading.error,
+                "details": reading.details,
+            }
+            for result in results
+            for variable, reading in result.items()
+        }
+        return {"readings": {variable: readings[variable] for variable in variables}}
+
+    async def _async_profile(call: ServiceCall) -> ServiceResponse:
+        """Profile the next refresh cycles and write a report."""
+        if not (coordinators := _async_coordinators(hass)):
+            raise ServiceValidationError("No CHJ SAIH entry is loaded")
+        filename = call.data.get(ATTR_FILENAME) or f"profile_{dt_util.now():%Y%m%dT%H%M%S}.txt"
+        _check_filename(filename)
+        return await async_profile_refreshes(
+            hass,
+            coordinators,
+            call.data[ATTR_CYCLES],
+            call.data[ATTR_TIMEOUT],
+            call.data[ATTR_TOP],
+            filename,
+        )
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_REFRESH,
+        _async_refresh,
+        schema=REFRESH_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_EXPORT_HISTORY,
+        _async_export_history,
+        schema=EXPORT_HISTORY_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE,
+        _async_profile,
+        schema=PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
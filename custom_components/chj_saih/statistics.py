@@ -0,0 +1,176 @@
+"""Backfill of the SAIH reading series into long-term statistics."""
+from __future__ import annotations
+
+from datetime import UTC, datetime
+from typing import Any
+
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import async_add_external_statistics
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import slugify
+
+from .const import (
+    DATA_STATISTICS,
+    DOMAIN,
+    LOGGER,
+    STATISTICS_BATCH_SIZE,
+    STATISTICS_SAVE_DELAY,
+    STATISTICS_STORAGE_KEY,
+    STATISTICS_STORAGE_VERSION,
+)
+from .hub import ChjSaihFetchHub
+from .parser import StationSeries
+
+try:
+    from homeassistant.components.recorder.models import StatisticMeanType
+except ImportError:  # Home Assistant < 2025.6 only knows has_mean
+    StatisticMeanType = None
+
+
+def statistic_id(station_id: str) -> str:
+    """Return the external statistic ID of a variable."""
+    return f"{DOMAIN}:{slugify(station_id)}"
+
+
+class ChjSaihStatisticsImporter:
+    """Import every series the hub downloads as hourly external statistics.
+
+    Only complete hours are imported: the hour of the newest sample may still
+    receive readings and is left for a later refresh, and the hour of the
+    oldest sample is skipped when the series starts partway through it,
+    unless the previous hour was already imported. A per-station
+    high-water mark, persisted in HA storage, makes every hour be imported
+    once even though consecutive refreshes return overlapping series.
+    """
+
+    def __init__(self, hass: HomeAssistant, hub: ChjSaihFetchHub) -> None:
+        """Initialize the importer."""
+        self._hass = hass
+        self._hub = hub
+        self._store: Store[dict[str, float]] = Store(
+            hass, STATISTICS_STORAGE_VERSION, STATISTICS_STORAGE_KEY
+        )
+        # variable ID -> UTC epoch of the start of the last imported hour
+        self._high_water_marks: dict[str, float] = {}
+        self._users = 0
+        self._remove_listener: CALLBACK_TYPE | None = None
+
+    async def async_load(self) -> None:
+        """Load the high-water marks."""
+        self._high_water_marks = await self._store.async_load() or {}
+
+    @callback
+    def async_acquire(self) -> CALLBACK_TYPE:
+        """Register a user of the importer, return the callback releasing it.
+
+        Series are imported while at least one user holds the importer.
+        """
+        self._users += 1
+        if self._remove_listener is None:
+            self._remove_listener = self._hub.async_add_series_listener(
+                self.async_process_series
+            )
+
+        @callback
+        def _release() -> None:
+            self._users -= 1
+            if self._users or self._remove_listener is None:
+                return
+            self._remove_listener()
+            self._remove_listener = None
+            if self._high_water_marks:
+                self._hass.async_create_task(
+                    self._store.async_save(self._high_water_marks),
+                    f"{DOMAIN}_statistics_save",
+                )
+
+        return _release
+
+    @callback
+    def async_process_series(self, station_id: str, series: StationSeries) -> None:
+        """Aggregate the new complete hours of a series and import them."""
+        high_water_mark = self._high_water_marks.get(station_id)
+        # hour start (UTC epoch) -> [sum, count, min, max]
+        hours: dict[float, list[float]] = {}
+        for timestamp, value in series:
+            hour = timestamp - timestamp % 3600
+            if high_water_mark is not None and hour <= high_water_mark:
+                continue
+            if (bucket := hours.get(hour)) is None:
+                hours[hour] = [value, 1, value, value]
+            else:
+                bucket[0] += value
+                bucket[1] += 1
+                bucket[2] = min(bucket[2], value)
+                bucket[3] = max(bucket[3], value)
+
+        # The newest hour is still open
+        if hours:
+            del hours[max(hours)]
+        # The oldest hour is only complete if the series reaches back to its
+        # start, or if it follows the last imported hour; otherwise it is left
+        # out rather than imported from part of its samples, for good
+        if hours:
+            oldest = min(hours)
+            if series.epochs[0] > oldest and (
+                high_water_mark is None or oldest != high_water_mark + 3600
+            ):
+                del hours[oldest]
+        if not hours:
+            return
+
+        statistics = [
+            StatisticData(
+                start=datetime.fromtimestamp(hour, UTC),
+                mean=total / count,
+                min=low,
+                max=high,
+            )
+            for hour, (total, count, low, high) in sorted(hours.items())
+        ]
+        metadata = self._metadata(station_id)
+        for start in range(0, len(statistics), STATISTICS_BATCH_SIZE):
+            async_add_external_statistics(
+                self._hass, metadata, statistics[start:start + STATISTICS_BATCH_SIZE]
+            )
+
+        self._high_water_marks[station_id] = statistics[-1]["start"].timestamp()
+        self._store.async_delay_save(lambda: self._high_water_marks, STATISTICS_SAVE_DELAY)
+        LOGGER.debug(
+            "Imported %d hourly statistics for station %s", len(statistics), station_id
+        )
+
+    def _metadata(self, station_id: str) -> StatisticMetaData:
+        """Return the statistic metadata of a variable."""
+        descriptor = self._hub.descriptors.get(station_id)
+        metadata: dict[str, Any] = {
+            "has_mean": True,
+            "has_sum": False,
+            "name": descriptor.name if descriptor else f"CHJ SAIH {station_id}",
+            "source": DOMAIN,
+            "statistic_id": statistic_id(station_id),
+            "unit_of_measurement": descriptor.unit if descriptor else None,
+        }
+        if StatisticMeanType is not None:
+            metadata["mean_type"] = StatisticMeanType.ARITHMETIC
+        return StatisticMetaData(**metadata)
+
+
+async def async_setup_statistics(
+    hass: HomeAssistant, hub: ChjSaihFetchHub
+) -> CALLBACK_TYPE | None:
+    """Acquire the shared statistics importer, if the recorder is available.
+
+    Return the callback releasing it, or None without the recorder.
+    """
+    if "recorder" not in hass.config.components:
+        return None
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (importer := domain_data.get(DATA_STATISTICS)) is None:
+        importer = ChjSaihStatisticsImporter(hass, hub)
+        await importer.async_load()
+        # Only imports with the high-water marks loaded; of two entries set
+        # up together, the first to finish loading wins
+        importer = domain_data.setdefault(DATA_STATISTICS, importer)
+    return importer.async_acquire()
@@ -0,0 +1,114 @@
+"""Per-station fetch telemetry for the CHJ SAIH integration."""
+from __future__ import annotations
+
+from collections import Counter, deque
+from typing import Any
+
+from homeassistant.util import dt as dt_util
+
+from .const import TELEMETRY_WINDOW
+from .models import StationReading
+
+
+def percentile(samples: deque[float], percent: float) -> float | None:
+    """Return the nearest-rank percentile of the samples."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class StationTelemetry:
+    """Rolling fetch measurements of one station."""
+
+    __slots__ = (
+        "errors",
+        "fetches",
+        "last_error",
+        "latencies",
+        "parse_times",
+        "payload_bytes",
+        "payload_points",
+        "reading_age",
+    )
+
+    def __init__(self) -> None:
+        """Initialize the measurements."""
+        self.latencies: deque[float] = deque(maxlen=TELEMETRY_WINDOW)  # seconds
+        self.parse_times: deque[float] = deque(maxlen=TELEMETRY_WINDOW)  # seconds
+        self.payload_points: int | None = None  # readings in the last payload
+        self.payload_bytes: int | None = None  # size of the last payload body
+        self.reading_age: float | None = None  # seconds between the upstream timestamp and its fetch
+        self.last_error: str | None = None
+        self.errors: Counter[str] = Counter()  # error class -> count
+        self.fetches = 0
+
+    def latency(self, percent: float) -> float | None:
+        """Return a percentile of the fetch latency in seconds."""
+        return percentile(self.latencies, percent)
+
+    def parse_time(self, percent: float) -> float | None:
+        """Return a percentile of the parse time in seconds."""
+        return percentile(self.parse_times, percent)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a summary of the measurements."""
+        return {
+            "fetches": self.fetches,
+            "latency_p50": self.latency(50),
+            "latency_p95": self.latency(95),
+            "parse_time_p50": self.parse_time(50),
+            "parse_time_p95": self.parse_time(95),
+            "payload_points": self.payload_points,
+            "payload_bytes": self.payload_bytes,
+            "reading_age": self.reading_age,
+            "last_error": self.last_error,
+            "errors": dict(self.errors),
+        }
+
+
+class ChjSaihTelemetry:
+    """Telemetry of every station fetched by the hub."""
+
+    def __init__(self) -> None:
+        """Initialize the telemetry."""
+        self.stations: dict[str, StationTelemetry] = {}
+
+    def get(self, station_id: str) -> StationTelemetry | None:
+        """Return the telemetry of a station."""
+        return self.stations.get(station_id)
+
+    def record(
+        self,
+        station_id: str,
+        reading: StationReading,
+        latency: float,
+        parse_time: float | None,
+        payload_points: int | None,
+        payload_bytes: int | None = None,
+    ) -> None:
+        """Record one fetch of a station."""
+        telemetry = self.stations.setdefault(station_id, StationTelemetry())
+        telemetry.fetches += 1
+        telemetry.latencies.append(latency)
+        if parse_time is not None:
+            telemetry.parse_times.append(parse_time)
+        if payload_points is not None:
+            telemetry.payload_points = payload_points
+        if payload_bytes is not None:
+            telemetry.payload_bytes = payload_bytes
+        if reading.timestamp is not None:
+            telemetry.reading_age = (
+                dt_util.utcnow() - dt_util.as_utc(reading.timestamp)
+            ).total_seconds()
+        telemetry.last_error = reading.error
+        if reading.error:
+            telemetry.errors[reading.error] += 1
+
+    def record_error(self, station_id: str, error: str) -> None:
+        """Record a fetch that raised before producing a reading."""
+        telemetry = self.stations.setdefault(station_id, StationTelemetry())
+        telemetry.fetches += 1
+        telemetry.last_error = error
+        telemetry.errors[error] += 1
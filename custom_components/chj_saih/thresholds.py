@@ -0,0 +1,124 @@
+"""Per-station alert thresholds for the CHJ SAIH integration."""
+from __future__ import annotations
+
+from bisect import bisect_right
+from typing import Any, NamedTuple
+
+import voluptuous as vol
+
+# Sorted (value, level name) pairs of one station
+StationThresholds = tuple[tuple[float, str], ...]
+
+
+def parse_thresholds(raw: Any) -> dict[str, StationThresholds]:
+    """Validate and normalize the thresholds option.
+
+    The option maps a variable ID either to named levels
+    (``{"08A01N1": {"yellow": 2.5, "orange": 3.2, "red": 4.0}}``) or to a
+    plain list of values, which get the names ``level_1``, ``level_2``...
+    Levels are returned sorted by value. Raises ``vol.Invalid`` on bad input.
+    """
+    if not raw:
+        return {}
+    if not isinstance(raw, dict):
+        raise vol.Invalid("Thresholds must be a mapping of variable IDs")
+
+    thresholds: dict[str, StationThresholds] = {}
+    for station_id, levels in raw.items():
+        if isinstance(levels, (list, tuple)):
+            levels = {f"level_{index}": value for index, value in enumerate(levels, 1)}
+        if not isinstance(levels, dict) or not levels:
+            raise vol.Invalid(f"Thresholds of {station_id} must be a list or a mapping")
+        try:
+            pairs = sorted((float(value), str(name)) for name, value in levels.items())
+        except (TypeError, ValueError) as err:
+            raise vol.Invalid(f"Thresholds of {station_id} must be numbers") from err
+        thresholds[str(station_id)] = tuple(pairs)
+    return thresholds
+
+
+class ThresholdCrossing(NamedTuple):
+    """Change of the alert level of a station."""
+
+    direction: str  # "up" or "down"
+    level: str | None  # Highest level reached, None below every threshold
+    previous_level: str | None
+    threshold: float  # Value of the threshold crossed last
+
+
+class _StationLevels:
+    """Sorted thresholds of one station and the level it is currently at."""
+
+    __slots__ = ("level", "lowered", "names", "values")
+
+    def __init__(self, thresholds: StationThresholds, hysteresis: float) -> None:
+        self.values = [value for value, _ in thresholds]
+        self.names = [name for _, name in thresholds]
+        # Values a reading has to go below to leave each level. Still sorted,
+        # as value - |value| * hysteresis grows with value for hysteresis < 1.
+        self.lowered = [value - abs(value) * hysteresis for value in self.values]
+        self.level: int | None = None  # Thresholds at or below the value, unknown at first
+
+
+class ThresholdEvaluator:
+    """Track the alert level of each station and report level changes.
+
+    A station reaches a level when its value gets to the threshold, and only
+    leaves it when the value drops below the threshold by more than
+    ``hysteresis`` (a fraction of the threshold), so a value hovering around
+    a threshold does not report a crossing on every reading. Each evaluation
+    is two bisections of the station's sorted thresholds.
+    """
+
+    def __init__(
+        self, thresholds: dict[str, StationThresholds], hysteresis: float = 0.0
+    ) -> None:
+        """Initialize the evaluator."""
+        self.hysteresis = min(max(hysteresis, 0.0), 0.99)
+        self._stations = {
+            station_id: _StationLevels(levels, self.hysteresis)
+            for station_id, levels in thresholds.items()
+        }
+
+    def __contains__(self, station_id: object) -> bool:
+        """Return True if the station has thresholds."""
+        return station_id in self._stations
+
+    def level(self, station_id: str) -> str | None:
+        """Return the name of the highest level a station is at."""
+        if (station := self._stations.get(station_id)) is None or not station.level:
+            return None
+        return station.names[station.level - 1]
+
+    def evaluate(self, station_id: str, value: float) -> ThresholdCrossing | None:
+        """Feed a new value of a station, return the crossing it caused if any.
+
+        The first value of a station only sets its level: there is nothing
+        to compare it with, so it is not reported as a crossing.
+        """
+        if (station := self._stations.get(station_id)) is None:
+            return None
+        previous = station.level
+        reached = bisect_right(station.values, value)
+        if previous is None:
+            station.level = reached
+            return None
+        if reached > previous:
+            station.level = reached
+            return ThresholdCrossing(
+                "up",
+                station.names[reached - 1],
+                station.names[previous - 1] if previous else None,
+                station.values[reached - 1],
+            )
+        # Levels are kept until the value drops below their lowered threshold
+        kept = bisect_right(station.lowered, value)
+        if kept < previous:
+            station.level = kept
+            return ThresholdCrossing(
+                "down",
+                station.names[kept - 1] if kept else None,
+                station.names[previous - 1],
+                station.values[kept],
+            )
+        return None
@@ -0,0 +1,118 @@
+"""Micro-benchmark of the SAIH series parser.
+
+Compares ``parser.parse_series`` with the previous code path, one
+``datetime.strptime`` and ``float`` per reading, on synthetic payloads of
+several lengths, clean and with a share of bad values. Only the standard
+library is needed:
+
+    python scripts/benchmark/bench_parser.py --lengths 1 96 1000 10000
+"""
+import argparse
+from datetime import datetime, timedelta
+import importlib.util
+import json
+import os
+import platform
+import sys
+import timeit
+import types
+from zoneinfo import ZoneInfo
+
+PACKAGE_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "custom_components", "chj_saih")
+)
+
+
+def _load_parser():
+    """Import the parser without running the integration __init__ (and Home Assistant)."""
+    package = types.ModuleType("chj_saih_bench")
+    package.__path__ = [PACKAGE_DIR]
+    sys.modules[package.__name__] = package
+    spec = importlib.util.spec_from_file_location(
+        f"{package.__name__}.parser", os.path.join(PACKAGE_DIR, "parser.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+parser = _load_parser()
+SAIH_TZ = ZoneInfo("Europe/Madrid")
+
+
+def legacy_parse(readings_list):
+    """The previous per-reading parsing, kept as the baseline."""
+    points = {}
+    for reading in readings_list:
+        try:
+            timestamp = datetime.strptime(reading[0], "%d/%m/%Y %H:%M").replace(tzinfo=SAIH_TZ)
+            points[timestamp] = float(reading[1])
+        except (IndexError, TypeError, ValueError):
+            continue
+    return sorted(points.items())
+
+
+def make_payload(length, bad_ratio):
+    """Return a newest-first readings list every 5 minutes across a DST change."""
+    start = datetime(2024, 10, 27, 4, 0)
+    step = int(1 / bad_ratio) if bad_ratio else 0
+    readings = []
+    for index in range(length):
+        timestamp = (start - timedelta(minutes=5 * index)).strftime("%d/%m/%Y %H:%M")
+        value = "-" if step and index % step == step - 1 else f"{index % 500 / 10:.2f}"
+        readings.append([timestamp, value])
+    return readings
+
+
+def measure(function, payload, repeat):
+    """Return the best time per call in microseconds."""
+    number = max(1, 20000 // max(len(payload), 1))
+    best = min(timeit.repeat(lambda: function(payload), number=number, repeat=repeat))
+    return best / number * 1e6
+
+
+def main(args):
+    """Run every case and print the results."""
+    results = {
+        "benchmark": "parser",
+        "python": platform.python_version(),
+        "cases": [],
+    }
+    for bad_ratio in (0.0, args.bad_ratio):
+        for length in args.lengths:
+            payload = make_payload(length, bad_ratio)
+            legacy = measure(legacy_parse, payload, args.repeat)
+            current = measure(parser.parse_series, payload, args.repeat)
+            results["cases"].append(
+                {
+                    "length": length,
+                    "bad_ratio": bad_ratio,
+                    "legacy_us": legacy,
+                    "parse_series_us": current,
+                    "speedup": legacy / current,
+                }
+            )
+            print(
+                f"{length:>6} readings, {bad_ratio:4.0%} bad: "
+                f"strptime {legacy:10.1f} us, parse_series {current:10.1f} us, "
+                f"x{legacy / current:5.1f}",
+                file=sys.stderr,
+            )
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+            f.write("\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--lengths", type=int, nargs="+", default=[1, 96, 1000, 10000])
+    argparser.add_argument("--bad-ratio", type=float, default=0.05)
+    argparser.add_argument("--repeat", type=int, default=5)
+    argparser.add_argument("--output", help="JSON file to write, stdout if omitted")
+    main(argparser.parse_args())
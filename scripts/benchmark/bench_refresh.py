@@ -0,0 +1,272 @@
+"""Benchmark the CHJ SAIH refresh cycle against a local SAIH stand-in.
+
+Drives ``ChjSaihDataUpdateCoordinator`` refreshes and the ``ChjSaihSensor``
+update path for several station counts and reports, per refresh cycle, the
+wall time, CPU time, memory allocated and the number of state writes. The
+results are written as JSON so runs can be compared for regressions.
+
+Requires Home Assistant and the ``chj-saih`` library to be installed. Run from
+the repository root:
+
+    python scripts/benchmark/bench_refresh.py --stations 10 100 1000 --output bench.json
+
+With ``--server-process`` the stand-in runs in a child process, so the CPU
+times only cover the integration and Home Assistant, as in production.
+Tracing the allocations slows the refresh down several times; measure CPU
+times with ``--no-memory``.
+"""
+import argparse
+import asyncio
+from datetime import timedelta
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from homeassistant import config_entries
+from homeassistant.const import __version__ as HA_VERSION
+from homeassistant.core import HomeAssistant
+
+from custom_components.chj_saih import client as client_module
+from custom_components.chj_saih.const import RATE_LIMIT_BURST
+from custom_components.chj_saih.coordinator import ChjSaihDataUpdateCoordinator
+from custom_components.chj_saih.hub import async_get_hub
+from custom_components.chj_saih.ratelimit import ChjSaihRateLimiter
+from custom_components.chj_saih.sensor import ChjSaihSensor
+
+from saih_stub import SaihStub, start_in_process
+
+
+async def _create_hass(config_dir):
+    """Create a bare Home Assistant instance."""
+    try:
+        hass = HomeAssistant(config_dir)
+    except TypeError:  # Older Home Assistant takes no arguments
+        hass = HomeAssistant()
+        hass.config.config_dir = config_dir
+    return hass
+
+
+def _summary(values):
+    """Return the median, min and max of a list of numbers."""
+    return {
+        "median": statistics.median(values),
+        "min": min(values),
+        "max": max(values),
+    }
+
+
+async def run_scenario(args, station_count):
+    """Benchmark the refresh cycle for one station count."""
+    stub_options = {
+        "stations": station_count,
+        "series_length": args.series_length,
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "error_rate": args.error_rate,
+        "change_rate": args.change_rate,
+        "etag": not args.no_etag,
+    }
+    stub = SaihStub(**stub_options)
+    runner = process = None
+    if args.server_process:
+        base_url, process = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: start_in_process(**stub_options)
+        )
+    else:
+        base_url, runner = await stub.start()
+    # Point the integration's HTTP client at the stand-in
+    client_module.API_URL = f"{base_url}/datosGrafico"
+    client_module.BASE_URL_STATION_LIST = f"{base_url}/listaEstaciones"
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await _create_hass(config_dir)
+        entry = SimpleNamespace(
+            entry_id=f"bench_{station_count}",
+            domain="chj_saih",
+            title="CHJ SAIH benchmark",
+            data={},
+            options={},
+            async_on_unload=lambda func: None,
+            # Refreshes are driven by the benchmark only
+            pref_disable_polling=True,
+        )
+        config_entries.current_entry.set(entry)
+
+        station_ids = stub.variables
+        hub = async_get_hub(hass)
+        if args.rate_limit:
+            hub.http.limiter = ChjSaihRateLimiter(args.rate_limit, RATE_LIMIT_BURST)
+        else:
+            # Measure the refresh path alone, without waiting for tokens
+            hub.http.limiter = ChjSaihRateLimiter(1e9, 10**9)
+        # Interval 0: every cycle really fetches every station
+        hub.async_subscribe(entry.entry_id, station_ids, 0)
+        coordinator = ChjSaihDataUpdateCoordinator(
+            hass,
+            hub,
+            station_ids=station_ids,
+            update_interval=timedelta(hours=1),
+            max_concurrency=args.concurrency,
+        )
+
+        writes = 0
+
+        def _make_listener(sensor):
+            def _listener():
+                nonlocal writes
+                sensor._update_attrs_from_coordinator_data()
+                hass.states.async_set(
+                    sensor.entity_id,
+                    str(sensor.native_value),
+                    sensor.extra_state_attributes,
+                )
+                writes += 1
+
+            return _listener
+
+        for station_id in station_ids:
+            sensor = ChjSaihSensor(coordinator, station_id)
+            sensor.hass = hass
+            sensor.entity_id = f"sensor.chj_saih_{station_id.lower()}"
+            coordinator.async_add_listener(_make_listener(sensor), station_id)
+
+        cycles = []
+        if not args.no_memory:
+            tracemalloc.start()
+        for _ in range(args.cycles):
+            writes = 0
+            requests_before = hub.http.requests
+            if not args.no_memory:
+                memory_before, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+            wall_started = time.perf_counter()
+            cpu_started = time.process_time()
+
+            await coordinator.async_refresh()
+            # Entity updates of a large refresh are spread over several loop iterations
+            while coordinator._refresh_cpu is not None:
+                await asyncio.sleep(0)
+
+            cpu_time = time.process_time() - cpu_started
+            wall_time = time.perf_counter() - wall_started
+            allocated_bytes = None
+            if not args.no_memory:
+                _, memory_peak = tracemalloc.get_traced_memory()
+                allocated_bytes = memory_peak - memory_before
+            cycles.append(
+                {
+                    "wall_time": wall_time,
+                    "cpu_time": cpu_time,
+                    "allocated_bytes": allocated_bytes,
+                    "state_writes": writes,
+                    "skipped_writes": coordinator.skipped_writes,
+                    "refresh_cpu_time": coordinator.refresh_cpu_time,
+                    "requests": hub.http.requests - requests_before,
+                    "http": hub.http.as_dict(),
+                    "success": coordinator.last_update_success,
+                }
+            )
+        if not args.no_memory:
+            tracemalloc.stop()
+
+        await coordinator.async_shutdown()
+        await hub.http.async_close()
+        await hass.async_stop(force=True)
+    if runner is not None:
+        await runner.cleanup()
+    if process is not None:
+        process.terminate()
+        process.join()
+
+    return {
+        "stations": station_count,
+        "cycles": cycles,
+        "summary": {
+            key: _summary([cycle[key] for cycle in cycles])
+            for key in ("wall_time", "cpu_time", "refresh_cpu_time", "allocated_bytes", "state_writes")
+            if cycles[0][key] is not None
+        },
+    }
+
+
+async def main(args):
+    """Run every scenario and return the results."""
+    results = {
+        "benchmark": "refresh",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "homeassistant": HA_VERSION,
+        "parameters": {
+            "cycles": args.cycles,
+            "series_length": args.series_length,
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "error_rate": args.error_rate,
+            "change_rate": args.change_rate,
+            "concurrency": args.concurrency,
+            "etag": not args.no_etag,
+            "rate_limit": args.rate_limit,
+            "server_process": args.server_process,
+            "memory": not args.no_memory,
+        },
+        "scenarios": [],
+    }
+    for station_count in args.stations:
+        scenario = await run_scenario(args, station_count)
+        results["scenarios"].append(scenario)
+        summary = scenario["summary"]
+        print(
+            f"{station_count:>5} stations: "
+            f"wall {summary['wall_time']['median'] * 1000:8.1f} ms, "
+            f"cpu {summary['cpu_time']['median'] * 1000:8.1f} ms, "
+            f"refresh cpu {summary['refresh_cpu_time']['median'] / station_count * 1000:6.3f} ms/station, "
+            + (
+                f"alloc {summary['allocated_bytes']['median'] / 1024:8.1f} KiB, "
+                if "allocated_bytes" in summary
+                else ""
+            )
+            + f"writes {summary['state_writes']['median']:6.0f}",
+            file=sys.stderr,
+        )
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--series-length", type=int, default=96)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--change-rate", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--no-etag", action="store_true", help="disable ETag support in the stand-in")
+    parser.add_argument(
+        "--rate-limit", type=float, help="requests per second of the SAIH rate limiter, unlimited if omitted"
+    )
+    parser.add_argument(
+        "--server-process", action="store_true", help="run the stand-in in a child process"
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true", help="do not trace allocations, for accurate CPU times"
+    )
+    parser.add_argument("--output", help="JSON file to write, stdout if omitted")
+    args = parser.parse_args()
+    output = json.dumps(asyncio.run(main(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+            f.write("\n")
+    else:
+        print(output)
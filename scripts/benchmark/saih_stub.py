@@ -0,0 +1,194 @@
+"""Local stand-in for the CHJ SAIH API, used by the benchmarks.
+
+It serves the two SAIH endpoints the integration consumes, with the same
+query strings:
+
+*   ``GET /listaEstaciones?t=<type>&id=``: the station catalog (all of it
+    for type ``a``, empty lists for the other types).
+*   ``GET /datosGrafico?v=<variable>&t=...&d=...``: the
+    ``[metadata, readings, extra]`` list, newest reading first. Responses
+    carry an ``ETag`` and honour ``If-None-Match`` unless disabled.
+
+Latency, jitter, error rate, series length and how often a station publishes
+a new reading are configurable. ``start_in_process`` serves it from a
+child process, so its CPU time is not counted by the benchmark. It can also
+be run on its own:
+
+    python scripts/benchmark/saih_stub.py --stations 100 --port 8099
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+import multiprocessing
+import random
+
+from aiohttp import web
+
+RIVERS = ["Júcar", "Turia", "Mijares", "Serpis", "Magro", "Cabriel"]
+KINDS = [
+    ("N", "Nivel", "m"),
+    ("Q", "Caudal", "m³/s"),
+    ("P", "Precipitación", "mm"),
+    ("V", "Volumen embalsado", "hm³"),
+]
+
+
+def variable_id(index):
+    """Return a SAIH-like variable ID for a station index."""
+    kind = KINDS[index % len(KINDS)][0]
+    return f"{index // len(KINDS):02d}A{index % 97:02d}{kind}1"
+
+
+class SaihStub:
+    """In-memory SAIH stand-in with configurable behaviour."""
+
+    def __init__(
+        self,
+        stations=100,
+        series_length=96,
+        latency=0.05,
+        jitter=0.02,
+        error_rate=0.0,
+        change_rate=0.5,
+        seed=0,
+        etag=True,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.change_rate = change_rate  # Probability that a request sees a new reading
+        self.series_length = series_length
+        self.etag = etag
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.catalog = []
+        self._series = {}
+        start = datetime(2024, 10, 29, 12, 0)
+        for index in range(stations):
+            _code, kind, unit = KINDS[index % len(KINDS)]
+            variable = variable_id(index)
+            river = RIVERS[index % len(RIVERS)]
+            self.catalog.append(
+                {
+                    "variable": variable,
+                    "codigoEstacion": f"{index // len(KINDS):02d}A{index % 97:02d}",
+                    "descripcion": f"{kind} {river} {index}",
+                    "nombreEstacion": f"Estación {river} {index // len(KINDS)}",
+                    "nombreRio": river,
+                    "dimension": unit,
+                    "tipoVariable": {"descripcion": kind, "unidades": unit},
+                }
+            )
+            # Newest first, like the real API
+            self._series[variable] = [
+                (start - timedelta(minutes=5 * minute), self.random.uniform(0, 10))
+                for minute in range(series_length)
+            ]
+        self._metadata = {station["variable"]: station for station in self.catalog}
+
+    @property
+    def variables(self):
+        """Return every variable ID served."""
+        return [station["variable"] for station in self.catalog]
+
+    async def _delay(self):
+        await asyncio.sleep(max(0.0, self.random.gauss(self.latency, self.jitter)))
+
+    def _maybe_publish(self, variable):
+        """Add a new reading to the series, as SAIH does every few minutes."""
+        if self.random.random() >= self.change_rate:
+            return
+        series = self._series[variable]
+        timestamp, value = series[0]
+        series.insert(0, (timestamp + timedelta(minutes=5), max(0.0, value + self.random.uniform(-1, 1))))
+        del series[self.series_length:]
+
+    async def handle_stations(self, request):
+        """Serve the station catalog."""
+        self.requests += 1
+        await self._delay()
+        return web.json_response(self.catalog if request.query.get("t") == "a" else [])
+
+    async def handle_variable(self, request):
+        """Serve the series of one variable."""
+        self.requests += 1
+        await self._delay()
+        variable = request.query.get("v")
+        if variable not in self._series:
+            raise web.HTTPNotFound()
+        if self.random.random() < self.error_rate:
+            raise web.HTTPInternalServerError()
+        self._maybe_publish(variable)
+        series = self._series[variable]
+        headers = {}
+        if self.etag:
+            headers["ETag"] = etag = f'"{variable}-{series[0][0]:%Y%m%d%H%M}"'
+            if request.headers.get("If-None-Match") == etag:
+                return web.Response(status=304, headers=headers)
+        readings = [
+            [timestamp.strftime("%d/%m/%Y %H:%M"), f"{value:.2f}"]
+            for timestamp, value in series
+        ]
+        return web.json_response([self._metadata[variable], readings, {}], headers=headers)
+
+    def app(self):
+        """Return the aiohttp application."""
+        app = web.Application()
+        app.router.add_get("/listaEstaciones", self.handle_stations)
+        app.router.add_get("/datosGrafico", self.handle_variable)
+        return app
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Start serving, return the base URL and the runner to clean up."""
+        runner = web.AppRunner(self.app())
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        port = runner.addresses[0][1]
+        return f"http://{host}:{port}", runner
+
+
+
+def _serve(kwargs, host, urls):
+    """Run a stand-in until the process is terminated, sending its URL back."""
+
+    async def _main():
+        base_url, _ = await SaihStub(**kwargs).start(host)
+        urls.put(base_url)
+        await asyncio.Event().wait()
+
+    asyncio.run(_main())
+
+
+def start_in_process(host="127.0.0.1", **kwargs):
+    """Start a stand-in in a child process, return its base URL and the process.
+
+    The keyword arguments are those of ``SaihStub``; a ``SaihStub`` built
+    with the same ones lists the same variables.
+    """
+    context = multiprocessing.get_context("spawn")
+    urls = context.Queue()
+    process = context.Process(target=_serve, args=(kwargs, host, urls), daemon=True)
+    process.start()
+    return urls.get(timeout=60), process
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", type=int, default=100)
+    parser.add_argument("--series-length", type=int, default=96)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--no-etag", action="store_true")
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args()
+    stub = SaihStub(
+        stations=args.stations,
+        series_length=args.series_length,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        etag=not args.no_etag,
+    )
+    web.run_app(stub.app(), host="127.0.0.1", port=args.port)
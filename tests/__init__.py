@@ -0,0 +1 @@
+"""Tests of the CHJ SAIH integration."""
@@ -0,0 +1,111 @@
+"""Tests of the per-station circuit breaker."""
+import asyncio
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.chj_saih.breaker import CircuitBreaker
+from custom_components.chj_saih.const import (
+    BREAKER_BASE_BACKOFF,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_MAX_BACKOFF,
+    BREAKER_STATE_CLOSED,
+    BREAKER_STATE_HALF_OPEN,
+    BREAKER_STATE_OPEN,
+    PRIORITY_SCHEDULED,
+)
+from custom_components.chj_saih.hub import ChjSaihFetchHub
+
+
+def _open(breaker: CircuitBreaker, now: float = 0.0) -> None:
+    for _ in range(BREAKER_FAILURE_THRESHOLD):
+        breaker.record_failure("timeout", now)
+
+
+def test_opens_after_threshold() -> None:
+    breaker = CircuitBreaker()
+    for _ in range(BREAKER_FAILURE_THRESHOLD - 1):
+        assert not breaker.record_failure("timeout", 0.0)
+    assert breaker.record_failure("timeout", 0.0)
+    assert breaker.state == BREAKER_STATE_OPEN
+    assert not breaker.allow_request(BREAKER_BASE_BACKOFF - 1)
+
+
+def test_single_probe_when_half_open() -> None:
+    breaker = CircuitBreaker()
+    _open(breaker)
+    assert breaker.allow_request(BREAKER_BASE_BACKOFF)
+    assert breaker.state == BREAKER_STATE_HALF_OPEN
+    # The probe is in flight
+    assert not breaker.allow_request(BREAKER_BASE_BACKOFF)
+
+
+def test_probe_success_closes() -> None:
+    breaker = CircuitBreaker()
+    _open(breaker)
+    breaker.allow_request(BREAKER_BASE_BACKOFF)
+    assert breaker.record_success()
+    assert breaker.state == BREAKER_STATE_CLOSED
+    assert breaker.failures == 0
+    assert not breaker.record_success()
+
+
+def test_probe_failure_doubles_backoff() -> None:
+    breaker = CircuitBreaker()
+    _open(breaker)
+    breaker.allow_request(BREAKER_BASE_BACKOFF)
+    assert breaker.record_failure("timeout", BREAKER_BASE_BACKOFF)
+    assert breaker.state == BREAKER_STATE_OPEN
+    assert breaker.retry_at == 3 * BREAKER_BASE_BACKOFF
+
+
+def test_backoff_is_capped() -> None:
+    breaker = CircuitBreaker()
+    breaker.opened_count = 100
+    assert breaker.backoff == BREAKER_MAX_BACKOFF
+
+
+def test_cancelled_probe_reopens_without_backoff() -> None:
+    breaker = CircuitBreaker()
+    _open(breaker)
+    breaker.allow_request(BREAKER_BASE_BACKOFF)
+    breaker.record_cancelled(BREAKER_BASE_BACKOFF + 1)
+    assert breaker.state == BREAKER_STATE_OPEN
+    assert breaker.opened_count == 1
+    assert breaker.allow_request(BREAKER_BASE_BACKOFF + 1)
+
+
+def test_cancelled_closed_request_keeps_breaker_closed() -> None:
+    breaker = CircuitBreaker()
+    breaker.record_cancelled(0.0)
+    assert breaker.state == BREAKER_STATE_CLOSED
+
+
+def test_hub_settles_cancelled_probe(tmp_path) -> None:
+    async def _run() -> None:
+        hass = HomeAssistant(str(tmp_path))
+        hub = ChjSaihFetchHub(hass)
+        started = asyncio.Event()
+
+        async def _async_download(*args, **kwargs):
+            started.set()
+            await asyncio.Event().wait()
+
+        hub._async_download = _async_download
+        breaker = hub.breakers["00A00N1"] = CircuitBreaker()
+        _open(breaker, -BREAKER_BASE_BACKOFF)
+        assert breaker.allow_request(0.0)
+
+        task = asyncio.create_task(
+            hub._async_fetch("00A00N1", asyncio.Semaphore(1), 10, PRIORITY_SCHEDULED)
+        )
+        await started.wait()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+        assert breaker.state == BREAKER_STATE_OPEN
+        assert breaker.allow_request(breaker.retry_at)
+
+    asyncio.run(_run())
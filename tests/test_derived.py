@@ -0,0 +1,60 @@
+"""Tests of the reading history and its rolling windows."""
+import random
+
+from custom_components.chj_saih.const import (
+    DERIVED_BUFFER_SIZE,
+    DERIVED_WINDOWS,
+    SAIH_SAMPLE_INTERVAL,
+)
+from custom_components.chj_saih.derived import RingBuffer, StationHistory
+
+
+def test_ring_buffer_wraps() -> None:
+    buffer = RingBuffer(3)
+    for seq in range(5):
+        assert buffer.append(seq * 10.0, seq) == seq
+    assert buffer.full
+    assert buffer.first_seq == 2
+    assert [buffer.value(seq) for seq in range(2, 5)] == [2, 3, 4]
+    assert buffer.time(4) == 40.0
+
+
+def test_buffer_holds_the_longest_window() -> None:
+    assert DERIVED_BUFFER_SIZE * SAIH_SAMPLE_INTERVAL >= max(DERIVED_WINDOWS) * 3600
+
+
+def test_windows_match_a_full_scan() -> None:
+    generator = random.Random(1)
+    history = StationHistory()
+    samples = []
+    timestamp = 0.0
+    for _ in range(3 * DERIVED_BUFFER_SIZE):
+        # Mostly regular samples, with some gaps
+        timestamp += SAIH_SAMPLE_INTERVAL * generator.choice((1, 1, 1, 2, 7))
+        value = round(generator.uniform(-5, 5), 1)
+        assert history.add(timestamp, value)
+        samples.append((timestamp, value))
+        for hours in DERIVED_WINDOWS:
+            window = [v for t, v in samples if t > timestamp - hours * 3600]
+            assert history.maximum(hours) == max(window)
+            assert history.minimum(hours) == min(window)
+            assert history.total(hours) == round(sum(window), 3)
+
+
+def test_old_samples_ignored() -> None:
+    history = StationHistory()
+    assert history.total(1) is None
+    assert history.maximum(1) is None
+    assert history.add(600.0, 1.0)
+    assert not history.add(600.0, 5.0)
+    assert not history.add(300.0, 5.0)
+    assert history.maximum(1) == 1.0
+    assert history.last_timestamp == 600.0
+
+
+def test_rate_per_hour() -> None:
+    history = StationHistory()
+    history.add(0.0, 1.0)
+    assert history.rate is None
+    history.add(1800.0, 2.5)
+    assert history.rate == 3.0
@@ -0,0 +1,128 @@
+"""Tests of the streaming history export."""
+import asyncio
+import csv
+import gzip
+import io
+import json
+from datetime import UTC, datetime
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.chj_saih import export
+from custom_components.chj_saih.export import (
+    EXPORT_FIELDS,
+    _async_export_variable,
+    _ExportWriter,
+    _PayloadReader,
+)
+from custom_components.chj_saih.models import StationDescriptor
+from custom_components.chj_saih.parser import parse_series
+
+METADATA = {
+    "descripcion": "Río Turia en Manises",
+    "dimension": "m³/s",
+    "nombreEstacion": "Manises",
+    "nombreRio": "Turia",
+}
+# Hourly readings from 29/10/2024 14:00 back to 10:00 Spanish time, newest first
+READINGS = [[f"29/10/2024 {hour:02d}:00", hour / 10] for hour in range(14, 9, -1)]
+DESCRIPTOR = StationDescriptor.from_metadata("08A01Q1", METADATA)
+SERIES = parse_series(READINGS)
+
+
+def _utc(hour: int) -> float:
+    return datetime(2024, 10, 29, hour, tzinfo=UTC).timestamp()
+
+
+def _export(tmp_path, file_format: str, start: float, end: float) -> bytes:
+    writer = _ExportWriter(str(tmp_path / f"export.{file_format}.gz"), file_format)
+    writer.open()
+    writer.begin_variable()
+    assert writer.write(DESCRIPTOR, SERIES, start, end) == 3
+    writer.commit_variable()
+    writer.close()
+    return gzip.decompress((tmp_path / f"export.{file_format}.gz").read_bytes())
+
+
+def test_csv_rows_within_the_range(tmp_path) -> None:
+    # 11:00 to 13:00 Spanish time, both included
+    content = _export(tmp_path, "csv", _utc(10), _utc(12)).decode()
+    rows = list(csv.reader(io.StringIO(content)))
+    assert tuple(rows[0]) == EXPORT_FIELDS
+    assert [row[1] for row in rows[1:]] == [
+        "2024-10-29T13:00:00+01:00",
+        "2024-10-29T12:00:00+01:00",
+        "2024-10-29T11:00:00+01:00",
+    ]
+    assert rows[1][0] == "08A01Q1"
+    assert rows[1][2:] == ["1.3", "m³/s", "Manises", "Turia"]
+
+
+def test_jsonl_rows_within_the_range(tmp_path) -> None:
+    lines = _export(tmp_path, "jsonl", _utc(10), _utc(12)).decode().splitlines()
+    assert [json.loads(line)["value"] for line in lines] == [1.3, 1.2, 1.1]
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_discarded_variable_leaves_no_rows(tmp_path) -> None:
+    writer = _ExportWriter(str(tmp_path / "export.csv.gz"), "csv")
+    writer.open()
+    writer.begin_variable()
+    writer.write(DESCRIPTOR, SERIES, _utc(0), _utc(23))
+    writer.discard_variable()
+    writer.close()
+    assert gzip.decompress((tmp_path / "export.csv.gz").read_bytes()).count(b"\n") == 1
+
+    writer = _ExportWriter(str(tmp_path / "aborted.csv.gz"), "csv")
+    writer.open()
+    writer.begin_variable()
+    writer.abort()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["export.csv.gz"]
+
+
+class _Http:
+    """Serves the body of a series a few bytes at a time."""
+
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+        self.sent = 0
+
+    async def async_iter_sensor_data(self, variable, num_values, timeout):
+        for offset in range(0, len(self.body), 5):
+            self.sent = offset + 5
+            yield self.body[offset : self.sent]
+
+
+def test_payload_split_across_chunks() -> None:
+    async def test() -> None:
+        http = _Http(json.dumps([METADATA, READINGS, {}], ensure_ascii=False).encode())
+        reader = _PayloadReader(http.async_iter_sensor_data("08A01Q1", 5, 1))
+        assert await reader.async_metadata() == METADATA
+        batches = [batch async for batch in reader.async_batches(2)]
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+        assert [reading for batch in batches for reading in batch] == READINGS
+
+    asyncio.run(test())
+
+
+def test_export_stops_past_the_range(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 1)
+
+    async def test() -> None:
+        hass = HomeAssistant(str(tmp_path))
+        older = [[f"28/10/2024 {hour:02d}:00", 0.0] for hour in range(23, -1, -1)]
+        body = json.dumps([METADATA, READINGS + older, {}]).encode()
+        http = _Http(body)
+        writer = _ExportWriter(str(tmp_path / "export.csv.gz"), "csv")
+        writer.open()
+        writer.begin_variable()
+        rows = await _async_export_variable(
+            hass, http, writer, "08A01Q1", 5, _utc(10), _utc(12)
+        )
+        writer.commit_variable()
+        writer.close()
+        assert rows == 3
+        # The readings of the day before were not downloaded
+        assert http.sent < len(body) / 2
+
+    asyncio.run(test())
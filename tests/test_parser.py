@@ -0,0 +1,92 @@
+"""Tests of the SAIH series parser."""
+from datetime import UTC, datetime
+
+from custom_components.chj_saih.parser import parse_series
+
+
+def _utc(*args: int) -> float:
+    return datetime(*args, tzinfo=UTC).timestamp()
+
+
+# Summer time ended at 03:00 on 27 October 2024, repeating 02:00 to 02:59
+NOW = _utc(2024, 10, 27, 12, 0)
+
+
+def test_local_time_to_utc() -> None:
+    series = parse_series(
+        [["29/10/2024 12:00", "1.5"], ["15/07/2024 12:00", 2]], now=NOW + 3 * 86400
+    )
+    assert list(series) == [
+        (_utc(2024, 7, 15, 10, 0), 2.0),
+        (_utc(2024, 10, 29, 11, 0), 1.5),
+    ]
+    assert series.invalid == 0
+
+
+def test_repeated_hour_both_occurrences() -> None:
+    series = parse_series(
+        [
+            ["27/10/2024 03:00", 6],
+            ["27/10/2024 02:30", 5],
+            ["27/10/2024 02:00", 4],
+            ["27/10/2024 02:30", 3],
+            ["27/10/2024 02:00", 2],
+            ["27/10/2024 01:30", 1],
+        ],
+        now=NOW,
+    )
+    assert list(series.epochs) == [
+        _utc(2024, 10, 26, 23, 30),
+        _utc(2024, 10, 27, 0, 0),
+        _utc(2024, 10, 27, 0, 30),
+        _utc(2024, 10, 27, 1, 0),
+        _utc(2024, 10, 27, 1, 30),
+        _utc(2024, 10, 27, 2, 0),
+    ]
+    assert list(series.values) == [1, 2, 3, 4, 5, 6]
+    assert series.invalid == 0
+
+
+def test_repeated_hour_not_in_the_future() -> None:
+    # Between both occurrences the second one has not happened yet
+    series = parse_series([["27/10/2024 02:30", 1]], now=_utc(2024, 10, 27, 1, 0))
+    assert list(series.epochs) == [_utc(2024, 10, 27, 0, 30)]
+
+
+def test_repeated_hour_across_chunks() -> None:
+    first = parse_series([["27/10/2024 02:30", 2]], now=NOW)
+    assert list(first.epochs) == [_utc(2024, 10, 27, 1, 30)]
+    second = parse_series([["27/10/2024 02:30", 1]], now=NOW, newer=first.epochs[0])
+    assert list(second.epochs) == [_utc(2024, 10, 27, 0, 30)]
+
+
+def test_invalid_points_dropped() -> None:
+    series = parse_series(
+        [
+            ["29/10/2024 12:00", 3],
+            ["29/10/2024 11:00", "nan"],
+            ["29/10/2024 25:00", 1],
+            ["31/02/2024 10:00", 1],
+            ["29/10/2024 10:00", None],
+            ["29/10/2024 09:00"],
+            ["29/10/2024 08:00", 2],
+        ],
+        now=NOW + 3 * 86400,
+    )
+    assert list(series.values) == [2, 3]
+    assert series.invalid == 5
+
+
+def test_out_of_order_payload_sorted() -> None:
+    series = parse_series(
+        [
+            ["29/10/2024 10:00", 1],
+            ["29/10/2024 12:00", 3],
+            ["29/10/2024 11:00", 2],
+            ["29/10/2024 12:00", 4],
+        ],
+        now=NOW + 3 * 86400,
+    )
+    assert list(series.values) == [1, 2, 3]
+    assert series.invalid == 1
+    assert series.latest()[0] == datetime.fromisoformat("2024-10-29T12:00:00+01:00")
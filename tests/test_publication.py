@@ -0,0 +1,86 @@
+"""Tests of the learned publication timing."""
+from array import array
+
+from custom_components.chj_saih.const import (
+    PUBLICATION_MARGIN,
+    PUBLICATION_MAX_RETRIES,
+    PUBLICATION_RETRY_DELAY,
+)
+from custom_components.chj_saih.parser import StationSeries
+from custom_components.chj_saih.publication import StationPublication
+
+
+def _series(*epochs: float) -> StationSeries:
+    return StationSeries(array("d", epochs), array("d", [0.0] * len(epochs)))
+
+
+def _learned(delay: float = 400.0) -> StationPublication:
+    publication = StationPublication()
+    publication.record_series(_series(-600, -300, 0))
+    publication.record_fetch(0, delay)
+    return publication
+
+
+def test_cadence_is_the_median_spacing() -> None:
+    publication = StationPublication()
+    publication.record_series(_series(0, 300, 600, 1500, 1800))
+    assert publication.cadence == 300
+    # A single point tells nothing
+    publication.record_series(_series(5000))
+    assert publication.cadence == 300
+
+
+def test_unknown_timing() -> None:
+    publication = StationPublication()
+    assert publication.offset is None
+    assert publication.next_fetch(0, 300) is None
+    publication.record_series(_series(0, 300))
+    assert publication.next_fetch(0, 300) is None
+
+
+def test_offset_between_the_bounds() -> None:
+    publication = _learned()
+    # Only an upper bound: look halfway to it
+    assert publication.offset == 200
+    # Too early for the sample at 300
+    publication.record_fetch(0, 300 + 150)
+    assert publication.misses == 0
+    publication.record_fetch(300, 700)
+    assert list(publication.floors) == [150]
+    assert publication.offset == (150 + 400) / 2
+
+
+def test_offset_after_close_bounds() -> None:
+    publication = _learned()
+    publication.record_fetch(0, 300 + 380)
+    publication.record_fetch(300, 300 + 400)
+    assert publication.offset == 400 + PUBLICATION_MARGIN
+
+
+def test_miss_after_a_gap_is_not_a_bound() -> None:
+    publication = _learned()
+    publication.record_fetch(0, 300 + 150)
+    publication.record_fetch(1500, 1900)
+    assert not publication.floors
+
+
+def test_next_fetch_when_the_sample_is_due() -> None:
+    publication = _learned()
+    # Next sample at 300, fetched 200 s later
+    assert publication.next_fetch(450, 60) == 50
+    # Not sooner than the polling interval allows: the sample after it
+    assert publication.next_fetch(450, 300) == 800 - 450
+
+
+def test_late_sample_retried_then_given_up() -> None:
+    publication = _learned()
+    assert publication.next_fetch(600, 300) == PUBLICATION_RETRY_DELAY
+    for _ in range(PUBLICATION_MAX_RETRIES):
+        publication.record_failure()
+    assert publication.next_fetch(600, 300) == PUBLICATION_RETRY_DELAY
+    publication.record_fetch(0, 900)
+    assert publication.misses == PUBLICATION_MAX_RETRIES + 1
+    assert publication.next_fetch(900, 300) is None
+    # A new sample resets the misses
+    publication.record_fetch(300, 950)
+    assert publication.misses == 0
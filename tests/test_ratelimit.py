@@ -0,0 +1,77 @@
+"""Tests of the domain-wide rate limiter."""
+import asyncio
+
+from custom_components.chj_saih.const import (
+    PRIORITY_CATALOG,
+    PRIORITY_SCHEDULED,
+    PRIORITY_USER,
+)
+from custom_components.chj_saih.ratelimit import ChjSaihRateLimiter
+
+
+def test_refill_capped_at_burst() -> None:
+    limiter = ChjSaihRateLimiter(rate=2.0, burst=3)
+    limiter._tokens = 0.0
+    limiter._updated = 100.0
+    limiter._refill(100.5)
+    assert limiter._tokens == 1.0
+    limiter._refill(101.0)
+    assert limiter._tokens == 2.0
+    limiter._refill(110.0)
+    assert limiter._tokens == 3.0
+
+
+def test_burst_granted_without_waiting() -> None:
+    async def test() -> None:
+        limiter = ChjSaihRateLimiter(rate=0.1, burst=3)
+        for _ in range(3):
+            await asyncio.wait_for(limiter.async_acquire(PRIORITY_USER), 0.1)
+        stats = limiter.stats[PRIORITY_USER]
+        assert stats.granted == 3
+        assert stats.delayed == 0
+
+    asyncio.run(test())
+
+
+def test_queue_served_by_priority() -> None:
+    async def test() -> None:
+        limiter = ChjSaihRateLimiter(rate=50.0, burst=1)
+        await limiter.async_acquire(PRIORITY_SCHEDULED)
+        served = []
+
+        async def request(priority: int, name: str) -> None:
+            await limiter.async_acquire(priority)
+            served.append(name)
+
+        tasks = [
+            asyncio.create_task(request(priority, name))
+            for priority, name in (
+                (PRIORITY_CATALOG, "catalog"),
+                (PRIORITY_USER, "user 1"),
+                (PRIORITY_SCHEDULED, "scheduled"),
+                (PRIORITY_USER, "user 2"),
+            )
+        ]
+        await asyncio.wait_for(asyncio.gather(*tasks), 1)
+        assert served == ["scheduled", "user 1", "user 2", "catalog"]
+        assert limiter.stats[PRIORITY_USER].delayed == 2
+        assert limiter.stats[PRIORITY_USER].peak_queued == 2
+        assert limiter.as_dict()["queued"] == 0
+
+    asyncio.run(test())
+
+
+def test_cancelled_request_leaves_the_queue() -> None:
+    async def test() -> None:
+        limiter = ChjSaihRateLimiter(rate=50.0, burst=1)
+        await limiter.async_acquire(PRIORITY_SCHEDULED)
+        cancelled = asyncio.create_task(limiter.async_acquire(PRIORITY_SCHEDULED))
+        waiting = asyncio.create_task(limiter.async_acquire(PRIORITY_USER))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.wait_for(waiting, 1)
+        assert cancelled.cancelled()
+        assert limiter.stats[PRIORITY_SCHEDULED].queued == 0
+        assert limiter.stats[PRIORITY_USER].granted == 1
+
+    asyncio.run(test())
@@ -0,0 +1,101 @@
+"""Tests of the long-term statistics importer."""
+import asyncio
+from array import array
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.chj_saih import statistics
+from custom_components.chj_saih.const import DATA_STATISTICS, DOMAIN
+from custom_components.chj_saih.parser import StationSeries
+from custom_components.chj_saih.statistics import (
+    ChjSaihStatisticsImporter,
+    async_setup_statistics,
+)
+
+
+class _Hub:
+    """Just the series listeners of the fetch hub."""
+
+    def __init__(self) -> None:
+        self.listeners = []
+        self.descriptors = {}
+
+    def async_add_series_listener(self, listener):
+        self.listeners.append(listener)
+        return lambda: self.listeners.remove(listener)
+
+
+def _run(test, config_dir) -> None:
+    async def _main() -> None:
+        await test(HomeAssistant(str(config_dir)))
+
+    asyncio.run(_main())
+
+
+def test_listener_released_with_last_user(tmp_path) -> None:
+    async def _test(hass: HomeAssistant) -> None:
+        hass.config.components.add("recorder")
+        hub = _Hub()
+        first = await async_setup_statistics(hass, hub)
+        second = await async_setup_statistics(hass, hub)
+        assert len(hub.listeners) == 1
+        first()
+        assert len(hub.listeners) == 1
+        second()
+        assert hub.listeners == []
+        # A new entry imports again with the same importer
+        importer = hass.data[DOMAIN][DATA_STATISTICS]
+        third = await async_setup_statistics(hass, hub)
+        assert hass.data[DOMAIN][DATA_STATISTICS] is importer
+        assert len(hub.listeners) == 1
+        third()
+
+    _run(_test, tmp_path)
+
+
+def test_not_started_without_recorder(tmp_path) -> None:
+    async def _test(hass: HomeAssistant) -> None:
+        hub = _Hub()
+        assert await async_setup_statistics(hass, hub) is None
+        assert hub.listeners == []
+
+    _run(_test, tmp_path)
+
+
+def _series(start: float, end: float) -> StationSeries:
+    """Return 5-minute samples from ``start`` to ``end``, valued their minute."""
+    epochs = array("d", range(int(start), int(end) + 1, 300))
+    return StationSeries(epochs, array("d", [epoch % 3600 / 60 for epoch in epochs]))
+
+
+def test_only_complete_hours_imported(tmp_path, monkeypatch) -> None:
+    imported = []
+    monkeypatch.setattr(
+        statistics,
+        "async_add_external_statistics",
+        lambda hass, metadata, data: imported.extend(
+            (row["start"].hour, row["mean"], row["min"], row["max"]) for row in data
+        ),
+    )
+
+    async def _test(hass: HomeAssistant) -> None:
+        importer = ChjSaihStatisticsImporter(hass, _Hub())
+        # 10:20 to 13:10: 10:00 has only part of its samples, 13:00 is open
+        importer.async_process_series(
+            "08A01Q1", _series(10 * 3600 + 1200, 13 * 3600 + 600)
+        )
+        assert imported == [(11, 27.5, 0, 55), (12, 27.5, 0, 55)]
+        # Overlapping series: 13:00 follows the last imported hour
+        imported.clear()
+        importer.async_process_series("08A01Q1", _series(12 * 3600, 14 * 3600 + 300))
+        assert imported == [(13, 27.5, 0, 55)]
+        # After a gap, the partial hour is skipped for good
+        imported.clear()
+        importer.async_process_series("08A01Q1", _series(15 * 3600 + 1800, 17 * 3600))
+        assert imported == [(16, 27.5, 0, 55)]
+        # Nothing new
+        imported.clear()
+        importer.async_process_series("08A01Q1", _series(15 * 3600, 17 * 3600))
+        assert imported == []
+
+    _run(_test, tmp_path)
@@ -0,0 +1,74 @@
+"""Tests of the per-station alert thresholds."""
+import pytest
+import voluptuous as vol
+
+from custom_components.chj_saih.thresholds import (
+    ThresholdCrossing,
+    ThresholdEvaluator,
+    parse_thresholds,
+)
+
+THRESHOLDS = parse_thresholds({"08A01N1": {"red": 4.0, "yellow": 2.0, "orange": 3.0}})
+
+
+def test_parse_sorts_levels() -> None:
+    assert THRESHOLDS == {"08A01N1": ((2.0, "yellow"), (3.0, "orange"), (4.0, "red"))}
+    assert parse_thresholds({"08A01N1": [5, "1.5"]}) == {
+        "08A01N1": ((1.5, "level_2"), (5.0, "level_1"))
+    }
+    assert parse_thresholds(None) == {}
+
+
+@pytest.mark.parametrize(
+    "raw", [["08A01N1"], {"08A01N1": []}, {"08A01N1": {"red": "high"}}]
+)
+def test_parse_rejects_bad_input(raw) -> None:
+    with pytest.raises(vol.Invalid):
+        parse_thresholds(raw)
+
+
+def test_first_value_only_sets_level() -> None:
+    evaluator = ThresholdEvaluator(THRESHOLDS)
+    assert evaluator.evaluate("08A01N1", 3.5) is None
+    assert evaluator.level("08A01N1") == "orange"
+    assert evaluator.evaluate("other", 10.0) is None
+    assert "other" not in evaluator
+
+
+def test_crossing_up_several_levels() -> None:
+    evaluator = ThresholdEvaluator(THRESHOLDS)
+    evaluator.evaluate("08A01N1", 1.0)
+    assert evaluator.evaluate("08A01N1", 2.0) == ThresholdCrossing(
+        "up", "yellow", None, 2.0
+    )
+    assert evaluator.evaluate("08A01N1", 4.5) == ThresholdCrossing(
+        "up", "red", "yellow", 4.0
+    )
+
+
+def test_hysteresis_delays_crossing_down() -> None:
+    evaluator = ThresholdEvaluator(THRESHOLDS, hysteresis=0.1)
+    evaluator.evaluate("08A01N1", 3.0)
+    # Within 10 % below the orange threshold the level is kept
+    assert evaluator.evaluate("08A01N1", 2.8) is None
+    assert evaluator.evaluate("08A01N1", 2.7) is None
+    assert evaluator.level("08A01N1") == "orange"
+    # Back at the threshold is not a new crossing
+    assert evaluator.evaluate("08A01N1", 3.0) is None
+    assert evaluator.evaluate("08A01N1", 2.6) == ThresholdCrossing(
+        "down", "yellow", "orange", 3.0
+    )
+
+
+def test_crossing_down_below_every_level() -> None:
+    evaluator = ThresholdEvaluator(THRESHOLDS, hysteresis=0.1)
+    evaluator.evaluate("08A01N1", 4.0)
+    assert evaluator.evaluate("08A01N1", 1.0) == ThresholdCrossing(
+        "down", None, "red", 2.0
+    )
+    assert evaluator.level("08A01N1") is None
+
+
+def test_hysteresis_clamped() -> None:
+    assert ThresholdEvaluator(THRESHOLDS, hysteresis=-1).hysteresis == 0.0
+    assert ThresholdEvaluator(THRESHOLDS, hysteresis=5).hysteresis == 0.99